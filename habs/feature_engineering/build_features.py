@@ -2,7 +2,8 @@
 """
 feature_engineering/build_features.py
 ------------------------------------
-Create a 4-D tensor (time, lat, lon, channel) from
+Create a 4-D tensor (time, lat, lon, channel) – or (time, channel, lat, lon)
+with --channel_first – from
 root_dataset_filled.nc   →   features.zarr
 
 Channels
@@ -13,23 +14,42 @@ Channels
 4. mask    : binary ocean mask   (1 = ocean / valid pixel, 0 = land or perm-NaN)
 5. time    : sin( 2π DOY ∕ 366 ),  cos( 2π DOY ∕ 366 )
 
+Only 1–3 are stored in the `features` cube. mask (lat, lon) and
+doy_sin / doy_cos (time) are stored as separate low-rank variables and
+expanded per sample by HABCubeDataset; the 18-channel order above is
+kept in  features.attrs["channels"].
+
 Normalisation
 =============
-Each science variable is z-scored over **finite** pixels only.
-The means / stds are saved to  norm_stats.yml  for later inverse-transform.
+Each science variable is z-scored over **finite** pixels only. Count / mean /
+M2 / min / max of all variables (and the ocean mask) come from one chunked
+pass (quality_control/qc_stats.py) and are saved to  norm_stats.yml.
+The same pass yields raw count / sum / M2 per composite, stored in
+features.zarr as  moment_count / moment_sum / moment_m2  (time, sci_var), so
+any split / fold / season gets exact statistics without a rescan
+(feature_engineering/norm_utils.py).
 
 Run
 ~~~
     python feature_engineering/build_features.py
        – the script will create *features.zarr* (~2 GB, chunked) and
          *norm_stats.yml* in the same folder.
+    python feature_engineering/build_features.py --layout tile --tile 128 --channel_first
+       – chunk layout / codec options: see feature_engineering/layout_utils.py;
+         a read-throughput report for the chosen layout is printed at the end.
 """
 
 from pathlib import Path
+import argparse
 import numpy as np
 import xarray as xr
 import yaml
 
+from habs.feature_engineering.layout_utils import (LAYOUTS, arrange, feature_encoding,
+                                                   read_throughput, stored_bytes)
+from habs.feature_engineering.norm_utils import moments_dataset
+from habs.quality_control.qc_stats import qc_stats
+
 # ── paths ────────────────────────────────────────────────────────────────────
 ROOT = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 SRC  = ROOT / "root_dataset_filled.nc"
@@ -44,16 +64,32 @@ SCI_VARS = [
     # CMEMS
     "so", "thetao", "uo", "vo", "zos",
 ]
+CHANNELS = SCI_VARS + ["mask", "doy_sin", "doy_cos"]
+
+# ── CLI: store layout ────────────────────────────────────────────────────────
+parser = argparse.ArgumentParser(description="build features.zarr")
+parser.add_argument("--layout", choices=LAYOUTS, default="time",
+                    help="time: 1 frame/chunk · tile: 1 frame × tile² · block: 50 frames")
+parser.add_argument("--tile", type=int, default=128, help="lat/lon chunk for --layout tile")
+parser.add_argument("--channel_first", action="store_true",
+                    help="store (time, channel, lat, lon)")
+parser.add_argument("--codec", default="zstd", help="Blosc compressor (zstd, lz4, …)")
+parser.add_argument("--clevel", type=int, default=5)
+parser.add_argument("--bench", type=int, default=16,
+                    help="random samples for the read-throughput report (0 = skip)")
+args = parser.parse_args()
 
 # ── 1 · open source cube (lazy / dask) ───────────────────────────────────────
 print(f"🔹 opening {SRC.name} …")
 ds = xr.open_dataset(SRC, chunks={"time": 50})   # ≤50 frames per dask chunk
 
-# ── 2 · build static ocean-mask channel ──────────────────────────────────────
-print("🔹 computing ocean mask …")
-mask = xr.full_like(ds[SCI_VARS[0]].isel(time=0), 1, dtype="int8")
-for var in SCI_VARS:
-    mask = mask.where(np.isfinite(ds[var].isel(time=0)), 0)
+# ── 2 · one pass: count / mean / M2 / min / max + NaN maps, all variables ────
+print("🔹 one-pass statistics (qc_stats.py, cached next to the source) …")
+stats, nan_maps = qc_stats(SRC, SCI_VARS, chunks={"time": 50})
+
+# static ocean mask from the same pass: finite at time 0 in every variable
+mask = xr.concat([nan_maps[f"{v}_valid_t0"] == 1 for v in SCI_VARS], "v").all("v")
+mask = mask.astype("int8")
 mask.name = "ocean_mask"
 mask.attrs["long_name"] = "static mask (1=ocean, 0=land/permanent-NaN)"
 
@@ -62,12 +98,12 @@ print("🔹 normalising variables …")
 norm_vars = {}
 norm_stats = {}
 for v in SCI_VARS:
-    dv = ds[v]
-    mu = float(dv.mean(dim=("time", "lat", "lon"), skipna=True))
-    sd = float(dv.std (dim=("time", "lat", "lon"), skipna=True))
-    norm_vars[v] = (dv - mu) / sd
+    st = stats[v]
+    mu, sd = st["mean"], st["std"]
+    norm_vars[v] = (ds[v] - mu) / sd
     norm_vars[v].attrs.update({"mean": mu, "std": sd, "normalised": "z"})
-    norm_stats[v] = {"mean": mu, "std": sd}
+    norm_stats[v] = {"mean": mu, "std": sd, "count": st["good"],
+                     "m2": st["m2"], "min": st["min"], "max": st["max"]}
     print(f"   {v:10s} : μ={mu:7.3g}   σ={sd:7.3g}")
 
 # ── 4 · sin / cos of day-of-year ────────────────────────────────────────────
@@ -79,22 +115,35 @@ sin_t = xr.DataArray(np.sin(angle), dims="time", coords={"time": ds.time},
 cos_t = xr.DataArray(np.cos(angle), dims="time", coords={"time": ds.time},
                      name="doy_cos")
 
-# broadcast to (time, lat, lon) by matching an existing 3-D variable
-tmpl  = ds[SCI_VARS[0]]                 # any (time,lat,lon) field
-sin3  = sin_t.broadcast_like(tmpl)
-cos3  = cos_t.broadcast_like(tmpl)
+# mask (lat, lon) and doy_sin / doy_cos (time) stay low-rank: they are stored
+# as their own variables and broadcast by the dataloader (layout_utils.py)
+virtual = {"mask": mask.rename("mask"), "doy_sin": sin_t, "doy_cos": cos_t}
 
 # ── 5 · assemble into single Dataset & stack channels ───────────────────────
 print("🔹 stacking into channel dimension …")
-all_vars = {**norm_vars, "mask": mask, "doy_sin": sin3, "doy_cos": cos3}
-feat_ds  = xr.Dataset(all_vars)
+feat_ds  = xr.Dataset(norm_vars)
 feat_da  = feat_ds.to_array(dim="channel")          # (channel,time,lat,lon)
-feat_da  = feat_da.transpose("time", "lat", "lon", "channel")
+feat_da  = arrange(feat_da, channel_first=args.channel_first)
+feat_da.attrs["norm_stats"] = {v: {"mean": s["mean"], "std": s["std"]}
+                               for v, s in norm_stats.items()}
+feat_da.attrs["channels"]   = CHANNELS               # order seen by the models
+
+# ── 6 · write to Zarr (chosen layout, Blosc + byte-shuffle) ─────────────────
+enc = feature_encoding(feat_da, args.layout, args.tile, args.codec, args.clevel)
+print(f"🔹 writing {DST.name}  dims={feat_da.dims}  chunks={enc['zarr']['chunks']} "
+      f"· blosc-{args.codec}{args.clevel} …")
+out = feat_da.chunk(enc["chunks"]).to_dataset(name="features")
+out = out.assign(virtual)                                         # low-rank channels
+out = out.merge(moments_dataset(stats, ds.time.values, SCI_VARS))   # moment index
+out.to_zarr(DST, mode="w", encoding={"features": enc["zarr"]})
+print(f"✅  features.zarr written ({stored_bytes(DST) / 2**30:.2f} GB)")
 
-# ── 6 · write to Zarr (default compression/chunking) ────────────────────────
-print(f"🔹 writing {DST.name} …")
-feat_da.to_dataset(name="features").to_zarr(DST, mode="w")
-print("✅  features.zarr written")
+if args.bench:
+    crop = (args.tile, args.tile) if args.layout == "tile" else None
+    for c in ([None, crop] if crop else [None]):
+        r = read_throughput(DST, n=args.bench, crop=c)
+        print(f"   read {'full frame' if c is None else f'{c[0]}×{c[1]} crop':>12s}: "
+              f"{r['ms_per_sample']:7.1f} ms/sample · {r['MB_per_s']:7.1f} MB/s")
 
 # ── 7 · save normalisation stats for later use ───────────────────────────────
 with open(ROOT / "norm_stats.yml", "w") as f:
@@ -0,0 +1,108 @@
+"""
+Chunk layout / codec choices for features.zarr + a read-throughput probe
+
+Layouts (every layout keeps all channels of a pixel in one chunk):
+
+    "time"   time=1, full lat/lon        – one chunk per training sample
+    "tile"   time=1, tile×tile lat/lon   – random crops touch few chunks
+    "block"  time=50, full lat/lon       – the old default (xarray's)
+
+channel_first=True stores (time, channel, lat, lon) instead of
+(time, lat, lon, channel); HABCubeDataset reads either.
+
+Low-rank channels: `features` holds only the science channels. The static
+mask is stored as its own (lat, lon) variable, and doy_sin / doy_cos as
+(time,) variables. features.attrs["channels"] gives the full order the models
+see; virtual_channels() and ocean_mask() read either store generation.
+
+Codecs are Blosc with byte-shuffle (zstd by default):
+
+    enc = feature_encoding(feat, "tile", tile=128, cname="zstd", clevel=5)
+    feat.chunk(enc["chunks"]).to_dataset(name="features") \\
+        .to_zarr(DST, encoding={"features": enc["zarr"]})
+    read_throughput(DST, crop=(128, 128))
+"""
+from pathlib import Path
+import time
+
+import numpy as np
+import xarray as xr
+
+LAYOUTS = ("time", "tile", "block")
+
+# -------------------------------------------------------------------
+def arrange(feat, channel_first=False):
+    """(… channel …) DataArray → channel-last or channel-first dim order."""
+    dims = ("time", "channel", "lat", "lon") if channel_first else \
+           ("time", "lat", "lon", "channel")
+    return feat.transpose(*dims)
+
+def is_channel_first(feat):
+    return feat.dims.index("channel") == 1
+
+def virtual_channels(ds):
+    """
+    → (channels, static, per_time) for a features.zarr Dataset:
+    full channel order, {name: (lat, lon) array}, {name: (time,) array}.
+    Older stores (all channels inside `features`) give empty dicts.
+    """
+    feat     = ds["features"]
+    channels = list(feat.attrs.get("channels", feat.channel.values.tolist()))
+    static, per_time = {}, {}
+    for c in channels:
+        if c in feat.channel.values or c not in ds.data_vars:
+            continue
+        (static if ds[c].dims == ("lat", "lon") else per_time)[c] = ds[c].values
+    return channels, static, per_time
+
+def ocean_mask(ds):
+    """Static (lat, lon) ocean mask of a features.zarr Dataset."""
+    if "mask" in ds.data_vars:
+        return ds["mask"]
+    return ds["features"].sel(channel="mask").isel(time=0, drop=True)
+
+def layout_chunks(feat, layout="time", tile=128):
+    """{dim: chunk} for one of LAYOUTS."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {LAYOUTS}")
+    ch = {"channel": feat.sizes["channel"],
+          "lat": feat.sizes["lat"], "lon": feat.sizes["lon"],
+          "time": 50 if layout == "block" else 1}
+    if layout == "tile":
+        ch["lat"] = min(tile, feat.sizes["lat"])
+        ch["lon"] = min(tile, feat.sizes["lon"])
+    return ch
+
+def feature_encoding(feat, layout="time", tile=128, cname="zstd", clevel=5):
+    """Dask rechunk spec + Zarr encoding (chunks, Blosc byte-shuffle)."""
+    from numcodecs import Blosc
+
+    ch = layout_chunks(feat, layout, tile)
+    return {"chunks": ch,
+            "zarr": {"chunks": tuple(ch[d] for d in feat.dims),
+                     "compressor": Blosc(cname=cname, clevel=clevel,
+                                         shuffle=Blosc.SHUFFLE)}}
+
+# -------------------------------------------------------------------
+def read_throughput(path, n=16, crop=None, seed=0):
+    """
+    Time n random samples read the way HABCubeDataset reads them
+    (one time step, optionally a random crop) → dict of rates.
+    """
+    feat = xr.open_zarr(path, chunks=None)["features"]
+    rng  = np.random.default_rng(seed)
+    H, W = feat.sizes["lat"], feat.sizes["lon"]
+    nbytes, t0 = 0, time.perf_counter()
+    for t in rng.integers(0, feat.sizes["time"], n):
+        sel = {"time": int(t)}
+        if crop is not None:
+            h, w = crop
+            y0, x0 = rng.integers(0, H - h + 1), rng.integers(0, W - w + 1)
+            sel.update(lat=slice(y0, y0 + h), lon=slice(x0, x0 + w))
+        nbytes += feat.isel(sel).values.nbytes
+    dt = time.perf_counter() - t0
+    return {"samples": n, "seconds": dt, "ms_per_sample": 1e3 * dt / n,
+            "MB_per_s": nbytes / 2**20 / dt}
+
+def stored_bytes(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
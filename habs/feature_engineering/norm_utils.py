@@ -0,0 +1,73 @@
+"""
+Per-time-slice moment index stored with features.zarr
+
+build_features.py writes, next to the `features` cube,
+
+    moment_count / moment_sum / moment_m2    (time, sci_var)
+
+– the raw (un-normalised) count, sum and M2 of every science variable for
+every composite, taken from the same one-pass statistics. Normalisation
+statistics for any subset of time indices (a split, a CV fold, a season)
+are then an exact merge of O(T) small records (composite_utils.merge_moments)
+instead of a rescan of the cube:
+
+    mom      = open_moments()
+    mean, sd = subset_stats(mom, split["train"])
+    a, b     = renorm_affine(feat, mom, split["train"])   # x_split = a·x + b
+"""
+from pathlib import Path
+import numpy as np
+import xarray as xr
+
+from habs.preprocess.composite_utils import MOMENTS, merge_moments
+
+ROOT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
+X_ZARR = ROOT / "features.zarr"
+
+# -------------------------------------------------------------------
+def moments_dataset(stats, times, variables):
+    """qc_stats() result (with per_time) → Dataset of moment_* (time, sci_var)."""
+    data = {f"moment_{m}": (("time", "sci_var"),
+                            np.stack([stats[v]["per_time"][m] for v in variables], axis=1)
+                              .astype("int64" if m == "count" else "float64"))
+            for m in MOMENTS}
+    return xr.Dataset(data, coords={"time": times, "sci_var": list(variables)})
+
+def has_moments(x_path=X_ZARR):
+    return "moment_count" in xr.open_zarr(x_path).data_vars
+
+def open_moments(x_path=X_ZARR):
+    """In-memory moment index (a few KB) from features.zarr."""
+    ds = xr.open_zarr(x_path)
+    return ds[[f"moment_{m}" for m in MOMENTS]].load()
+
+def subset_stats(mom, time_indices):
+    """Exact mean / std (population) per sci_var over the given time indices."""
+    sub     = mom.isel(time=np.sort(np.asarray(time_indices)))
+    n, s, q = merge_moments(*(sub[f"moment_{m}"].values for m in MOMENTS),
+                            np.zeros(sub.sizes["time"], dtype="int64"), axis=0)
+    n, s, q = n[0].astype("float64"), s[0], q[0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean, sd = s / n, np.sqrt(q / n)
+    return (xr.DataArray(mean, coords={"sci_var": sub.sci_var}, dims="sci_var"),
+            xr.DataArray(sd,   coords={"sci_var": sub.sci_var}, dims="sci_var"))
+
+def renorm_affine(feat, mom, time_indices):
+    """
+    Per-channel (scale, offset) that turn the globally z-scored `feat`
+    channels into z-scores w.r.t. the subset: x_sub = scale · x + offset.
+    Non-science channels (mask, doy_*) get the identity.
+    """
+    mean, sd = subset_stats(mom, time_indices)
+    chans    = list(feat.channel.values)
+    scale    = np.ones(len(chans), dtype="float32")
+    offset   = np.zeros(len(chans), dtype="float32")
+    attrs    = feat.attrs.get("norm_stats", {})
+    for v in mom.sci_var.values:
+        k      = chans.index(v)
+        mu_g   = attrs[v]["mean"]
+        sd_g   = attrs[v]["std"]
+        mu, s  = float(mean.sel(sci_var=v)), float(sd.sel(sci_var=v))
+        scale[k]  = sd_g / s
+        offset[k] = (mu_g - mu) / s
+    return scale, offset
@@ -2,8 +2,16 @@
 """
 02 ─ Train/Val/Test split  +  PyTorch Dataset that returns  (x, y)
 ==================================================================
-* uses  features.zarr   (multi-channel predictor cube)
-* uses  labels.zarr     (uint8 HAB mask)
+* uses  features.zarr   (multi-channel predictor cube, channel-last or
+        channel-first, any chunk layout – feature_engineering/layout_utils.py)
+* uses  labels.zarr     (uint8 HAB mask) – or its sparse sibling
+        labels.sparse.zarr when present and in sync (label_build/sparse_labels.py)
+* strip_radius="5" / "8km" → coastal-only targets on the fly, thresholding
+  shore_distance.zarr (quality_control/shore_utils.py)
+* norm="train" (default) → predictors re-normalised on the fly with
+  statistics of the training composites only, merged from the moment index
+  in features.zarr (feature_engineering/norm_utils.py); "global" keeps the
+  all-composite z-scores written by build_features.py
 * writes / re-uses  split_indices.npz
 ------------------------------------------------------------------
 Run a quick demo
@@ -13,6 +21,11 @@ from pathlib import Path
 import argparse, numpy as np, xarray as xr, torch
 from torch.utils.data import Dataset, DataLoader
 
+from habs.feature_engineering.layout_utils import is_channel_first, virtual_channels
+from habs.feature_engineering.norm_utils import has_moments, open_moments, renorm_affine
+from habs.label_build.sparse_labels import SparseLabels, fresh_sparse, is_sparse
+from habs.quality_control.shore_utils import load_strip
+
 # -----------------------------------------------------------------------------#
 # paths – change in ONE place if you move the data
 ROOT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
@@ -46,20 +59,54 @@ class HABCubeDataset(Dataset):
         y : float32  (1, H, W)    ← 0 / 1 mask
 
     If *crop=(h,w)* is given, the SAME random crop is taken from x & y.
+    If *norm_indices* is given, channels are re-z-scored with the statistics
+    of those composites (x ← scale·x + offset, before NaN → 0).
     """
     def __init__(self, time_indices, crop=None,
-                 x_path=X_ZARR, y_path=Y_ZARR):
-
-        # predictors (Dataset → DataArray “features”)
-        self.x_da = xr.open_zarr(x_path,  chunks={"time": 1})["features"]
-
-        # labels.zarr is a **bare DataArray**, so open_dataarray
-        self.y_da = xr.open_dataarray(y_path, consolidated=False,
-                                      chunks={"time": 1})
+                 x_path=X_ZARR, y_path=Y_ZARR, strip_radius=None,
+                 norm_indices=None):
+
+        # predictors (Dataset → DataArray “features”), lazily indexed so a
+        # sample / crop only decompresses the Zarr chunks it touches
+        x_ds      = xr.open_zarr(x_path, chunks=None)
+        self.x_da = x_ds["features"]
+        self.chan_first = is_channel_first(self.x_da)     # layout_utils.py
+
+        # low-rank channels (mask: lat×lon, doy_*: time) kept small in memory
+        # and broadcast per sample; `channels` is the order the models see
+        self.channels, self.static, self.per_time = virtual_channels(x_ds)
+        self.stored = [self.channels.index(c) for c in self.x_da.channel.values]
+
+        # sparse labels: dense tiles straight from the COO positives
+        # (only while it still mirrors labels.zarr – fingerprint check)
+        y_sparse = y_path if is_sparse(y_path) else fresh_sparse(y_path)
+        if y_sparse is not None:
+            self.y_sp = SparseLabels(y_sparse)
+            y_lat, y_lon = self.y_sp.lat, self.y_sp.lon
+        else:
+            # labels.zarr is a **bare DataArray**, so open_dataarray
+            self.y_sp = None
+            self.y_da = xr.open_dataarray(y_path, consolidated=False,
+                                          chunks={"time": 1})
+            y_lat, y_lon = self.y_da.lat, self.y_da.lon
 
         # sanity once
-        assert np.allclose(self.x_da.lat, self.y_da.lat)
-        assert np.allclose(self.x_da.lon, self.y_da.lon)
+        assert np.allclose(self.x_da.lat, y_lat)
+        assert np.allclose(self.x_da.lon, y_lon)
+
+        # optional coastal strip, (lat, lon) 0/1 aligned to the predictors
+        self.strip = None
+        if strip_radius is not None:
+            grid = self.x_da.isel(time=0, channel=0, drop=True)
+            self.strip = (load_strip(strip_radius)
+                          .reindex_like(grid, method="nearest", tolerance=1e-6)
+                          .fillna(0).values.astype("uint8"))
+
+        # optional subset normalisation, exact from the per-time moments
+        self.affine = None
+        if norm_indices is not None:
+            self.affine = renorm_affine(self.x_da, open_moments(x_path),
+                                        norm_indices)
 
         self.idxs  = np.asarray(time_indices, dtype=np.int16)
         self.crop  = crop    # None or (h, w)
@@ -80,30 +127,56 @@ class HABCubeDataset(Dataset):
     def __getitem__(self, i):
         t = int(self.idxs[i])
 
-        # NB: *** .load() ***  (paren!) — otherwise you get a *method*
-        x_np = self.x_da.isel(time=t).load().values    # (lat,lon,chan)
-        y_np = self.y_da.isel(time=t).load().values    # (lat,lon)
+        # aligned crop, chosen first so only the touched chunks are read
+        slc_y, slc_x = self._crop_slices(self.x_da.sizes["lat"],
+                                         self.x_da.sizes["lon"])
+        x_np = self.x_da.isel(time=t, lat=slc_y, lon=slc_x).values
+        if not self.chan_first:                         # (lat,lon,chan) → (chan,lat,lon)
+            x_np = np.transpose(x_np, (2, 0, 1))
+
+        if self.affine is not None:                     # per-channel
+            scale, offset = self.affine
+            x_np = x_np * scale[:, None, None] + offset[:, None, None]
 
         # NaNs → 0 in predictors
         x_np = np.nan_to_num(x_np, nan=0.0, copy=False).astype("float32")
 
-        # aligned crop
-        slc_y, slc_x = self._crop_slices(*x_np.shape[:2])
-        x_np = x_np[slc_y, slc_x, :]
-        y_np = y_np[slc_y, slc_x]
-
-        # (lat,lon,chan) → (chan,lat,lon)   and add channel dim to y
-        x_np = np.transpose(x_np, (2, 0, 1))
+        # expand the low-rank channels into their slots (broadcast on assignment)
+        if self.static or self.per_time:
+            full = np.empty((len(self.channels),) + x_np.shape[1:], dtype="float32")
+            full[self.stored] = x_np
+            for c, a in self.static.items():
+                full[self.channels.index(c)] = a[slc_y, slc_x]
+            for c, a in self.per_time.items():
+                full[self.channels.index(c)] = np.broadcast_to(a[t], x_np.shape[1:])
+            x_np = full
+        if self.y_sp is not None:
+            y_np = self.y_sp.tile(t, slc_y, slc_x)     # (h,w) from positives
+        else:
+            y_np = self.y_da.isel(time=t).load().values[slc_y, slc_x]
+        if self.strip is not None:
+            y_np = y_np * self.strip[slc_y, slc_x]
+
+        # add channel dim to y
+        x_np = np.ascontiguousarray(x_np)
         y_np = y_np[None, ...].astype("float32")
 
         return torch.from_numpy(x_np), torch.from_numpy(y_np)
 
 # -----------------------------------------------------------------------------#
 # 2. convenient loader factory ------------------------------------------------#
-def get_loaders(batch=8, crop=None, num_workers=2):
-    tr_ds = HABCubeDataset(split["train"], crop)
-    va_ds = HABCubeDataset(split["val"],   crop)
-    te_ds = HABCubeDataset(split["test"],  crop)
+def get_loaders(batch=8, crop=None, num_workers=2, strip_radius=None,
+                norm="train"):
+    norm_idx = None
+    if norm == "train":
+        if has_moments(X_ZARR):
+            norm_idx = split["train"]
+        else:
+            print("⚠️  no moment index in features.zarr – global normalisation")
+    kw_ds = dict(strip_radius=strip_radius, norm_indices=norm_idx)
+    tr_ds = HABCubeDataset(split["train"], crop, **kw_ds)
+    va_ds = HABCubeDataset(split["val"],   crop, **kw_ds)
+    te_ds = HABCubeDataset(split["test"],  crop, **kw_ds)
 
     kw = dict(batch_size=batch, pin_memory=True, num_workers=num_workers)
     train_ld = DataLoader(tr_ds, shuffle=True,  drop_last=True,  **kw)
@@ -119,10 +192,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--demo", action="store_true",
                         help="print one mini-batch shape")
+    parser.add_argument("--strip_radius", default=None,
+                        help="coastal-only targets, cells or km (e.g. 8km)")
+    parser.add_argument("--norm", choices=["train", "global"], default="train",
+                        help="normalisation statistics: training split or all")
     args = parser.parse_args()
 
     if args.demo:
-        ld, *_ = get_loaders(batch=4, crop=(128, 128))
+        ld, *_ = get_loaders(batch=4, crop=(128, 128),
+                             strip_radius=args.strip_radius, norm=args.norm)
         x, y = next(iter(ld))
         print("x", x.shape, x.dtype)   # (B, C, 128, 128)
         print("y", y.shape, y.dtype)   # (B, 1, 128, 128)
@@ -8,21 +8,39 @@ Make coastal-only HAB labels:
         ⤷ mask with coastal_strip   (lat, lon)   uint8 {0,1}
 
 Result →  coastal_labels.zarr  (DataArray)
+       +  coastal_labels.sparse.zarr (sparse_labels.py)
+
+--strip_radius 3 / 8km thresholds shore_distance.zarr on the fly instead of
+reading coastal_strip.zarr (no make_coastal_strip.py rerun). The output path
+and strip are recorded in hab_mask.zarr.ingest.json so incremental_labels.py
+refreshes the store with the same strip.
 
 Run:
-    python -m habs.label_build.build_coastal_labels
+    python -m habs.label_build.build_coastal_labels [--strip_radius 8km]
 """
 from pathlib import Path
-import shutil, xarray as xr, numpy as np
+import argparse, shutil, xarray as xr, numpy as np
+
+from habs.label_build.incremental_labels import MASK_Z, register_coastal
+from habs.label_build.sparse_labels import sparse_path, write_sparse
+from habs.quality_control.shore_utils import load_strip
 
 ROOT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 LBL_Z  = ROOT / "labels.zarr"
 STRIP  = ROOT / "coastal_strip.zarr"
 OUT_Z  = ROOT / "coastal_labels.zarr"
 
+ap = argparse.ArgumentParser()
+ap.add_argument("--strip_radius", default=None,
+                help="cells or km (e.g. 8km); default: coastal_strip.zarr")
+ap.add_argument("--out", type=Path, default=OUT_Z)
+args  = ap.parse_args()
+OUT_Z = args.out
+
 # ── 1. load ------------------------------------------------------------------
 labels_da = xr.open_dataarray(LBL_Z)          # (time, lat, lon)  uint8
-strip_da  = xr.open_dataarray(STRIP)          # (lat,  lon)       uint8
+strip_da  = load_strip(args.strip_radius,     # (lat,  lon)       uint8
+                       strip_path=STRIP)
 
 # ensure coords line up exactly
 strip_da = strip_da.reindex_like(labels_da.isel(time=0))
@@ -35,7 +53,9 @@ coastal.name = "coastal_labels"
 if OUT_Z.exists():
     shutil.rmtree(OUT_Z)          # nuke old store to avoid stale vars
 
-coastal.chunk({"time": -1, "lat": -1, "lon": -1}).to_zarr(
+coastal.chunk({"time": 1, "lat": -1, "lon": -1}).to_zarr(
     OUT_Z, mode="w", consolidated=False
 )
-print(f"✅ wrote {OUT_Z}   shape {coastal.shape}")
+write_sparse(coastal, sparse_path(OUT_Z), source=OUT_Z)
+register_coastal(MASK_Z, OUT_Z, STRIP, args.strip_radius)
+print(f"✅ wrote {OUT_Z} (+ sparse)   shape {coastal.shape}")
@@ -14,6 +14,9 @@ python -m habs.label_build.build_labels --ocean_only      # coastal only
 from pathlib import Path
 import argparse, xarray as xr, numpy as np
 
+from habs.feature_engineering.layout_utils import ocean_mask
+from habs.label_build.incremental_labels import register_labels
+
 ROOT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 FEAT_Z = ROOT / "features.zarr"
 MASK_Z = ROOT / "hab_mask.zarr"
@@ -35,7 +38,7 @@ label = (xr.open_zarr(MASK_Z)["hab_occurrence"]
            .astype("uint8"))
 
 if args.ocean_only:
-    ocean = feat["features"].sel(channel="mask").isel(time=0)
+    ocean = ocean_mask(feat)
     label = label.where(ocean == 1, 0)
 
 # tidy coord dtypes & **strip all attrs**
@@ -58,6 +61,7 @@ label.chunk({"time": -1, "lat": -1, "lon": -1}).to_zarr(
     OUT_Z, mode="w",
     encoding={"dtype": "uint8", "compressor": None, "filters": None}
 )
+register_labels(MASK_Z, OUT_Z, args.ocean_only)   # for incremental_labels.py
 '''
 
 print("✅ wrote", OUT_Z)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+incremental_labels.py  –  refresh label stores from new / changed CSV rows
+=========================================================================
+
+build_hab_mask.py records a hash of every ingested report row (raw CSV
+content) → composite index in  hab_mask.zarr.ingest.json.  This script
+
+1. loads the reports from the typed cache (scripts/report_utils.py, which
+   carries a per-row content hash),
+2. diffs against the recorded hashes: time slices of added *and* removed /
+   edited rows are dirty,
+3. re-rasterises only the dirty slices (all current reports of that slice),
+4. rewrites just those slices in
+       hab_mask.zarr        (+ .sparse.zarr)
+       labels.zarr          (+ .sparse.zarr)   ocean-only, as rebuild_labels.py
+       coastal_labels.zarr  (+ .sparse.zarr)   × coastal_strip, as build_coastal_labels.py
+5. stores the new hashes.
+
+build_coastal_labels.py registers every coastal store it writes (--out) with
+the strip it used (strip path + --strip_radius) under "coastal" in the same
+state file; step 4 refreshes each of them with that strip. Likewise
+rebuild_labels.py / build_labels.py record under "labels" whether
+labels.zarr was ocean-masked, and step 4 masks only if it was.
+
+Run
+----
+python -m habs.label_build.incremental_labels            # after a full build
+"""
+from pathlib import Path
+import argparse, json, os
+import numpy as np, pandas as pd, xarray as xr, zarr
+
+from habs.feature_engineering.layout_utils import ocean_mask
+from habs.label_build.sparse_labels import sparse_path, update_sparse
+from habs.quality_control.shore_utils import load_strip
+from habs.scripts.raster_utils import rasterize_points
+from habs.scripts.report_utils import load_reports
+
+ROOT    = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
+CSV     = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data/bloomReportsCA.csv")
+FEAT_Z  = ROOT / "features.zarr"
+MASK_Z  = ROOT / "hab_mask.zarr"
+LBL_Z   = ROOT / "labels.zarr"
+STRIP_Z = ROOT / "coastal_strip.zarr"
+COAST_Z = ROOT / "coastal_labels.zarr"
+
+# ------------------------------------------------------------------ rows -----
+def filter_reports(csv, time_index, lat1d, lon1d):
+    """Same filters as build_hab_mask.py (pushed down); adds `t_index`."""
+    df = load_reports(csv, start=time_index.min(), end=time_index.max(),
+                      bbox=(lon1d.min(), lon1d.max(), lat1d.min(), lat1d.max()))
+    return df.assign(t_index=time_index.get_indexer(df["date"], method="nearest"))
+
+def row_hashes(df):
+    """64-bit content hash of each raw CSV row (hex strings)."""
+    return [f"{int(x):016x}" for x in df["row_hash"].values]
+
+# ------------------------------------------------------------------ state ----
+def state_path(mask_store):
+    return Path(f"{mask_store}.ingest.json")
+
+def load_state(mask_store):
+    p = state_path(mask_store)
+    return json.loads(p.read_text()) if p.exists() else None
+
+def _save_state(mask_store, state):
+    p   = state_path(mask_store)
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, p)
+
+def write_state(mask_store, df, radius):
+    """Record the ingested rows ({hash: t_index}) of the *filtered* reports."""
+    state = load_state(mask_store) or {}          # keeps "coastal" / "labels"
+    state.update(radius=radius,
+                 rows=dict(zip(row_hashes(df), map(int, df["t_index"]))))
+    _save_state(mask_store, state)
+
+def _register(mask_store, kind, out, rec):
+    state = load_state(mask_store) or {}
+    state.setdefault(kind, {})[str(Path(out).resolve())] = rec
+    _save_state(mask_store, state)
+
+def register_coastal(mask_store, out, strip_path, strip_radius):
+    """Remember how coastal store `out` was masked (strip file / radius)."""
+    _register(mask_store, "coastal", out,
+              {"strip_path": str(Path(strip_path).resolve()),
+               "strip_radius": strip_radius})
+
+def register_labels(mask_store, out, ocean_only):
+    """Remember whether label store `out` was ocean-masked."""
+    _register(mask_store, "labels", out, {"ocean_only": bool(ocean_only)})
+
+def labels_ocean_only(state, store=LBL_Z):
+    """Recorded ocean_only flag of `store`, None if it was never registered."""
+    rec = (state.get("labels") or {}).get(str(Path(store).resolve()))
+    return None if rec is None else rec["ocean_only"]
+
+def coastal_stores(state):
+    """{coastal store: strip DataArray} as recorded by build_coastal_labels.py."""
+    recs = state.get("coastal") or {str(COAST_Z): {"strip_path": str(STRIP_Z),
+                                                   "strip_radius": None}}
+    return {Path(out): load_strip(r["strip_radius"], strip_path=Path(r["strip_path"]))
+            for out, r in recs.items() if Path(out).exists()}
+
+def dirty_slices(old_rows, new_rows):
+    """Time indices touched by added or vanished row hashes."""
+    added   = {new_rows[h] for h in new_rows.keys() - old_rows.keys()}
+    removed = {old_rows[h] for h in old_rows.keys() - new_rows.keys()}
+    return sorted(added | removed)
+
+# ------------------------------------------------------------------ write ----
+def write_slices(store, var, ts, slabs):
+    """Overwrite time slices `ts` of <store>/<var> in place (+ its sparse copy)."""
+    arr = zarr.open_group(str(store), mode="r+")[var]
+    for k, t in enumerate(ts):
+        arr[t] = slabs[k].astype(arr.dtype)
+    if sparse_path(store).exists():
+        update_sparse(sparse_path(store), ts, slabs, source=store)
+
+def update(csv=CSV):
+    state = load_state(MASK_Z)
+    if state is None or "rows" not in state:
+        raise SystemExit(f"🛑 no {state_path(MASK_Z).name} – run build_hab_mask.py once")
+    radius = state["radius"]                        # {"unit": "deg"|"km", "value": r}
+    ocean_only = labels_ocean_only(state)
+    if LBL_Z.exists() and ocean_only is None:
+        raise SystemExit(f"🛑 {LBL_Z.name} has no record of its ocean masking – "
+                         "rebuild it once (rebuild_labels.py / build_labels.py)")
+
+    mask_da    = xr.open_zarr(MASK_Z)["hab_occurrence"]
+    time_index = pd.DatetimeIndex(mask_da.time.values)
+    lat1d, lon1d = mask_da.lat.values, mask_da.lon.values
+
+    df  = filter_reports(csv, time_index, lat1d, lon1d)
+    new_rows = dict(zip(row_hashes(df), map(int, df["t_index"])))
+    dirty    = dirty_slices(state["rows"], new_rows)
+    print(f"🔹 {len(new_rows) - len(new_rows.keys() & state['rows'].keys())} new/changed rows"
+          f" · {len(dirty)} dirty composites")
+    if not dirty:
+        print("✅ labels already up to date")
+        return []
+
+    # ── 1) hab_mask: re-rasterise the dirty slices only ────────────────────
+    sub  = df[df["t_index"].isin(dirty)]
+    pos  = np.searchsorted(dirty, sub["t_index"].values)
+    slab = rasterize_points(pos, sub["Bloom_Latitude"].values,
+                            sub["Bloom_Longitude"].values, lat1d, lon1d, len(dirty),
+                            **{("radius_km" if radius["unit"] == "km" else "radius_deg"):
+                               radius["value"]})
+    write_slices(MASK_Z, "hab_occurrence", dirty, slab)
+    mask_new = xr.DataArray(slab, dims=("time", "lat", "lon"),
+                            coords={"time": time_index[dirty], "lat": lat1d, "lon": lon1d})
+
+    # ── 2) labels: ocean-masked only if the store was built that way ─────
+    if LBL_Z.exists():
+        ocean = ocean_mask(xr.open_zarr(FEAT_Z))
+        lab   = mask_new.astype("uint8").reindex_like(ocean, fill_value=0)
+        if ocean_only:
+            lab = lab.where(ocean == 1, 0)
+        lab   = lab.astype("uint8").transpose("time", "lat", "lon")
+        write_slices(LBL_Z, "labels", dirty, lab.values)
+
+        # ── 3) coastal labels: × the strip each store was built with ──────
+        for out, strip in coastal_stores(state).items():
+            strip = strip.reindex_like(lab.isel(time=0))
+            coast = lab.where(strip == 1, 0).astype("uint8")
+            write_slices(out, "coastal_labels", dirty, coast.values)
+
+    write_state(MASK_Z, df, radius)
+    print(f"✅ rewrote {len(dirty)} composites: "
+          + ", ".join(str(d)[:10] for d in time_index[dirty][:8])
+          + (" …" if len(dirty) > 8 else ""))
+    return dirty
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="incremental label refresh")
+    ap.add_argument("--csv", type=Path, default=CSV)
+    args = ap.parse_args()
+    update(args.csv)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+sparse_labels.py  –  sparse / bit-packed store for 0/1 label cubes
+=================================================================
+
+~1 pixel in 26 000 is positive, so a (time, lat, lon) uint8 cube is almost
+all zeros. A sparse store (labels.zarr → labels.sparse.zarr) keeps
+
+    t, i, j   int32 (nnz,)          COO coordinates of the positives, sorted
+    tptr      int64 (T+1,)          positives of slice t = [tptr[t], tptr[t+1])
+    packed    uint8 (T, H, ⌈W/8⌉)   np.packbits(axis=-1), one chunk per slice
+    time, lat, lon                  coordinates
+
+Reads:
+    lab = SparseLabels(path)
+    lab.tile(t, ys, xs)    dense (h, w) uint8 from the COO – O(nnz in slice)
+    lab.dense(t)           dense (H, W) uint8 from the packed chunk
+    lab.to_dataarray()     lazy dense DataArray (drop-in for the old cube)
+    lab.nnz, lab.per_time(), lab.count_in(mask2d)   – O(nnz) statistics
+
+The sparse attrs record the dense store it was made from (shape + a
+size/mtime fingerprint of its files). fresh_sparse(dense) returns the
+sparse sibling only while that fingerprint still matches, so a dense cube
+rebuilt by any other path is never shadowed by stale positives.
+
+Run
+----
+python -m habs.label_build.sparse_labels labels.zarr [coastal_labels.zarr …]
+"""
+from pathlib import Path
+import argparse, numpy as np, xarray as xr, zarr
+
+from habs.quality_control.qc_stats import fingerprint
+
+FORMAT = "habs-sparse-labels"
+
+# ------------------------------------------------------------------ paths ----
+def sparse_path(dense_path):
+    """…/labels.zarr → …/labels.sparse.zarr"""
+    p = Path(dense_path)
+    return p.with_name(p.name.replace(".zarr", "") + ".sparse.zarr")
+
+def is_sparse(path):
+    try:
+        return zarr.open_group(str(path), mode="r").attrs.get("format") == FORMAT
+    except Exception:
+        return False
+
+def _stamp(g, source):
+    """Record the dense store this sparse copy mirrors."""
+    g.attrs["source"] = {"path": Path(source).name,
+                         "shape": list(g.attrs["shape"]),
+                         "fingerprint": fingerprint(source)}
+
+def fresh_sparse(dense_path):
+    """
+    Sparse sibling of `dense_path` if it exists and still mirrors it
+    (its recorded fingerprint is unchanged), else None. With no dense store to compare
+    against, the sparse store is used as is.
+    """
+    sp = sparse_path(dense_path)
+    if not is_sparse(sp):
+        return None
+    if not Path(dense_path).exists():
+        return sp
+    src = zarr.open_group(str(sp), mode="r").attrs.get("source")
+    if src and src.get("fingerprint") == fingerprint(dense_path):
+        return sp
+    print(f"⚠️  {sp.name} does not match {Path(dense_path).name} "
+          f"(stale or unstamped) – reading the dense store")
+    return None
+
+# ------------------------------------------------------------------ write ----
+def write_sparse(da, path, block=16, source=None):
+    """
+    (time, lat, lon) 0/1 DataArray (numpy or Dask) → sparse store at `path`.
+    Streams `block` time slices at a time, never holds the dense cube.
+    source : dense store `da` was written to – stamped for fresh_sparse().
+    """
+    da = da.transpose("time", "lat", "lon")
+    T, H, W = da.shape
+    Wp = (W + 7) // 8
+
+    g = zarr.open_group(str(path), mode="w")
+    g.attrs.update(format=FORMAT, version=1, name=da.name or "labels",
+                   shape=[T, H, W])
+    g.array("time", da.time.values.astype("datetime64[ns]"))
+    g.array("lat",  da.lat.values)
+    g.array("lon",  da.lon.values)
+    packed = g.zeros("packed", shape=(T, H, Wp), chunks=(1, H, Wp), dtype="uint8")
+
+    ts, is_, js, counts = [], [], [], []
+    for t0 in range(0, T, block):
+        slab = np.asarray(da.isel(time=slice(t0, t0 + block)).values)
+        if np.any((slab != 0) & (slab != 1)):
+            raise ValueError(f"{da.name}: labels must be 0/1")
+        slab = slab.astype(bool)
+        packed[t0:t0 + slab.shape[0]] = np.packbits(slab, axis=-1)
+        t, i, j = np.nonzero(slab)                       # already (t, i, j) sorted
+        ts.append(t + t0); is_.append(i); js.append(j)
+        counts.append(np.bincount(t, minlength=slab.shape[0]))
+
+    cat = lambda xs: np.concatenate(xs).astype("int32") if xs else np.zeros(0, "int32")
+    g.array("t", cat(ts)); g.array("i", cat(is_)); g.array("j", cat(js))
+    tptr = np.concatenate([[0], np.cumsum(np.concatenate(counts))]).astype("int64")
+    g.array("tptr", tptr)
+    g.attrs["nnz"] = int(tptr[-1])
+    if source is not None:
+        _stamp(g, source)
+    return Path(path)
+
+def update_sparse(path, ts, slabs, source=None):
+    """
+    Replace time slices `ts` (list of ints) with dense (len(ts), H, W) `slabs`:
+    only their packed chunks are rewritten, the COO arrays are spliced (O(nnz)).
+    source : dense store that received the same slices – re-stamped.
+    """
+    g     = zarr.open_group(str(path), mode="r+")
+    ts    = np.asarray(ts, dtype=np.int64)
+    slabs = np.asarray(slabs).astype(bool)
+    for k, t in enumerate(ts):
+        g["packed"][t] = np.packbits(slabs[k], axis=-1)
+
+    t, i, j = g["t"][:], g["i"][:], g["j"][:]
+    keep    = ~np.isin(t, ts)
+    k, ni, nj = np.nonzero(slabs)
+    t = np.concatenate([t[keep], ts[k]]).astype("int32")
+    i = np.concatenate([i[keep], ni]).astype("int32")
+    j = np.concatenate([j[keep], nj]).astype("int32")
+    order = np.lexsort((j, i, t))
+    T     = g.attrs["shape"][0]
+    for name, arr in (("t", t[order]), ("i", i[order]), ("j", j[order]),
+                      ("tptr", np.concatenate([[0], np.cumsum(np.bincount(t, minlength=T))]))):
+        g.array(name, arr.astype("int64" if name == "tptr" else "int32"), overwrite=True)
+    g.attrs["nnz"] = int(t.size)
+    if source is not None:
+        _stamp(g, source)
+
+# ------------------------------------------------------------------ read -----
+class SparseLabels:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.g    = zarr.open_group(str(path), mode="r")
+        if self.g.attrs.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a sparse label store")
+        self.name  = self.g.attrs["name"]
+        self.shape = tuple(self.g.attrs["shape"])
+        self.time  = self.g["time"][:]
+        self.lat   = self.g["lat"][:]
+        self.lon   = self.g["lon"][:]
+        self.t, self.i, self.j = (self.g[k][:] for k in ("t", "i", "j"))
+        self.tptr  = self.g["tptr"][:]
+
+    # ------------ statistics (O(nnz) / O(T)) ---------------------------------
+    @property
+    def nnz(self):
+        return int(self.tptr[-1])
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def per_time(self):
+        return np.diff(self.tptr)
+
+    def count_in(self, mask2d):
+        """Positives whose (lat, lon) cell is set in a (lat, lon) mask."""
+        return int(np.asarray(mask2d, dtype=bool)[self.i, self.j].sum())
+
+    # ------------ dense access -----------------------------------------------
+    def tile(self, t, ys=slice(None), xs=slice(None)):
+        """Dense uint8 (h, w) tile of slice t from the COO coordinates."""
+        H, W   = self.shape[1:]
+        y0, y1, _ = ys.indices(H)
+        x0, x1, _ = xs.indices(W)
+        out    = np.zeros((y1 - y0, x1 - x0), dtype="uint8")
+        a, b   = self.tptr[t], self.tptr[t + 1]
+        i, j   = self.i[a:b], self.j[a:b]
+        keep   = (i >= y0) & (i < y1) & (j >= x0) & (j < x1)
+        out[i[keep] - y0, j[keep] - x0] = 1
+        return out
+
+    def dense(self, t):
+        """Dense uint8 (H, W) slice from its bit-packed chunk."""
+        W = self.shape[2]
+        return np.unpackbits(self.g["packed"][t], axis=-1, count=W)
+
+    def to_dataarray(self):
+        """Lazy dense (time, lat, lon) uint8 DataArray over the packed chunks."""
+        import dask.array as dsa
+
+        W      = self.shape[2]
+        packed = dsa.from_zarr(self.g["packed"])
+        dense  = packed.map_blocks(np.unpackbits, axis=-1, count=W, dtype="uint8",
+                                   chunks=packed.chunks[:2] + ((W,),))
+        return xr.DataArray(dense, dims=("time", "lat", "lon"), name=self.name,
+                            coords={"time": self.time, "lat": self.lat,
+                                    "lon": self.lon})
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="dense label cube(s) → sparse store(s)")
+    ap.add_argument("stores", nargs="+", type=Path)
+    args = ap.parse_args()
+
+    for p in args.stores:
+        ds = xr.open_zarr(p, consolidated=False)
+        da = ds[list(ds.data_vars)[0]]
+        out = write_sparse(da, sparse_path(p), source=p)
+        lab = SparseLabels(out)
+        print(f"✅ {p.name} → {out.name}   nnz {lab.nnz:,} / {lab.size:,}")
@@ -5,13 +5,24 @@
 3) For each calendar year, bin into 8-day blocks starting on Jan 1, Jan 9, …
 4) Compute the mean within each block.
 5) Write out era5_8day.nc and cmems_8day.nc with time in days since 2016-01-01.
+
+--stream walks the input one 8-day block at a time instead (fixed memory
+budget, --workers years in parallel) and writes era5_8day.zarr / cmems_8day.zarr.
+--update only recomputes new / changed blocks of those stores (see
+era5_8day.zarr.manifest.json) and appends them in place.
 """
+import argparse
 import xarray as xr
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from dask.diagnostics import ProgressBar
 
+from habs.preprocess.composite_utils import (block_moments_8day, block_reduce_8day,
+                                             encode_time_as_days, fused_8day,
+                                             moment_mean, moment_vars,
+                                             stream_8day, update_8day)
+
 # ── user parameters ──────────────────────────────────────────────────────────────
 ERA5_DIR   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data/era5")
 CMEMS_DIR  = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data/copernicus")
@@ -24,59 +35,55 @@ TIME_RANGE = slice("2016-01-01", "2021-06-30")
 REF_DATE   = np.datetime64("2016-01-01")
 
 # ── helper functions ─────────────────────────────────────────────────────────────
-def make_8day(ds):
-    """Group any ds.time into calendar‐year 8-day composite blocks."""
-    doy    = ds.time.dt.dayofyear
-    offset = ((doy - 1) % 8).astype("timedelta64[D]")
-    block  = ds.time - offset
-    block_vals = block.data.astype("datetime64[ns]")
-    ds2 = ds.assign_coords(block_time=("time", block_vals))
-    out = ds2.groupby("block_time").mean(dim="time")
-    return out.rename({"block_time": "time"}).sortby("time")
-
-def encode_time_as_days(ds, ref):
-    """Convert a datetime64[ns] time axis into int days since `ref`."""
-    times = ds.time.values.astype("datetime64[ns]")
-    days  = ((times - ref) / np.timedelta64(1, "D")).astype("int32")
-    ds2 = ds.assign_coords(time=("time", days))
-    attrs = {
-        "units":    f"days since {pd.Timestamp(ref).strftime('%Y-%m-%d')}",
-        "calendar": "proleptic_gregorian",
-    }
-    ds2.time.attrs.update(attrs)
-    ds2.time.encoding.update({
-        "dtype":    "int32",
-        "units":    attrs["units"],
-        "calendar": attrs["calendar"],
-    })
-    return ds2
+def make_8day(ds, moments=False):
+    """
+    Reduce any ds.time into calendar‐year 8-day composite blocks (reduceat).
+    moments=True adds mergeable <v>_count / <v>_sum / <v>_m2 per block.
+    """
+    ds     = ds.sortby("time")
+    coords = {k: c for k, c in ds.coords.items() if "time" not in c.dims}
+    out    = {}
+    for v, da in ds.data_vars.items():
+        if "time" not in da.dims:
+            out[v] = da
+            continue
+        axis = da.get_axis_num("time")
+        if moments:
+            n, s, q, starts = block_moments_8day(da.data, ds.time.values, axis)
+            out[v] = (da.dims, moment_mean(s, n), da.attrs)
+            moment_vars(out, v, n, s, q, da.dims)
+        else:
+            mean, _, starts = block_reduce_8day(da.data, ds.time.values, axis)
+            out[v] = (da.dims, mean, da.attrs)
+    return xr.Dataset(out, coords={**coords, "time": starts})
 
 # ── ERA5 ─────────────────────────────────────────────────────────────────────────
-def process_era5():
-    print("→ opening ERA5 files lazily with Dask…")
-    era5_files = {
-        "data_stream-oper_stepType-accum.nc":        ["tp"],
-        "data_stream-oper_stepType-avg.nc":          ["avg_sdswrf"],
-        "data_stream-oper_stepType-instant.nc":      ["t2m","d2m"],
-        "data_stream-oper_stepType-instant copy.nc": ["u10","v10"],
-    }
+ERA5_FILES = {
+    "data_stream-oper_stepType-accum.nc":        ["tp"],
+    "data_stream-oper_stepType-avg.nc":          ["avg_sdswrf"],
+    "data_stream-oper_stepType-instant.nc":      ["t2m","d2m"],
+    "data_stream-oper_stepType-instant copy.nc": ["u10","v10"],
+}
+
+def open_era5(chunks=None):
+    """Lazy 6-hourly ERA5 subset (time, lat, lon); `chunks` → Dask."""
     ds_list = []
-    for fn, vars_ in era5_files.items():
+    for fn, vars_ in ERA5_FILES.items():
         ds = (
-            xr.open_dataset(ERA5_DIR/fn, decode_times=True, chunks={"time":1000})
+            xr.open_dataset(ERA5_DIR/fn, decode_times=True, chunks=chunks)
               .rename({"valid_time":"time","longitude":"lon","latitude":"lat"})
               .sel(time=TIME_RANGE, lon=LON_SLICE, lat=LAT_SLICE_ERA5)
         )
         ds_list.append(ds[vars_])
-    ds_era5 = xr.merge(ds_list)
-    print(f"   loaded ERA5 6-hourly ds time={ds_era5.time.size}")
+    return xr.merge(ds_list)
 
-    print("→ aggregating to daily means…")
-    ds_era5 = ds_era5.resample(time="1D").mean()
-    print(f"   now daily ds time={ds_era5.time.size}")
+def process_era5(moments=False):
+    print("→ opening ERA5 files lazily with Dask…")
+    ds_era5 = open_era5(chunks={"time":1000})
+    print(f"   loaded ERA5 6-hourly ds time={ds_era5.time.size}")
 
-    print("→ grouping into 8-day composites (lazy)…")
-    ds8 = make_8day(ds_era5)
+    print("→ fused daily → 8-day composites (lazy, one pass per file)…")
+    ds8 = fused_8day(ds_era5, weighting="daily", moments=moments)
     print(f"   grouped into {ds8.time.size} blocks  ← should be ≃253")
 
     print("→ re-encoding time as days since 2016-01-01…")
@@ -94,26 +101,31 @@ def process_era5():
 
 
 # ── CMEMS ───────────────────────────────────────────────────────────────────────
-def process_cmems():
-    print("→ opening CMEMS files lazily with Dask…")
-    cmems_files = {
-        "cmems_mod_glo_phy_my_0.083deg_P1D-m_1742773956384.nc": ["uo","vo","zos"],
-        "cmems_mod_glo_phy_my_0.083deg_P1D-m_1742774147747.nc": ["so","thetao"],
-    }
+CMEMS_FILES = {
+    "cmems_mod_glo_phy_my_0.083deg_P1D-m_1742773956384.nc": ["uo","vo","zos"],
+    "cmems_mod_glo_phy_my_0.083deg_P1D-m_1742774147747.nc": ["so","thetao"],
+}
+
+def open_cmems(chunks=None):
+    """Lazy daily CMEMS subset (time, lat, lon); `chunks` → Dask."""
     ds_list = []
-    for fn, vars_ in cmems_files.items():
+    for fn, vars_ in CMEMS_FILES.items():
         ds = (
-            xr.open_dataset(CMEMS_DIR/fn, decode_times=True, chunks={"time":200})
+            xr.open_dataset(CMEMS_DIR/fn, decode_times=True, chunks=chunks)
               .squeeze("depth", drop=True)
               .rename({"longitude":"lon","latitude":"lat"})
               .sel(time=TIME_RANGE, lon=LON_SLICE, lat=LAT_SLICE_CMEMS)
         )
         ds_list.append(ds[vars_])
-    ds_cmems = xr.merge(ds_list)
+    return xr.merge(ds_list)
+
+def process_cmems(moments=False):
+    print("→ opening CMEMS files lazily with Dask…")
+    ds_cmems = open_cmems(chunks={"time":200})
     print(f"   loaded CMEMS ds time={ds_cmems.time.size}, lat={ds_cmems.lat.size}")
 
     print("→ grouping into 8-day composites (lazy)…")
-    ds8 = make_8day(ds_cmems)
+    ds8 = make_8day(ds_cmems, moments=moments)
     print(f"   grouped into {ds8.time.size} blocks")
 
     print("→ re-encoding time as days since 2016-01-01…")
@@ -129,6 +141,40 @@ def process_cmems():
         )
     print("✅ Wrote CMEMS 8-day composites")
 
+# ── streaming (out-of-core) mode ───────────────────────────────────────────────
+def stream_era5(workers=1, mem_mb=2048, update=False, moments=False):
+    out_path = OUT_DIR/"era5_8day.zarr"
+    run = update_8day if update else stream_8day
+    print(f"→ {'updating' if update else 'streaming'} ERA5 8-day composites → {out_path}")
+    run(open_era5, out_path, REF_DATE, mem_mb=mem_mb, workers=workers,
+        daily=True, moments=moments, sources=[ERA5_DIR/fn for fn in ERA5_FILES])
+    print("✅ Wrote ERA5 8-day composites")
+
+def stream_cmems(workers=1, mem_mb=2048, update=False, moments=False):
+    out_path = OUT_DIR/"cmems_8day.zarr"
+    run = update_8day if update else stream_8day
+    print(f"→ {'updating' if update else 'streaming'} CMEMS 8-day composites → {out_path}")
+    run(open_cmems, out_path, REF_DATE, mem_mb=mem_mb, workers=workers,
+        moments=moments, sources=[CMEMS_DIR/fn for fn in CMEMS_FILES])
+    print("✅ Wrote CMEMS 8-day composites")
+
 if __name__ == "__main__":
-    process_era5()
-    process_cmems()
+    ap = argparse.ArgumentParser(description="ERA5 / CMEMS 8-day composites")
+    ap.add_argument("--stream", action="store_true",
+                    help="block-at-a-time out-of-core mode, writes *.zarr")
+    ap.add_argument("--update", action="store_true",
+                    help="incremental --stream: only new / changed blocks")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="years processed in parallel (--stream only)")
+    ap.add_argument("--mem_mb", type=int, default=2048,
+                    help="memory budget per worker in MB (--stream only)")
+    ap.add_argument("--moments", action="store_true",
+                    help="also write <v>_count/_sum/_m2 for exact re-aggregation")
+    args = ap.parse_args()
+
+    if args.stream or args.update:
+        stream_era5(args.workers, args.mem_mb, args.update, args.moments)
+        stream_cmems(args.workers, args.mem_mb, args.update, args.moments)
+    else:
+        process_era5(args.moments)
+        process_cmems(args.moments)
@@ -0,0 +1,610 @@
+"""
+Streaming helpers for build_8day_composites.py
+
+• block_starts / block_slices : calendar-year 8-day blocks (Jan 1, Jan 9, …)
+• block_reduce / block_reduce_8day
+                               : NaN-aware np.add.reduceat kernel → per-block
+                                 mean + valid-sample count (NumPy or Dask)
+• fused_8day                   : raw sub-daily → (daily →) 8-day for all
+                                 variables of a file in one pass
+• block_moments / merge_moments / reaggregate
+                               : mergeable (count, sum, M2) moments, so 8-day
+                                 composites re-aggregate exactly to 16-day,
+                                 monthly, climatology or across tiles
+• encode_time_as_days          : int32 "days since REF" time axis
+• stream_8day                  : walk the input one 8-day block at a time and
+                                 write every finished block straight into a
+                                 chunked Zarr store (fixed memory budget,
+                                 optional year-parallel process pool)
+• update_8day                  : incremental append/update of such a store,
+                                 driven by a processed-block manifest
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import hashlib, json, os, time
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+import dask.array as dsa
+
+# ── 8-day calendar blocks ───────────────────────────────────────────────────────
+def block_starts(times):
+    """Start date of the calendar-year 8-day block every timestamp falls in."""
+    t      = pd.DatetimeIndex(times)
+    offset = pd.to_timedelta((t.dayofyear - 1) % 8, unit="D")
+    return (t.normalize() - offset).values.astype("datetime64[ns]")
+
+def block_slices(times):
+    """
+    Split a sorted time axis into contiguous 8-day blocks.
+    Returns a list of (block_start, i0, i1) with times[i0:i1] inside the block.
+    """
+    starts = block_starts(times)
+    if starts.size == 0:
+        return []
+    edges = np.flatnonzero(starts[1:] != starts[:-1]) + 1
+    i0s   = np.r_[0, edges]
+    i1s   = np.r_[edges, starts.size]
+    return [(starts[a], int(a), int(b)) for a, b in zip(i0s, i1s)]
+
+# ── reduceat kernel ─────────────────────────────────────────────────────────────
+def block_index(times):
+    """Integer 8-day block id per timestamp (0, 1, …) and the block start dates."""
+    starts = block_starts(times)
+    uniq, idx = np.unique(starts, return_inverse=True)
+    return idx.astype("int64"), uniq
+
+def _moments_np(a, idx, axis, m2=True):
+    """
+    reduceat over `axis` for contiguous runs of equal `idx`
+    → (count, sum) or, with m2, (count, sum, M2 = Σ(x - block mean)²).
+    """
+    a     = np.moveaxis(np.asarray(a), axis, 0)
+    flag  = np.r_[True, idx[1:] != idx[:-1]]
+    edges = np.flatnonzero(flag)
+    valid = ~np.isnan(a)
+    n = np.add.reduceat(valid, edges, axis=0, dtype="int32")
+    s = np.add.reduceat(np.where(valid, a, 0), edges, axis=0, dtype="float64")
+    out = [n, s]
+    if m2:
+        run = np.cumsum(flag) - 1                # local block id per sample
+        d   = np.where(valid, a - _mean(s, n, "float64")[run], 0)
+        out.append(np.add.reduceat(d * d, edges, axis=0, dtype="float64"))
+    return tuple(np.moveaxis(x, 0, axis) for x in out)
+
+def _mean(s, n, dtype):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, s / n, np.nan).astype(dtype)
+
+def _aligned_chunks(idx, target):
+    """Chunk sizes ≈ `target` along time whose borders never split a block."""
+    edges  = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+    bounds = [0]
+    for e in edges[1:]:
+        if e - bounds[-1] >= target:
+            bounds.append(int(e))
+    bounds.append(idx.size)
+    return tuple(np.diff(bounds).tolist())
+
+def _blockwise(fn, arrays, idx, axis, nout, dtype, aux=None):
+    """
+    Apply a per-block reduction fn(*np_arrays, idx[, aux]) → nout arrays.
+    `aux` is an optional per-step array sliced along with idx (e.g. day ids).
+    NumPy in → NumPy out; Dask in → time re-chunked on block borders,
+    one map_blocks task per chunk, nout lazy Dask arrays out.
+    """
+    idx  = np.asarray(idx)
+    args = lambda a0, a1: ((idx[a0:a1],) if aux is None
+                           else (idx[a0:a1], aux[a0:a1]))
+    if idx.size and np.any(np.diff(idx) < 0):
+        raise ValueError("block ids must be sorted along the reduced axis")
+    if not any(isinstance(a, dsa.Array) for a in arrays):
+        return fn(*arrays, *args(0, idx.size))
+
+    arrays = [dsa.asarray(a) for a in arrays]
+    target = max(arrays[0].chunks[axis])
+    arrays = [a.rechunk({axis: _aligned_chunks(idx, target)}) for a in arrays]
+    arrays = dsa.core.unify_chunks(*[x for a in arrays
+                                     for x in (a, tuple(range(a.ndim)))])[1]
+    chunks = arrays[0].chunks
+    offs   = np.cumsum((0,) + chunks[axis])
+    nblk   = [np.unique(idx[a:b]).size for a, b in zip(offs[:-1], offs[1:])]
+    out_chunks = ((nout,),) + tuple(tuple(nblk) if i == axis else c
+                                    for i, c in enumerate(chunks))
+
+    def _kernel(*blocks, block_info=None):
+        a0, a1 = block_info[0]["array-location"][axis]
+        return np.stack([np.asarray(x, dtype=dtype)
+                         for x in fn(*blocks, *args(a0, a1))])
+
+    stacked = dsa.map_blocks(_kernel, *arrays, dtype=dtype,
+                             chunks=out_chunks, new_axis=0)
+    return tuple(stacked[k] for k in range(nout))
+
+def block_reduce(data, idx, axis=0):
+    """
+    Mean and valid-sample count of `data` for every run of equal `idx` along
+    `axis` (idx must be sorted, i.e. every block contiguous).
+    Works on NumPy arrays and on Dask arrays (time re-chunked on block borders).
+    """
+    dtype = np.result_type(data.dtype, np.float32)
+
+    def fn(a, i):
+        n, s = _moments_np(a, i, axis, m2=False)
+        return _mean(s, n, dtype), n
+
+    mean, count = _blockwise(fn, [data], idx, axis, 2, dtype)
+    return mean, count.astype("int32")
+
+def block_moments(data, idx, axis=0):
+    """
+    Mergeable per-block moments (count, sum, M2) of `data` – same blocking
+    rules as block_reduce. mean = sum/count, var = M2/count.
+    """
+    n, s, q = _blockwise(lambda a, i: _moments_np(a, i, axis), [data],
+                         idx, axis, 3, "float64")
+    return n.astype("int32"), s, q
+
+def merge_moments(count, total, m2, idx, axis=0):
+    """
+    Exactly merge runs of equal `idx` of already-reduced moments (Chan et al.):
+    8-day → 16-day / monthly / climatology, or several tiles / partial stores.
+    Returns (count, sum, M2) of the merged groups.
+    """
+    def fn(n, s, q, i):
+        flag  = np.r_[True, i[1:] != i[:-1]]
+        edges = np.flatnonzero(flag)
+        run   = np.cumsum(flag) - 1
+        n, s, q = (np.moveaxis(np.asarray(x), axis, 0) for x in (n, s, q))
+        ok  = n > 0
+        N   = np.add.reduceat(n, edges, axis=0, dtype="int64")
+        S   = np.add.reduceat(np.where(ok, s, 0), edges, axis=0, dtype="float64")
+        mu  = _mean(s, n, "float64")
+        d   = np.where(ok, mu - _mean(S, N, "float64")[run], 0)
+        Q   = np.add.reduceat(np.where(ok, q, 0) + n * d * d, edges, axis=0,
+                              dtype="float64")
+        return tuple(np.moveaxis(x, 0, axis) for x in (N, S, Q))
+
+    n, s, q = _blockwise(fn, [count, total, m2], idx, axis, 3, "float64")
+    return n.astype("int32"), s, q
+
+def block_reduce_8day(data, times, axis=0):
+    """Calendar-year 8-day mean + count of `data`; returns (mean, count, starts)."""
+    idx, starts = block_index(times)
+    mean, count = block_reduce(data, idx, axis=axis)
+    return mean, count, starts
+
+def block_moments_8day(data, times, axis=0):
+    """Calendar-year 8-day (count, sum, M2) of `data` + the block start dates."""
+    idx, starts = block_index(times)
+    return (*block_moments(data, idx, axis=axis), starts)
+
+def _fused_np(a, blk, day, axis, weighting, moments):
+    """raw steps → (daily means →) block (mean, count) or (count, sum, M2)."""
+    if weighting == "daily":
+        n, s = _moments_np(a, day, axis, m2=False)
+        a    = _mean(s, n, "float64")
+        blk  = blk[np.r_[True, day[1:] != day[:-1]]]
+    if moments:
+        return _moments_np(a, blk, axis)
+    n, s = _moments_np(a, blk, axis, m2=False)
+    return _mean(s, n, "float32"), n
+
+def fused_8day(ds, weighting="daily", moments=False):
+    """
+    Raw (e.g. 6-hourly) steps → calendar-year 8-day blocks for every variable
+    of `ds` in a single pass: one task per time chunk does the daily and the
+    block reduction back to back, so no daily intermediate array exists.
+
+    weighting="daily"  : daily means first, then the mean of the days – the
+                         same numbers as resample("1D").mean() + make_8day
+    weighting="sample" : every raw step weighs the same
+    moments=True       : also <v>_count / _sum / _m2 (of days or of samples)
+    """
+    if weighting not in ("daily", "sample"):
+        raise ValueError(f"unknown weighting {weighting!r}")
+    ds     = ds.sortby("time")
+    times  = ds.time.values
+    blk, starts = block_index(times)
+    day    = times.astype("datetime64[D]").astype("int64")
+    coords = {k: c for k, c in ds.coords.items() if "time" not in c.dims}
+    out    = {}
+    for v, da in ds.data_vars.items():
+        if "time" not in da.dims:
+            out[v] = da
+            continue
+        axis = da.get_axis_num("time")
+        fn   = lambda a, b, d: _fused_np(a, b, d, axis, weighting, moments)
+        if moments:
+            n, s, q = _blockwise(fn, [da.data], blk, axis, 3, "float64", aux=day)
+            n = n.astype("int32")
+            out[v] = (da.dims, moment_mean(s, n), da.attrs)
+            moment_vars(out, v, n, s, q, da.dims)
+        else:
+            mean, n = _blockwise(fn, [da.data], blk, axis, 2, "float32", aux=day)
+            out[v] = (da.dims, mean, da.attrs)
+    return xr.Dataset(out, coords={**coords, "time": starts})
+
+MOMENTS = ("count", "sum", "m2")
+
+def moment_vars(ds, name, count, total, m2, dims):
+    """Attach <name>_count / _sum / _m2 next to the mean in dict `ds`."""
+    attrs = {"moments_of": name, "cell_methods": "time: 8-day block"}
+    for tag, arr in zip(MOMENTS, (count, total, m2)):
+        ds[f"{name}_{tag}"] = (dims, arr, attrs)
+    return ds
+
+def reaggregate(ds, labels):
+    """
+    Merge moment variables (<v>_count/_sum/_m2) of a composite Dataset over
+    groups of time steps, e.g. labels = time.dt.month for monthly means or
+    block-of-year for a climatology. Returns mean + moments per group,
+    with the group label as the new time coordinate.
+    """
+    labels = np.asarray(labels)
+    order  = np.argsort(labels, kind="stable")
+    ds     = ds.isel(time=order)
+    labels = labels[order]
+    groups, idx = np.unique(labels, return_inverse=True)
+    out = {}
+    for v in ds.data_vars:
+        if not v.endswith("_count"):
+            continue
+        base = v[: -len("_count")]
+        da   = ds[v]
+        axis = da.get_axis_num("time")
+        n, s, q = merge_moments(da.data, ds[f"{base}_sum"].data,
+                                ds[f"{base}_m2"].data, idx, axis=axis)
+        out[base] = (da.dims, moment_mean(s, n), ds[base].attrs if base in ds else {})
+        moment_vars(out, base, n, s, q, da.dims)
+    coords = {k: c for k, c in ds.coords.items() if "time" not in c.dims}
+    return xr.Dataset(out, coords={**coords, "time": groups})
+
+def moment_mean(s, n):
+    """sum / count → float32 mean for NumPy or Dask operands."""
+    if isinstance(s, dsa.Array):
+        return dsa.map_blocks(_mean, s, n, "float32", dtype="float32")
+    return _mean(s, n, "float32")
+
+def encode_time_as_days(ds, ref):
+    """Convert a datetime64[ns] time axis into int days since `ref`."""
+    times = ds.time.values.astype("datetime64[ns]")
+    days  = ((times - ref) / np.timedelta64(1, "D")).astype("int32")
+    ds2 = ds.assign_coords(time=("time", days))
+    attrs = {
+        "units":    f"days since {pd.Timestamp(ref).strftime('%Y-%m-%d')}",
+        "calendar": "proleptic_gregorian",
+    }
+    ds2.time.attrs.update(attrs)
+    ds2.time.encoding.update({
+        "dtype":    "int32",
+        "units":    attrs["units"],
+        "calendar": attrs["calendar"],
+    })
+    return ds2
+
+# ── streaming engine ────────────────────────────────────────────────────────────
+def rows_per_tile(ds, n_steps, mem_bytes):
+    """
+    How many lat rows of one 8-day block fit into `mem_bytes`
+    (all variables, `n_steps` raw time steps, ×2 for the reduction temporaries).
+    """
+    nlon     = ds.sizes["lon"]
+    per_row  = sum(n_steps * nlon * np.dtype(ds[v].dtype).itemsize
+                   for v in ds.data_vars) * 2
+    return int(max(1, min(ds.sizes["lat"], mem_bytes // max(per_row, 1))))
+
+def block_mean(slab, daily=False, moments=False):
+    """
+    Mean of one loaded (time, lat, lon) slab; `daily` = day-mean first,
+    `moments` = also emit <v>_count / _sum / _m2 (of the daily means if daily).
+    """
+    days = slab.time.values.astype("datetime64[D]").astype("int64")
+    one  = np.zeros(slab.sizes["time"] if not daily else np.unique(days).size,
+                    dtype="int64")
+    out  = {}
+    for v, da in slab.data_vars.items():
+        da = da.transpose("time", ...)
+        a  = da.values
+        if daily:
+            a, _ = block_reduce(a, days)
+        if moments:
+            n, s, q = block_moments(a, one)
+            out[v]  = (da.dims[1:], _mean(s[0], n[0], "float32"), da.attrs)
+            moment_vars(out, v, n[0], s[0], q[0], da.dims[1:])
+        else:
+            mean, _ = block_reduce(a, one)
+            out[v]  = (da.dims[1:], mean[0], da.attrs)
+    return xr.Dataset(out, coords={c: slab[c] for c in ("lat", "lon")})
+
+def out_dtypes(ds, moments=False):
+    """Output variable → dtype of a composite store."""
+    dt = {}
+    for v in ds.data_vars:
+        dt[v] = "float32"
+        if moments:
+            dt.update({f"{v}_count": "int32", f"{v}_sum": "float64",
+                       f"{v}_m2": "float64"})
+    return dt
+
+def _skeleton(ds, times, ref, moments=False):
+    """NaN-filled, one-chunk-per-block Dataset for the given block starts."""
+    nlat, nlon = ds.sizes["lat"], ds.sizes["lon"]
+    data = {
+        v: (("time", "lat", "lon"),
+            dsa.full((times.size, nlat, nlon),
+                     0 if dt == "int32" else np.nan, dtype=dt,
+                     chunks=(1, nlat, nlon)),
+            ds[v].attrs if v in ds else {})
+        for v, dt in out_dtypes(ds, moments).items()
+    }
+    skel = xr.Dataset(data, coords={"time": times.astype("datetime64[ns]"),
+                                    "lat": ds.lat.values,
+                                    "lon": ds.lon.values})
+    return encode_time_as_days(skel, ref)
+
+def init_store(ds, out_path, blocks, ref, moments=False):
+    """
+    Write the Zarr skeleton (coords + empty, time-chunked data variables)
+    so that every block can later be filled in with a region write.
+    """
+    times = np.array([b[0] for b in blocks], dtype="datetime64[ns]")
+    _skeleton(ds, times, ref, moments).to_zarr(out_path, mode="w",
+                                               compute=False, consolidated=True)
+
+def append_slots(ds, out_path, blocks, ref, moments=False):
+    """Grow the store's time axis by the given (new, trailing) blocks."""
+    times = np.array([b[0] for b in blocks], dtype="datetime64[ns]")
+    _skeleton(ds, times, ref, moments).to_zarr(out_path, append_dim="time",
+                                               consolidated=True)
+def _tiles(ds, i0, i1, mem_bytes):
+    """Loaded (time=[i0, i1), lat-tile) slabs of one block → (a, b, slab)."""
+    step = rows_per_tile(ds, i1 - i0, mem_bytes)
+    for a in range(0, ds.sizes["lat"], step):
+        b = min(a + step, ds.sizes["lat"])
+        yield a, b, ds.isel(time=slice(i0, i1), lat=slice(a, b)).load()
+
+class _DataHash:
+    """
+    sha1 of a block's raw input, fed one lat tile at a time. Each variable is
+    hashed in (lat, …) order, so the result does not depend on the tiling.
+    """
+    def __init__(self, ds):
+        self.h = {v: hashlib.sha1() for v in sorted(ds.data_vars)}
+
+    def update(self, slab):
+        for v, h in self.h.items():
+            a = slab[v].transpose("lat", ...).values
+            h.update(np.ascontiguousarray(a).tobytes())
+
+    def hexdigest(self):
+        return hashlib.sha1("".join(h.hexdigest() for h in self.h.values())
+                            .encode()).hexdigest()
+
+def block_data_hash(ds, i0, i1, mem_bytes):
+    """Content hash of input steps [i0, i1) (read tile by tile, nothing written)."""
+    h = _DataHash(ds)
+    for _, _, slab in _tiles(ds, i0, i1, mem_bytes):
+        h.update(slab)
+    return h.hexdigest()
+
+def write_block(ds, out_path, k, i0, i1, mem_bytes, daily=False, moments=False):
+    """
+    Reduce input steps [i0, i1) into output slot k, tile by tile along lat.
+    Returns the block's block_data_hash (from the same read).
+    """
+    dtypes = out_dtypes(ds, moments)
+    h      = _DataHash(ds)
+    for a, b, slab in _tiles(ds, i0, i1, mem_bytes):
+        h.update(slab)
+        mean = block_mean(slab, daily=daily, moments=moments)
+        mean = mean.assign({v: mean[v].astype(dt) for v, dt in dtypes.items()})
+        mean = mean.expand_dims("time").drop_vars(["lat", "lon"])
+        mean.to_zarr(out_path, region={"time": slice(k, k + 1),
+                                       "lat":  slice(a, b)})
+    return h.hexdigest()
+
+def _stream_part(opener, out_path, todo, mem_bytes, daily, moments):
+    """Worker: open the source itself and write the given (k, i0, i1) blocks."""
+    ds = opener()
+    return {k: write_block(ds, out_path, k, i0, i1, mem_bytes,
+                           daily=daily, moments=moments)
+            for k, i0, i1 in todo}
+
+def _hash_part(opener, todo, mem_bytes):
+    """Worker: content hashes of the given (k, i0, i1) blocks."""
+    ds = opener()
+    return {k: block_data_hash(ds, i0, i1, mem_bytes) for k, i0, i1 in todo}
+
+def _by_year(ds, todo):
+    by_year = {}
+    for k, i0, i1 in todo:
+        start = block_starts(ds.time.values[i0:i0 + 1])[0]
+        by_year.setdefault(pd.Timestamp(start).year, []).append((k, i0, i1))
+    return by_year
+
+def _run_blocks(opener, ds, out_path, todo, mem_bytes, workers, daily, moments):
+    """
+    Write (k, i0, i1) blocks, grouped by calendar year (one task per year).
+    Returns {k: block_data_hash}.
+    """
+    t0, hashes = time.perf_counter(), {}
+    if workers <= 1:
+        for year, part in _by_year(ds, todo).items():
+            hashes.update(_stream_part(lambda: ds, out_path, part, mem_bytes,
+                                       daily, moments))
+            print(f"   {year}: {len(part)} blocks")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futs = {year: pool.submit(_stream_part, opener, out_path,
+                                      part, mem_bytes, daily, moments)
+                    for year, part in _by_year(ds, todo).items()}
+            for year, fut in futs.items():
+                part = fut.result()
+                hashes.update(part)
+                print(f"   {year}: {len(part)} blocks")
+    print(f"   streamed in {time.perf_counter() - t0:.1f}s")
+    return hashes
+
+def _hash_blocks(opener, ds, todo, mem_bytes, workers):
+    """{k: block_data_hash} of (k, i0, i1) blocks, read-only, same pool layout."""
+    if workers <= 1:
+        return _hash_part(lambda: ds, todo, mem_bytes)
+    hashes = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for fut in [pool.submit(_hash_part, opener, part, mem_bytes)
+                    for part in _by_year(ds, todo).values()]:
+            hashes.update(fut.result())
+    return hashes
+
+def stream_8day(opener, out_path, ref, mem_mb=2048, workers=1, daily=False,
+                moments=False, sources=()):
+    """
+    Build 8-day composites block by block.
+
+    opener  : zero-argument, picklable callable returning the (lazy, un-chunked)
+              source Dataset with dims (time, lat, lon)
+    out_path: Zarr store, one chunk per 8-day block
+    mem_mb  : budget for one in-flight block (per worker)
+    workers : >1 → independent calendar years run on a local process pool
+    daily   : average to daily means inside each block first (ERA5 6-hourly)
+    moments : also store mergeable <v>_count / _sum / _m2 per block
+    sources : raw files behind `opener`; fingerprinted into the manifest so
+              that update_8day can later append to the store
+    The manifest also keeps a content hash of every block's input, taken
+    from the same read that computes it.
+    """
+    out_path  = Path(out_path)
+    mem_bytes = int(mem_mb) * 2**20
+    ds        = opener()
+    blocks    = block_slices(ds.time.values)
+    print(f"   {len(blocks)} blocks · {ds.time.size} input steps "
+          f"· budget {mem_mb} MB/worker")
+    init_store(ds, out_path, blocks, ref, moments)
+    todo = [(k, i0, i1) for k, (_, i0, i1) in enumerate(blocks)]
+    data = _run_blocks(opener, ds, out_path, todo, mem_bytes, workers, daily, moments)
+    write_manifest(out_path, build_manifest(ds, blocks, sources, daily, moments,
+                                            data=data))
+    return out_path
+
+# ── processed-block manifest / incremental update ──────────────────────────────
+def manifest_path(out_path):
+    return Path(f"{out_path}.manifest.json")
+
+def fingerprint(path):
+    """Cheap source-file fingerprint (size + mtime)."""
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": int(st.st_mtime_ns)}
+
+def changed_sources(old, new):
+    """Names of sources whose size/mtime changed (or that are new)."""
+    old_src = (old or {}).get("sources", {})
+    key     = lambda rec: (rec.get("size"), rec.get("mtime"))
+    return sorted(name for name, rec in new["sources"].items()
+                  if key(old_src.get(name, {})) != key(rec))
+
+def block_digest(times, sources, data=None):
+    """
+    Identity of one block's input: its raw timestamps + the source names
+    (+ `data`, the block_data_hash of its values, when known).
+    Changes when days are added to a (trailing) block, a source is swapped,
+    or a revised source changed the block's values.
+    """
+    h = hashlib.sha1(np.asarray(times, dtype="datetime64[ns]").tobytes())
+    h.update("|".join(sorted(Path(p).name for p in sources)).encode())
+    if data is not None:
+        h.update(data.encode())
+    return h.hexdigest()
+
+def build_manifest(ds, blocks, sources, daily, moments=False, data=None):
+    """data : {block index: block_data_hash} (missing → no content hash)."""
+    times, data = ds.time.values, data or {}
+    return {
+        "vars":    sorted(out_dtypes(ds, moments)),
+        "daily":   bool(daily),
+        "sources": {Path(p).name: fingerprint(p) for p in sources},
+        "blocks":  {str(np.datetime64(start, "D")):
+                        {"n": i1 - i0, "data": data.get(k),
+                         "digest": block_digest(times[i0:i1], sources, data.get(k))}
+                    for k, (start, i0, i1) in enumerate(blocks)},
+    }
+
+def load_manifest(out_path):
+    p = manifest_path(out_path)
+    return json.loads(p.read_text()) if p.exists() else None
+
+def write_manifest(out_path, manifest):
+    p   = manifest_path(out_path)
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp, p)                           # never a half-written manifest
+
+def update_8day(opener, out_path, ref, mem_mb=2048, workers=1, daily=False,
+                moments=False, sources=()):
+    """
+    Incrementally bring an existing stream_8day store up to date.
+
+    Only blocks that are new or whose input changed are recomputed: changed
+    blocks are overwritten in place, new blocks are appended along time.
+    A block's input changed when
+      • its timestamps / sources differ (e.g. the partially filled trailing
+        block got new days), or
+      • a source file's size / mtime changed (appended, re-downloaded,
+        revised) and the block's content hash differs from the manifest.
+    Hashing only reads; appending days to a whole-record file (ERA5, CMEMS)
+    rewrites the new / trailing blocks, not the record.
+    Falls back to a full stream_8day when there is no usable manifest.
+    """
+    out_path  = Path(out_path)
+    mem_bytes = int(mem_mb) * 2**20
+    old       = load_manifest(out_path)
+    ds        = opener()
+    blocks    = block_slices(ds.time.values)
+    new       = build_manifest(ds, blocks, sources, daily, moments)
+
+    keys_old = list(old["blocks"]) if old else []
+    keys_new = list(new["blocks"])
+    if (not out_path.exists() or old is None
+            or old["vars"] != new["vars"] or old["daily"] != new["daily"]
+            or keys_new[:len(keys_old)] != keys_old):
+        print("   no compatible manifest – full rebuild")
+        return stream_8day(opener, out_path, ref, mem_mb=mem_mb,
+                           workers=workers, daily=daily, moments=moments,
+                           sources=sources)
+
+    revised = changed_sources(old, new)
+    times   = ds.time.values
+    todo, check, data = [], [], {}
+    for k, ((_, i0, i1), key) in enumerate(zip(blocks, keys_new)):
+        rec = old["blocks"].get(key)
+        if rec is None or rec["digest"] != block_digest(times[i0:i1], sources,
+                                                        rec.get("data")):
+            todo.append((k, i0, i1))              # new / trailing / re-sourced
+        elif revised or rec.get("data") is None:
+            check.append((k, i0, i1))             # same dates – compare content
+        else:
+            data[k] = rec["data"]
+    if revised:
+        print(f"   revised sources: {', '.join(revised)}")
+    if check:
+        print(f"   hashing {len(check)} blocks of unchanged dates …")
+        hashes = _hash_blocks(opener, ds, check, mem_bytes, workers)
+        for k, i0, i1 in check:
+            old_h = old["blocks"][keys_new[k]].get("data")
+            if old_h == hashes[k] or (old_h is None and not revised):
+                data[k] = hashes[k]               # unchanged (or first hash)
+            else:
+                todo.append((k, i0, i1))
+    todo.sort()
+    n_app = len(keys_new) - len(keys_old)
+    print(f"   {len(todo)} dirty blocks ({n_app} new, "
+          f"{len(todo) - n_app} rewritten) of {len(blocks)}")
+    if n_app:
+        append_slots(ds, out_path, blocks[len(keys_old):], ref, moments)
+    if todo:
+        data.update(_run_blocks(opener, ds, out_path, todo,
+                                mem_bytes, workers, daily, moments))
+    write_manifest(out_path, build_manifest(ds, blocks, sources, daily, moments,
+                                            data=data))
+    return out_path
@@ -1,66 +1,190 @@
 #!/usr/bin/env python3
+"""
+Regrid ERA5 + CMEMS 8-day composites onto the MODIS grid and merge all three
+into root_dataset.nc – lazily: every product is opened in time chunks, the
+regridders are applied chunk by chunk (Dask) and the merged cube is streamed
+to a chunked, compressed store, so nothing is ever held in memory as a whole.
+
+• *.zarr inputs (streaming outputs of build_8day_composites / modis_to_target)
+  are used when present, otherwise the *.nc files.
+• --out ….zarr writes a Zarr store in parallel (--workers threads);
+  ….nc keeps the NetCDF output (compressed, time-chunked).
+• prints wall time per stage. Regrid and merge only *plan* the Dask graph
+  (their wall time is the weight build / graph construction); the actual
+  reading, regridding and merging runs inside the write. --profile runs
+  the write under dask.diagnostics (Profiler + ResourceProfiler, blockwise
+  fusion off so tasks keep their layer names) and splits its task time
+  into read / regrid / merge / store, plus the peak memory of the write.
+
+Run:
+    python preprocess/merge_root_dataset.py
+    python preprocess/merge_root_dataset.py --out …/root_dataset.zarr --workers 8
+    python preprocess/merge_root_dataset.py --profile
+"""
+import argparse, importlib.util, time
+from contextlib import contextmanager, nullcontext
 import xarray as xr
 import numpy as np
-import xesmf as xe
+import dask
+from dask.diagnostics import Profiler, ProgressBar, ResourceProfiler
 from pathlib import Path
 
+from habs.scripts.regrid_utils import cached_regridder
+
 # ── adjust these to your actual paths ─────────────────────────────────────────
 BASE  = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 MODIS = BASE / "modis_target.nc"
 ERA5  = BASE / "era5_8day.nc"
 CMEMS = BASE / "cmems_8day.nc"
 OUT   = BASE / "root_dataset.nc"
+CHUNK_T = 16                                   # composites per Dask chunk
+
+# ── helpers ────────────────────────────────────────────────────────────────────
+TIMINGS = {}
+
+@contextmanager
+def stage(name):
+    t0 = time.perf_counter()
+    yield
+    TIMINGS[name] = time.perf_counter() - t0
+    print(f"   ⏱ {name:<8s} {TIMINGS[name]:8.1f}s")
+
+def graph_tokens(*objs):
+    """Tokens (name suffix) of every Dask layer behind the given objects."""
+    return {name.rsplit("-", 1)[-1] for o in objs
+            for name in o.__dask_graph__().layers}
+
+def task_breakdown(prof, owners, default="store"):
+    """Profiler results → {stage: task seconds}, via the key's layer token."""
+    out = dict.fromkeys(["read", "regrid", "merge", default], 0.0)
+    for r in prof.results:
+        name = r.key[0] if isinstance(r.key, tuple) else str(r.key)
+        st   = owners.get(name.rsplit("-", 1)[-1], default)
+        out[st] += r.end_time - r.start_time
+    return out
+
+def open_product(path, chunk_t=CHUNK_T):
+    """Open <path>.zarr if the streaming store exists, else the NetCDF – lazily."""
+    zarr = path.with_suffix(".zarr")
+    if zarr.exists():
+        return xr.open_zarr(zarr, decode_times=True).chunk({"time": chunk_t})
+    return xr.open_dataset(path, decode_times=True, chunks={"time": chunk_t})
+
+def encoding_for(ds, out, chunk_t):
+    """Per-variable compression + on-disk chunking matching the Dask chunks."""
+    enc = {}
+    for v, da in ds.data_vars.items():
+        chunks = tuple(min(chunk_t, n) if d == "time" else n
+                       for d, n in zip(da.dims, da.shape))
+        if out.suffix == ".zarr":
+            enc[v] = {"chunks": chunks}
+        else:
+            enc[v] = {"zlib": True, "complevel": 4, "chunksizes": chunks}
+    return enc
+
+# ── pipeline ───────────────────────────────────────────────────────────────────
+def build(out=OUT, chunk_t=CHUNK_T, workers=4, profile=False):
+    out = Path(out)
+
+    # ── 1) open lazily, time-chunked ──────────────────────────────────────────
+    with stage("open"):
+        print("→ opening datasets lazily…")
+        ds_modis = open_product(MODIS, chunk_t)
+        ds_era5  = open_product(ERA5,  chunk_t)
+        ds_cmems = open_product(CMEMS, chunk_t)
+
+    with stage("grid"):
+        # ── 2) rename MODIS dims x,y → lon,lat (drop 2-D lat/lon first) ──────
+        ds_modis = ds_modis.drop_vars([c for c in ("lat", "lon")
+                                       if c in ds_modis.variables
+                                       and ds_modis[c].ndim == 2])
+        ds_modis = ds_modis.rename({"x": "lon", "y": "lat"})
+
+        # ── 3) derive common lon/lat bounds & shape from ERA5 ────────────────
+        lon_min, lon_max = ds_era5.lon.min().item(), ds_era5.lon.max().item()
+        lat_min, lat_max = ds_era5.lat.min().item(), ds_era5.lat.max().item()
+
+        nlat = ds_modis.sizes["lat"]
+        nlon = ds_modis.sizes["lon"]
+
+        # ── 4) build *ascending* coordinate vectors ──────────────────────────
+        lon1d = np.linspace(lon_min, lon_max, nlon)
+        lat1d = np.linspace(lat_min, lat_max, nlat)
+
+        # ── 5) assign those to MODIS ─────────────────────────────────────────
+        ds_modis = ds_modis.assign_coords(lon=("lon", lon1d),
+                                          lat=("lat", lat1d))
+
+        # if lat ended up descending, force it ascending:
+        if ds_modis.lat.values[1] < ds_modis.lat.values[0]:
+            ds_modis = ds_modis.sortby("lat")
+
+        # ── 6) build target grid ─────────────────────────────────────────────
+        target_grid = xr.Dataset({
+            "lon": ("lon", lon1d),
+            "lat": ("lat", lat1d),
+        })
+
+    owners = dict.fromkeys(graph_tokens(ds_modis, ds_era5, ds_cmems), "read")
+
+    # ── 7/8) regrid ERA5 + CMEMS → MODIS grid (bilinear, lazy per chunk) ─────
+    with stage("regrid"):                         # weights + graph, no data yet
+        print("→ planning ERA5 / CMEMS regrid onto MODIS grid (lazy)…")
+        re_e = cached_regridder(ds_era5, target_grid, method="bilinear", periodic=False)
+        era5_on = re_e(ds_era5).reindex(time=ds_modis.time)
+
+        re_c = cached_regridder(ds_cmems, target_grid, method="bilinear", periodic=False)
+        cmems_on = re_c(ds_cmems).reindex(time=ds_modis.time)
+    owners.update(dict.fromkeys(graph_tokens(era5_on, cmems_on) - owners.keys(),
+                                "regrid"))
+
+    # ── 9) merge everything (still lazy) ──────────────────────────────────────
+    with stage("merge"):
+        print("→ merging all variables…")
+        ds_root = xr.merge([ds_modis, era5_on, cmems_on]).chunk({"time": chunk_t})
+    owners.update(dict.fromkeys(graph_tokens(ds_root) - owners.keys(), "merge"))
+
+    # ── 10) stream to a chunked store ─────────────────────────────────────────
+    with stage("write"):
+        print(f"→ writing merged dataset to {str(out)!r}")
+        enc  = encoding_for(ds_root, out, chunk_t)
+        cfg  = {"scheduler": "threads", "num_workers": workers}
+        prof, rprof = nullcontext(), nullcontext()
+        if profile:
+            cfg["optimization.fuse.active"] = False     # keep layer names
+            prof = Profiler()
+            if importlib.util.find_spec("psutil"):      # ResourceProfiler needs it
+                rprof = ResourceProfiler(dt=0.25)
+        with dask.config.set(cfg), ProgressBar(), prof, rprof:
+            if out.suffix == ".zarr":
+                ds_root.to_zarr(out, mode="w", encoding=enc, consolidated=True)
+            else:
+                ds_root.to_netcdf(out, encoding=enc)
+
+    total = sum(TIMINGS.values())
+    print("   stage timings: " +
+          "  ".join(f"{k}={v:.1f}s" for k, v in TIMINGS.items()) +
+          f"  (total {total:.1f}s; regrid / merge = planning only)")
+    if profile:
+        tasks = task_breakdown(prof, owners)
+        peak  = (f"{max((r.mem for r in rprof.results), default=0):.0f} MB"
+                 if isinstance(rprof, ResourceProfiler) else "n/a (needs psutil)")
+        print("   write task time: " +
+              "  ".join(f"{k}={v:.1f}s" for k, v in tasks.items()) +
+              f"  (summed over {workers} threads) · peak RSS {peak}")
+    print("✅ Done.")
+    return out
+
 
-# ── 1) load in CF‐time mode ─────────────────────────────────────────────────────
-print("→ loading datasets…")
-ds_modis = xr.open_dataset(MODIS, decode_times=True)
-ds_era5  = xr.open_dataset(ERA5,  decode_times=True)
-ds_cmems = xr.open_dataset(CMEMS, decode_times=True)
-
-# ── 2) rename MODIS dims x,y → lon,lat ─────────────────────────────────────────
-ds_modis = ds_modis.rename({"x": "lon", "y": "lat"})
-
-# ── 3) derive common lon/lat bounds & shape from ERA5 ─────────────────────────
-lon_min, lon_max = ds_era5.lon.min().item(), ds_era5.lon.max().item()
-lat_min, lat_max = ds_era5.lat.min().item(), ds_era5.lat.max().item()
-
-nlat = ds_modis.sizes["lat"]
-nlon = ds_modis.sizes["lon"]
-
-# ── 4) build *ascending* coordinate vectors ────────────────────────────────────
-lon1d = np.linspace(lon_min, lon_max, nlon)
-lat1d = np.linspace(lat_min, lat_max, nlat)
-
-# ── 5) assign those to MODIS ───────────────────────────────────────────────────
-ds_modis = ds_modis.assign_coords(lon=("lon", lon1d),
-                                  lat=("lat", lat1d))
-
-# if lat ended up descending, force it ascending:
-if ds_modis.lat.values[1] < ds_modis.lat.values[0]:
-    ds_modis = ds_modis.sortby("lat")
-
-# ── 6) build xESMF target grid ─────────────────────────────────────────────────
-target_grid = xr.Dataset({
-    "lon": ("lon", lon1d),
-    "lat": ("lat", lat1d),
-})
-
-# ── 7) regrid ERA5 → MODIS grid (bilinear) ────────────────────────────────────
-print("→ regridding ERA5 onto MODIS grid…")
-re_e = xe.Regridder(ds_era5, target_grid, method="bilinear", periodic=False)
-era5_on = re_e(ds_era5)
-era5_on = era5_on.reindex(time=ds_modis.time)
-
-# ── 8) regrid CMEMS → MODIS grid (bilinear) ───────────────────────────────────
-print("→ regridding CMEMS onto MODIS grid…")
-re_c = xe.Regridder(ds_cmems, target_grid, method="bilinear", periodic=False)
-cmems_on = re_c(ds_cmems)
-cmems_on = cmems_on.reindex(time=ds_modis.time)
-
-# ── 9) merge everything & write out ────────────────────────────────────────────
-print("→ merging all variables…")
-ds_root = xr.merge([ds_modis, era5_on, cmems_on])
-
-print(f"→ writing merged dataset to {OUT!r}")
-ds_root.to_netcdf(OUT)
-print("✅ Done.")
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="merge MODIS + ERA5 + CMEMS → root_dataset")
+    ap.add_argument("--out", type=Path, default=OUT,
+                    help="output store (.nc or .zarr)")
+    ap.add_argument("--chunk_time", type=int, default=CHUNK_T,
+                    help="composites per chunk")
+    ap.add_argument("--workers", type=int, default=4,
+                    help="Dask threads for the write")
+    ap.add_argument("--profile", action="store_true",
+                    help="split the write's task time into read / regrid / merge / store")
+    args = ap.parse_args()
+    build(args.out, args.chunk_time, args.workers, args.profile)
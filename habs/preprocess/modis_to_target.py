@@ -2,25 +2,43 @@
 """
 Build clean 4-var MODIS stack on the ERA5/Copernicus grid (279×502, 2016-01-01 … 2021-06-23).
 
-• Only uses dates where all 4 variables exist.
-• Caches xESMF weights in ./cache/modis_to_target_weights.nc
+• Only uses dates where all 4 variables exist (granule catalog query).
+• Caches xESMF weights in the shared grid-keyed cache (scripts/regrid_utils.py)
 • Writes  processed/modis_target.nc
+
+--from_l3b skips l3mapgen + regridding altogether: the raw L3b bin lists
+(Data/<product>/*.L3b.8D.*.nc) are mapped straight onto the target grid
+through a precomputed cell → bin index (scripts/l3b_reader.py).
+
+--stream instead preallocates processed/modis_target.zarr (one chunk per date)
+and decodes + regrids dates on a process pool; every worker writes its date
+straight into its own region, at most --inflight dates are in the air.
+
+Run:
+    python preprocess/modis_to_target.py                         # one NetCDF
+    python preprocess/modis_to_target.py --stream --workers 32   # Zarr, parallel
+    python preprocess/modis_to_target.py --from_l3b --stream     # raw L3b → Zarr
 """
 
 import xarray as xr
-import xesmf as xe
 import numpy as np
 import pandas as pd
-import pathlib, re, glob
+import dask.array as dsa
+import argparse, pathlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 
+from habs.scripts.granule_catalog import GranuleCatalog
+from habs.scripts.l3b_reader import L3bGridder
+from habs.scripts.regrid_utils import cached_regridder
+
 # ──────────────────────────────────────────────────────────────────────────────
 # 1) Paths + constants
 BASE      = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed/modis_l3m")
+L3B_BASE  = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data")
 ERA5_FP   = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed/era5_avg_sdswrf_8day_4km.nc")
 OUT_NC    = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/processed/modis_target.nc")
-CACHE     = pathlib.Path("./cache");  CACHE.mkdir(exist_ok=True)
-WEIGHTS   = CACHE/"modis_to_target_weights.nc"
+OUT_ZARR  = OUT_NC.with_suffix(".zarr")
 
 VAR_DIR = {
     "chlor_a": "chlorophyll",
@@ -28,65 +46,139 @@ VAR_DIR = {
     "nflh"   : "nFLH",
     "sst"    : "seaSurfaceTemperature",
 }
-DATE_RE = re.compile(r"(\d{8})_\d{8}")
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 2) find the 4 file-lists, intersect their dates
-files = {v: sorted(glob.glob(str(BASE/dirn/"*_4km_L3m.nc")))
-         for v,dirn in VAR_DIR.items()}
-dates_per_var = {
-    v: { DATE_RE.search(p).group(1): p
-         for p in lst if DATE_RE.search(p) }
-    for v,lst in files.items()
-}
-dates_all = sorted(set.intersection(*[set(dates_per_var[v]) for v in VAR_DIR]))
-# restrict to your desired range
-dates_all = [d for d in dates_all if "20160101" <= d <= "20210623"]
-print(f"Kept {len(dates_all)} composite dates")
+# 2) dates where all 4 variables exist – straight from the granule catalog
+def find_dates(level="L3m"):
+    root = BASE if level == "L3m" else L3B_BASE
+    with GranuleCatalog() as cat:
+        cat.scan([root/dirn for dirn in VAR_DIR.values()])
+        complete = cat.complete_dates(list(VAR_DIR), "2016-01-01", "2021-06-23",
+                                      level=level)
+    dates_all     = list(complete)
+    dates_per_var = {v: {d: paths[v] for d, paths in complete.items()}
+                     for v in VAR_DIR}
+    print(f"Kept {len(dates_all)} composite dates")
+    return dates_all, dates_per_var
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 3) build the ERA5→target grid Dataset
-era = xr.open_dataset(ERA5_FP)
-lon2d, lat2d = np.meshgrid(era.x, era.y)
-TGT = xr.Dataset({
-    "lon": (("y","x"), lon2d),
-    "lat": (("y","x"), lat2d),
-})
+def target_grid():
+    era = xr.open_dataset(ERA5_FP)
+    lon2d, lat2d = np.meshgrid(era.x, era.y)
+    return xr.Dataset({
+        "lon": (("y","x"), lon2d),
+        "lat": (("y","x"), lat2d),
+    })
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 4) build one xESMF regridder (caching weights)
-first_date = dates_all[0]
-sample_fp  = dates_per_var["chlor_a"][first_date]
-sample_da  = xr.open_dataset(sample_fp)["chlor_a"].squeeze()
-
-reuse = WEIGHTS.exists()
-regridder = xe.Regridder(
-    sample_da, TGT,
-    method="bilinear",
-    filename=str(WEIGHTS),
-    reuse_weights=reuse,
-)
+# 4) build one xESMF regridder (weights cached by grid fingerprint),
+#    or the L3b cell → bin index
+def make_regridder(sample_fp, tgt):
+    if ".L3b." in pathlib.Path(sample_fp).name:
+        return L3bGridder(tgt.lat.values, tgt.lon.values)
+    sample_da = xr.open_dataset(sample_fp)["chlor_a"].squeeze()
+    return cached_regridder(sample_da, tgt, method="bilinear")
 
-# ──────────────────────────────────────────────────────────────────────────────
-# 5) loop & regrid with a progress bar
-stacks = []
-for d in tqdm(dates_all, desc="MODIS → target grid"):
-    dt = pd.to_datetime(d, format="%Y%m%d").to_datetime64()
+def regrid_date(regridder, d, dates_per_var):
+    """Open + regrid the 4 variables of one composite date → Dataset (y, x)."""
     vars_out = {}
     for v in VAR_DIR:
-        da = xr.open_dataset(dates_per_var[v][d])[v].squeeze()
-        da_rg = regridder(da).expand_dims(time=[dt])
-        vars_out[v] = da_rg
-    stacks.append(xr.Dataset(vars_out))
+        if isinstance(regridder, L3bGridder):
+            vars_out[v] = regridder(dates_per_var[v][d], v)
+            continue
+        with xr.open_dataset(dates_per_var[v][d]) as src:
+            vars_out[v] = regridder(src[v].squeeze().load()).astype("float32")
+    return xr.Dataset(vars_out)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 5) loop & regrid with a progress bar → one NetCDF
+def run_serial(dates_all, dates_per_var):
+    tgt       = target_grid()
+    regridder = make_regridder(dates_per_var["chlor_a"][dates_all[0]], tgt)
+    stacks = []
+    for d in tqdm(dates_all, desc="MODIS → target grid"):
+        dt = pd.to_datetime(d, format="%Y%m%d").to_datetime64()
+        stacks.append(regrid_date(regridder, d, dates_per_var)
+                      .expand_dims(time=[dt]))
+
+    ds_out = xr.concat(stacks, dim="time").sortby("time")
 
-ds_out = xr.concat(stacks, dim="time").sortby("time")
+    # 6) write final NetCDF (zlib/compress)
+    print(f"\nWriting → {OUT_NC}")
+    ds_out.to_netcdf(
+        OUT_NC,
+        encoding={v:{"zlib":True,"complevel":4}
+                  for v in ds_out.data_vars}
+    )
+    print("✅ done")
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 6) write final NetCDF (zlib/compress)
-print(f"\nWriting → {OUT_NC}")
-ds_out.to_netcdf(
-    OUT_NC,
-    encoding={v:{"zlib":True,"complevel":4}
-              for v in ds_out.data_vars}
-)
-print("✅ done")
+# 5b) streaming: preallocated Zarr + process pool, one region per date
+_W = {}                                   # per-worker regridder / lookup
+
+def _init_worker(sample_fp, tgt, dates_per_var, out):
+    _W.update(regridder=make_regridder(sample_fp, tgt),
+              dates_per_var=dates_per_var, out=out)
+
+def _write_date(k, d):
+    ds = regrid_date(_W["regridder"], d, _W["dates_per_var"])
+    ds = ds.drop_vars([c for c in ds.coords]).expand_dims("time")
+    ds.to_zarr(_W["out"], region={"time": slice(k, k + 1)})
+    return d
+
+def preallocate(out, dates_all, tgt):
+    """Zarr skeleton: NaN (time, y, x) float32 vars, one chunk per date."""
+    times = pd.to_datetime(dates_all, format="%Y%m%d").values
+    ny, nx = tgt.lat.shape
+    skel = xr.Dataset(
+        {v: (("time", "y", "x"),
+             dsa.full((len(times), ny, nx), np.nan, dtype="float32",
+                      chunks=(1, ny, nx)))
+         for v in VAR_DIR},
+        coords={"time": times,
+                "lat": (("y", "x"), tgt.lat.values),
+                "lon": (("y", "x"), tgt.lon.values)},
+    )
+    skel.to_zarr(out, mode="w", compute=False, consolidated=True)
+
+def run_stream(dates_all, dates_per_var, out=OUT_ZARR, workers=4, inflight=None):
+    tgt       = target_grid()
+    sample_fp = dates_per_var["chlor_a"][dates_all[0]]
+    make_regridder(sample_fp, tgt)        # build / cache weights once, up front
+    preallocate(out, dates_all, tgt)
+    inflight  = inflight or 2 * workers
+
+    todo = list(enumerate(dates_all))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(sample_fp, tgt, dates_per_var, str(out))) as pool, \
+         tqdm(total=len(todo), desc="MODIS → target grid (stream)") as bar:
+        running = set()
+        while todo or running:
+            while todo and len(running) < inflight:      # bounded queue
+                running.add(pool.submit(_write_date, *todo.pop(0)))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                fut.result()                             # re-raise failures
+                bar.update()
+    print(f"✅ streamed {len(dates_all)} dates → {out}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="MODIS L3m → ERA5/CMEMS target grid")
+    ap.add_argument("--from_l3b", action="store_true",
+                    help="read raw L3b bins instead of l3mapgen L3m files")
+    ap.add_argument("--stream", action="store_true",
+                    help="parallel, write-as-you-go Zarr output")
+    ap.add_argument("--workers", type=int, default=4,
+                    help="decode/regrid processes (--stream only)")
+    ap.add_argument("--inflight", type=int, default=None,
+                    help="max dates queued at once (default 2×workers)")
+    args = ap.parse_args()
+
+    dates_all, dates_per_var = find_dates("L3b" if args.from_l3b else "L3m")
+    if args.stream:
+        run_stream(dates_all, dates_per_var,
+                   workers=args.workers, inflight=args.inflight)
+    else:
+        run_serial(dates_all, dates_per_var)
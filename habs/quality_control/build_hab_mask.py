@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 """
 quality_control/build_hab_mask.py   (writable-mask hot-fix)
+
+Reports are rasterised with the stencil rasterizer (scripts/raster_utils.py):
+legacy 0.02° planar radius by default, --radius_km for a haversine radius.
 """
 from pathlib import Path
-import numpy as np, pandas as pd, xarray as xr, geopandas as gpd
-from shapely.geometry import Point
+import argparse
+import numpy as np, pandas as pd, xarray as xr
+
+from habs.label_build.incremental_labels import write_state
+from habs.label_build.sparse_labels import sparse_path, write_sparse
+from habs.scripts.raster_utils import rasterize_points
+from habs.scripts.report_utils import load_reports, report_counts
 
 ROOT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 CUBE   = ROOT / "root_dataset_filled.nc"
@@ -12,63 +20,51 @@ CSV    = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data/bloomReportsCA.c
 OUT    = ROOT / "hab_mask.zarr"
 RADIUS = 0.02                                     # ≈ 2 km
 
+ap = argparse.ArgumentParser(description="bloom reports → hab_mask.zarr")
+ap.add_argument("--radius_km", type=float, default=None,
+                help="haversine radius in km (default: legacy 0.02° radius)")
+args = ap.parse_args()
+
 def log(step, n): print(f"{step:<35s}: {n:6d}")
 
 # ── grid & time ----------------------------------------------------------------
 print("🔹 loading MODIS cube (lon, lat, time)…")
 ds   = xr.open_dataset(CUBE)[["lon", "lat", "time"]]
 lon1d, lat1d = ds.lon.values, ds.lat.values
-lon2d, lat2d = np.meshgrid(lon1d, lat1d, indexing="xy")
 time_index   = pd.DatetimeIndex(ds.time.values)           # 207 composites
 
 # ── allocate *writable* numpy array ----------------------------------  ◀ NEW ▶
 mask_np = np.zeros((len(time_index), len(lat1d), len(lon1d)), dtype="int8")
 
-# ── CSV filters ---------------------------------------------------------------
-print("🔹 reading bloom CSV …")
-df0 = pd.read_csv(CSV, low_memory=False)
-log("rows in raw CSV", len(df0))
-
-df1 = df0.dropna(subset=["Bloom_Latitude", "Bloom_Longitude"])
-log("after drop-na lat/lon", len(df1))
-
-df1["date"] = pd.to_datetime(df1["Observation_Date"], errors="coerce")
-df2 = df1.dropna(subset=["date"])
-log("after valid date parse", len(df2))
+# ── CSV filters (typed Parquet cache, predicates pushed down) ----------------
+print("🔹 reading bloom reports (cached) …")
+counts = report_counts(CSV)
+log("rows in raw CSV", counts["rows_raw"])
+log("after drop-na lat/lon", counts["rows_latlon"])
+log("after valid date parse", counts["rows_date"])
 
 tmin, tmax = time_index.min(), time_index.max()
-df3 = df2[df2["date"].between(tmin, tmax)]
-log(f"within {tmin.date()} … {tmax.date()}", len(df3))
-
 lat_min, lat_max = lat1d.min(), lat1d.max()
 lon_min, lon_max = lon1d.min(), lon1d.max()
-df4 = df3[
-    df3["Bloom_Latitude"].between(lat_min, lat_max) &
-    df3["Bloom_Longitude"].between(lon_min, lon_max)
-]
-log("inside lon/lat bbox", len(df4))
+df4 = load_reports(CSV, start=tmin, end=tmax,
+                   bbox=(lon_min, lon_max, lat_min, lat_max))
+log(f"within {tmin.date()} … {tmax.date()} + bbox", len(df4))
 
 print(f"\nSummary of filters → kept {len(df4)} reports\n")
 if len(df4) == 0:
     raise SystemExit("🛑 0 rows left – adjust filters?")
 
-# ── GeoFrame & time snap ------------------------------------------------------
-gdf = gpd.GeoDataFrame(
-        df4,
-        geometry=gpd.points_from_xy(df4["Bloom_Longitude"], df4["Bloom_Latitude"]),
-        crs="EPSG:4326",
-)
-gdf["t_index"] = time_index.get_indexer(gdf["date"], method="nearest")
-
-# ── rasterise -------------------------------------------------------  ◀ NEW ▶
-print("🔹 rasterising bloom points (≤2-km)…")
-r2 = RADIUS**2
-for ti, grp in gdf.groupby("t_index"):
-    pts = np.vstack([grp.geometry.y.values, grp.geometry.x.values]).T
-    dy  = pts[:, 0, None, None] - lat2d
-    dx  = pts[:, 1, None, None] - lon2d
-    hit = (dy**2 + dx**2).min(axis=0) <= r2
-    mask_np[ti][hit] = 1                         # write to writable array
+# ── time snap ----------------------------------------------------------------
+t_index = time_index.get_indexer(df4["date"], method="nearest")
+df4     = df4.assign(t_index=t_index)
+
+# ── rasterise (one vectorized pass over all dates) --------------------------
+radius_txt = f"{args.radius_km:g} km" if args.radius_km else "2 km"
+print(f"🔹 rasterising bloom points (≤{radius_txt})…")
+rasterize_points(t_index, df4["Bloom_Latitude"].values, df4["Bloom_Longitude"].values,
+                 lat1d, lon1d, len(time_index), out=mask_np,
+                 radius_km=args.radius_km,
+                 radius_deg=None if args.radius_km else RADIUS)
 
 # ── wrap back into DataArray & save -------------------------------------------
 mask = xr.DataArray(
@@ -76,10 +72,16 @@ mask = xr.DataArray(
         dims=("time", "lat", "lon"),
         coords={"time": ds.time, "lat": lat1d, "lon": lon1d},
         name="hab_occurrence",
-        attrs={"description": "1 if any bloom report within 2 km of pixel"},
+        attrs={"description": f"1 if any bloom report within {radius_txt} of pixel"},
 )
 print(f"✅ writing {OUT.name}   shape {mask.shape}")
-mask.to_zarr(OUT, mode="w")
+mask.chunk({"time": 1}).to_zarr(OUT, mode="w")      # one chunk per composite
+write_sparse(mask, sparse_path(OUT), source=OUT)                 # hab_mask.sparse.zarr
+
+# rows ingested so far → incremental_labels.py only redoes what changes
+write_state(OUT, df4,
+            {"unit": "km", "value": args.radius_km} if args.radius_km
+            else {"unit": "deg", "value": RADIUS})
 print("Done.")
 
 
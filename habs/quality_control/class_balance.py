@@ -3,7 +3,8 @@
 class_balance.py  –  quick HAB / non-HAB pixel counts
 =====================================================
 
-Walks through *labels.zarr* until it finds the **first** (time, lat, lon)
+Uses *labels.sparse.zarr* (sparse_labels.py) when present and in sync
+with labels.zarr – O(nnz), no cube scan. Otherwise walks through *labels.zarr* until it finds the **first** (time, lat, lon)
 array (3-D) – no matter how deeply nested – and then prints
 
 • total water pixels  
@@ -22,6 +23,8 @@ import numpy as np
 import xarray as xr
 import zarr
 
+from habs.label_build.sparse_labels import SparseLabels, fresh_sparse
+
 # ------------------------------------------------------------------ paths ----
 ROOT  = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 STORE = ROOT / "labels.zarr"        # written by build_labels.py
@@ -44,40 +47,42 @@ def first_3d_array(znode: zarr.Group):
             return arr, name
     return None, None
 
-# ------------------------------------------------------------------ open ------
-lbl_da = None
-
-# 1) try Xarray *dataarray* opener
-try:
-    lbl_da = xr.open_dataarray(STORE, consolidated=False)
-except Exception:
-    pass
+def open_dense(store):
+    """labels.zarr → (time, lat, lon) DataArray, whatever its layout."""
+    # 1) try Xarray *dataarray* opener
+    try:
+        return xr.open_dataarray(store, consolidated=False)
+    except Exception:
+        pass
 
-# 2) try Xarray *dataset* opener
-if lbl_da is None:
+    # 2) try Xarray *dataset* opener
     try:
-        ds = xr.open_zarr(STORE, consolidated=False)
+        ds = xr.open_zarr(store, consolidated=False)
         if ds.data_vars:
-            lbl_da = ds[list(ds.data_vars)[0]]
+            return ds[list(ds.data_vars)[0]]
     except Exception:
         pass
 
-# 3) raw Zarr walk (last resort)
-if lbl_da is None:
-    root = zarr.open(str(STORE), mode="r")
+    # 3) raw Zarr walk (last resort)
+    root = zarr.open(str(store), mode="r")
     arr, key = first_3d_array(root)
     if arr is None:
         raise RuntimeError("❌  No 3-D array found anywhere inside labels.zarr")
     print(f"(found 3-D array at '{key}')")
-    lbl_da = xr.DataArray(np.asarray(arr),
-                          dims=["time", "lat", "lon"],
-                          name=key.split("/")[-1])
+    return xr.DataArray(np.asarray(arr),
+                        dims=["time", "lat", "lon"],
+                        name=key.split("/")[-1])
 
 # ------------------------------------------------------------------ stats -----
-lbl_da = lbl_da.astype("int8")        # (time, lat, lon)
-
-pos = int((lbl_da == 1).sum())
-neg = int((lbl_da == 0).sum())
+if (sp := fresh_sparse(STORE)) is not None:
+    # sparse store: positives = nnz, every other pixel is a 0
+    lab = SparseLabels(sp)
+    pos = lab.nnz
+    neg = lab.size - pos
+else:
+    lbl_da = open_dense(STORE).astype("int8")        # (time, lat, lon)
+    pos = int((lbl_da == 1).sum())
+    neg = int((lbl_da == 0).sum())
 tot = pos + neg
 
 ratio       = pos / tot if tot else 0.0
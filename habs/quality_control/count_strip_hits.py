@@ -6,25 +6,44 @@ Reports how many HAB-positive pixels fall inside / outside the coastal strip.
 """
 
 from pathlib import Path
+import argparse
 import xarray as xr
 import numpy as np
 
+from habs.label_build.sparse_labels import SparseLabels, fresh_sparse
+from habs.quality_control.shore_utils import load_strip
+
 ROOT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 LBL_Z  = ROOT / "labels.zarr"          # Dataset with var 'labels'
 STRIP  = ROOT / "coastal_strip.zarr"   # DataArray uint8 (lat, lon)
 
-# count_strip_hits.py  (only the middle changes)
-labels = xr.open_dataarray(LBL_Z)          # (time, lat, lon)
-strip  = xr.open_dataarray(STRIP)          # (lat, lon)
+ap = argparse.ArgumentParser()
+ap.add_argument("--strip_radius", default=None,
+                help="cells or km from shore_distance.zarr (default: coastal_strip.zarr)")
+args = ap.parse_args()
+
+strip  = load_strip(args.strip_radius, strip_path=STRIP)   # (lat, lon)
+
+if (sp := fresh_sparse(LBL_Z)) is not None:
+    # O(nnz): look the strip up at the positives only
+    lab   = SparseLabels(sp)
+    grid  = xr.DataArray(np.zeros(lab.shape[1:]), dims=("lat", "lon"),
+                         coords={"lat": lab.lat, "lon": lab.lon})
+    strip = strip.reindex_like(grid, method="nearest", tolerance=1e-6)
+    hits_total = lab.nnz
+    hits_strip = lab.count_in(strip.values == 1)
+else:
+    # count_strip_hits.py  (only the middle changes)
+    labels = xr.open_dataarray(LBL_Z)          # (time, lat, lon)
 
-# --- make coordinates identical ---------------------------------------------
-strip = strip.reindex_like(
-            labels.isel(time=0),           # pick any time-slice => (lat,lon)
-            method="nearest", tolerance=1e-6
-        )
+    # --- make coordinates identical -----------------------------------------
+    strip = strip.reindex_like(
+                labels.isel(time=0),           # pick any time-slice => (lat,lon)
+                method="nearest", tolerance=1e-6
+            )
 
-hits_total  = int((labels == 1).sum())
-hits_strip  = int(((labels == 1) & (strip == 1)).sum())
+    hits_total  = int((labels == 1).sum())
+    hits_strip  = int(((labels == 1) & (strip == 1)).sum())
 hits_inland = hits_total - hits_strip
 
 print(f"total HAB-positive pixels : {hits_total:,}")
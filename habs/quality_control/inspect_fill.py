@@ -4,8 +4,9 @@
 01 – Inspect-and-(optionally) fill NaNs in the MODIS fields
 -----------------------------------------------------------
 * Loads root_dataset.nc
-* Prints global min / max / NaN counts for every variable
-* Draws a quick NaN-fraction map for each MODIS layer
+* Prints global min / max / mean / std / NaN counts for every variable and
+  draws a NaN-fraction map per MODIS layer – both from one chunked pass
+  (qc_stats.py), cached next to the file until it changes
 * Optionally fills small NaN holes (< N contiguous pixels) by
   spatial nearest-neighbour, then writes a cleaned copy
   (root_dataset_filled.nc) **only if you set FILL=True**.
@@ -13,6 +14,7 @@
 Run:
     python preprocess/01_inspect_fill.py          # just stats + plots
     python preprocess/01_inspect_fill.py --fill   # fill & write new file
+    python preprocess/01_inspect_fill.py --dineof # + DINEOF for the large gaps
 """
 
 import argparse, itertools, pathlib
@@ -20,6 +22,9 @@ import xarray as xr, numpy as np, matplotlib.pyplot as plt
 import matplotlib.ticker as mt
 import scipy.ndimage as ndi
 
+from habs.quality_control.fill_utils import dineof_fill, stream_fill
+from habs.quality_control.qc_stats import qc_stats, print_table
+
 # ---------------- user paths ---------------------------------------------------
 DATA = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed/root_dataset.nc")
 OUT  = DATA.with_name("root_dataset_filled.nc")
@@ -27,39 +32,39 @@ OUT  = DATA.with_name("root_dataset_filled.nc")
 MODIS_VARS = ["chlor_a", "Kd_490", "nflh", "sst"]   # vars to inspect / fill
 FILL       = False                                  # overridden by CLI
 HOLE_SIZE  = 9                                      # max (#pixels) contiguous hole to fill
+DINEOF_VARS = MODIS_VARS                            # gap-filled by DINEOF with --dineof
 # --------------------------------------------------------------------------------
 
 # ── CLI flag -------------------------------------------------------------------
 parser = argparse.ArgumentParser(description="Inspect/fill NaNs in MODIS layers")
 parser.add_argument("--fill", action="store_true", help="fill NaNs and write *_filled.nc")
+parser.add_argument("--workers", type=int, default=8,
+                    help="threads for the QC pass / processes for --fill")
+parser.add_argument("--time_chunk", type=int, default=8,
+                    help="time steps per QC partial / fill task")
+parser.add_argument("--dineof", action="store_true",
+                    help="after --fill, DINEOF-fill the remaining gaps (implies --fill)")
+parser.add_argument("--rank_max", type=int, default=20, help="largest DINEOF rank tried")
+parser.add_argument("--workdir", type=pathlib.Path, default=None,
+                    help="keep the DINEOF matrix in an on-disk memmap here")
+parser.add_argument("--block", type=int, default=None,
+                    help="pixels per column block of the memmap path")
 args = parser.parse_args()
-FILL = args.fill
+FILL = args.fill or args.dineof
 
 # ── load -----------------------------------------------------------------------
 ds = xr.open_dataset(DATA)
 print(f"Loaded {DATA.name}   dims = {dict(ds.sizes)}")
 
-# ── quick global stats ---------------------------------------------------------
-def stats(da):
-    good = int(np.isfinite(da).sum())
-    bad  = int(np.isnan(da).sum())
-    return good, bad, da.min().values, da.max().values
-
-tbl = []
-for v, da in ds.data_vars.items():
-    good, bad, vmin, vmax = stats(da)
-    tbl.append((v, good, bad, vmin, vmax))
-
-hdr = f"{'var':12s} {'good':>9s} {'NaN':>9s} {'min':>11s} {'max':>11s}"
-print(hdr)
-print("-"*len(hdr))
-for v, g, n, lo, hi in tbl:
-    print(f"{v:12s} {g:9d} {n:9d} {lo:11.3g} {hi:11.3g}")
+# ── quick global stats + NaN maps: one cached pass (qc_stats.py) -------------
+qc, nan_maps = qc_stats(DATA, workers=args.workers,
+                        chunks={"time": args.time_chunk})
+print_table(qc)
 
 # ── NaN-fraction maps for MODIS layers -----------------------------------------
 fig, axs = plt.subplots(2, 2, figsize=(10, 7), constrained_layout=True)
 for ax, var in zip(axs.flat, MODIS_VARS):
-    frac = ds[var].isnull().mean(dim="time")        # 0 … 1
+    frac = nan_maps[var]                            # 0 … 1
     im   = frac.plot(ax=ax, vmin=0, vmax=1, cmap="magma_r",
                      cbar_kwargs={"shrink":0.7})
     ax.set_title(f"{var} – NaN fraction")
@@ -68,43 +73,17 @@ for ax, var in zip(axs.flat, MODIS_VARS):
 plt.suptitle("NaN fraction per pixel (MODIS 2016-01-09 … 2021-06-23)")
 plt.show()
 
-# ── optional in-place filling ---------------------------------------------------
+# ── optional filling (fill_utils.py: vectorised, streamed to disk) ------------
 if FILL:
-    import scipy.ndimage as ndi
-
-    def fill_small_holes(da, max_pixels=HOLE_SIZE):
-        """
-        Fill NaN blobs with ≤ max_pixels cells (per–time slice)
-        using the nearest valid neighbour.
-        """
-        filled = []
-        iy, ix = np.indices(da.shape[-2:])          # 2-D index arrays once
-        for slab in da:                             # loop over 'time' already vectorised
-            A = slab.values.copy()
-            mask  = np.isnan(A)
-            lbl, nblob = ndi.label(mask)
-            # distance to nearest valid pixel
-            dist, (j_src, i_src) = ndi.distance_transform_edt(
-                mask, return_distances=True, return_indices=True
-            )
-
-            for lab in range(1, nblob + 1):
-                blob_idx = lbl == lab
-                if blob_idx.sum() <= max_pixels:
-                    A[blob_idx] = A[j_src[blob_idx], i_src[blob_idx]]
-            filled.append(xr.DataArray(A, coords=slab.coords, dims=slab.dims))
-        return xr.concat(filled, dim=da.dims[0])
-
-    print("\n→ Filling small NaN holes in MODIS layers …")
-    for v in MODIS_VARS:
-        before = int(ds[v].isnull().sum())
-        ds[v]  = fill_small_holes(ds[v])
-        after  = int(ds[v].isnull().sum())
+    print(f"\n→ Filling small NaN holes in MODIS layers → {OUT}")
+    nans = stream_fill(DATA, OUT, MODIS_VARS, max_pixels=HOLE_SIZE,
+                       time_chunk=args.time_chunk, workers=args.workers)
+    for v, (before, after) in nans.items():
         print(f"   {v:8s}: NaNs {before:,} → {after:,}")
-
-    print(f"→ writing cleaned cube → {OUT}")
-    ds.to_netcdf(OUT,
-        encoding={var: {"zlib": True, "complevel": 4} for var in ds.data_vars})
+    if args.dineof:
+        print("→ DINEOF gap filling (cross-validated rank)")
+        dineof_fill(OUT, OUT, DINEOF_VARS, k_max=args.rank_max,
+                    workdir=args.workdir, block=args.block)
     print("✅ wrote", OUT)
 else:
     print("\n(run again with  --fill  if you want to write a cleaned file)")
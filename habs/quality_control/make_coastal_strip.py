@@ -2,13 +2,25 @@
 """
 make_coastal_strip.py
 ---------------------
-Builds a coastal-strip mask that *always* includes the shoreline row.
-
-Output:  coastal_strip.zarr   uint8  (lat, lon)
+1. Signed distance-to-shoreline field (cells + km), computed once:
+       shore_distance.zarr   float32 (lat, lon)   – see shore_utils.py
+2. Coastal-strip mask that *always* includes the shoreline row, as a plain
+   threshold of that field:
+       coastal_strip.zarr    uint8   (lat, lon)
+
+Any other radius (or band) is a lazy comparison at read time
+(shore_utils.strip_mask / band_mask, --strip_radius in the label builders
+and the dataloader) – no rerun needed.
+
+coastal_strip.zarr stores written before the signed-distance field are all
+ones (inverted EDT) – rerun this script to replace them.
 """
 from pathlib import Path
 import argparse, numpy as np, xarray as xr
-from scipy.ndimage import distance_transform_edt as dist
+
+from habs.feature_engineering.layout_utils import ocean_mask
+from habs.quality_control.shore_utils import (SHORE_Z, compute_shore_distance,
+                                              open_shore_distance, strip_mask)
 
 ROOT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 FEAT_Z = ROOT / "features.zarr"          # has static land/sea mask
@@ -16,32 +28,27 @@ OUT_Z  = ROOT / "coastal_strip.zarr"
 
 # ── CLI ---------------------------------------------------------------------
 p = argparse.ArgumentParser()
-p.add_argument("--radius", type=int, default=5,
-               help="strip half-width in grid cells (default 5)")
-R = p.parse_args().radius
-
-# ── load static mask (1 = ocean, 0 = land) ----------------------------------
-feat   = xr.open_zarr(FEAT_Z)
-mask_da = feat["features"].sel(channel="mask").isel(time=0)  # (lat,lon)
-ocean   = mask_da.values.astype(bool)                        # bool array
-
-# ── distance to land and to ocean -------------------------------------------
-dist2land  = dist(~ocean)   # ocean → nearest land
-dist2ocean = dist(ocean)    # land  → nearest ocean
-
-# Pixel is inside strip if ***either***
-#   (a) ocean-pixel closer than R to land   OR
-#   (b) land-pixel closer than R to ocean   ← adds the shoreline row
-strip_bool = ((ocean & (dist2land  <= R)) |
-              (~ocean & (dist2ocean <= R)))
-
-strip_da = xr.DataArray(
-    strip_bool.astype("uint8"),
-    coords=dict(lat=mask_da.lat, lon=mask_da.lon),
-    dims=("lat", "lon"),
-    name="coastal_strip",
-    attrs={"description": f"all pixels ≤{R} cells from shoreline"}
-).sortby("lat")                         # lat ascending
+p.add_argument("--radius", default="5",
+               help="strip half-width in grid cells (default 5) or km, e.g. 8km")
+p.add_argument("--recompute", action="store_true",
+               help="rebuild shore_distance.zarr even if it exists")
+args = p.parse_args()
+R = args.radius
+
+# ── distance field (once) -----------------------------------------------------
+if args.recompute or not SHORE_Z.exists():
+    # load static mask (1 = ocean, 0 = land)
+    feat    = xr.open_zarr(FEAT_Z)
+    mask_da = ocean_mask(feat)                                   # (lat,lon)
+    ocean   = mask_da.values.astype(bool)                        # bool array
+
+    shore = compute_shore_distance(ocean, mask_da.lat.values,
+                                   mask_da.lon.values).sortby("lat")
+    shore.chunk({"lat": -1, "lon": -1}).to_zarr(SHORE_Z, mode="w")
+    print(f"✅ wrote {SHORE_Z}")
+
+# ── strip = |distance| ≤ R   (ocean side OR land side → shoreline assured) ---
+strip_da = strip_mask(open_shore_distance(), R).load()      # lat ascending
 
 strip_da.chunk({"lat": -1, "lon": -1}).to_zarr(OUT_Z, mode="w")
-print(f"✅ wrote {OUT_Z}  (radius = {R} cells, shoreline assured)")
+print(f"✅ wrote {OUT_Z}  (radius = {R}{'' if R.endswith('km') else ' cells'}, shoreline assured)")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+qc_stats.py  –  single-pass QC statistics for any NetCDF / Zarr cube
+-------------------------------------------------------------------
+One chunked, parallel read of every variable yields, all at once:
+
+    good / NaN counts, min, max, mean, std, M2      (per variable)
+    fixed-bin histogram (symmetric log edges)       (per variable)
+    NaN-fraction map over time                      (per variable with a time dim)
+    finite-at-time-0 map (<var>_valid_t0)           (per variable with a time dim)
+    count / sum / M2 per time step                  (per variable with a time dim)
+
+Per-chunk partials are merged exactly (Chan for mean / M2), so the result
+does not depend on the chunking. Results are cached next to the store:
+
+    <store>.qc.json        scalars + histograms, keyed by the store fingerprint
+    <store>.qc_maps.zarr   NaN-fraction maps + time-0 validity maps
+
+A second call on an unchanged store costs no read at all.
+
+Run
+----
+python -m habs.quality_control.qc_stats …/root_dataset.nc [--vars chlor_a sst]
+"""
+from pathlib import Path
+import argparse, hashlib, itertools, json, os, shutil
+import numpy as np, xarray as xr, dask, dask.array
+
+from habs.scripts.virtual_utils import open_any
+
+# symmetric log bins: 0, ±10^-4 … ±10^6 with 8 bins / decade (+ under/overflow)
+_POS       = np.logspace(-4, 6, 81)
+HIST_EDGES = np.concatenate([-_POS[::-1], [0.0], _POS])
+TIME_CHUNK = 8              # default time steps per partial (contiguous NetCDF)
+
+# ── fingerprint / sidecars -------------------------------------------------------
+def fingerprint(path):
+    """size + mtime of a file, or of every file below a directory store."""
+    p = Path(path)
+    h = hashlib.sha1()
+    files = [p] if p.is_file() else sorted(f for f in p.rglob("*") if f.is_file())
+    for f in files:
+        st = f.stat()
+        h.update(f"{f.relative_to(p.parent)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+def sidecars(path):
+    p = Path(path)
+    return p.with_name(p.name + ".qc.json"), p.with_name(p.name + ".qc_maps.zarr")
+
+# ── per-chunk partials + exact merge ---------------------------------------------
+def _partial(block, taxis, edges, first=False):
+    a   = np.asarray(block, dtype="float64")
+    nan = np.isnan(a)
+    v   = a[np.isfinite(a)]
+    n   = v.size
+    out = {"n": n, "nan": int(nan.sum()), "sum": float(v.sum()),
+           "m2": float(((v - v.mean()) ** 2).sum()) if n else 0.0,
+           "min": float(v.min()) if n else np.inf,
+           "max": float(v.max()) if n else -np.inf,
+           "hist": np.histogram(np.clip(v, edges[0], edges[-1]), edges)[0]}
+    if taxis is not None:
+        out["nanmap"] = nan.sum(axis=taxis)
+        if first:                                 # block holds time step 0
+            out["valid_t0"] = np.isfinite(np.take(a, 0, axis=taxis))
+        rows = np.moveaxis(a, taxis, 0).reshape(a.shape[taxis], -1)
+        ok   = np.isfinite(rows)
+        nt   = ok.sum(axis=1)
+        st   = np.where(ok, rows, 0).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mt = np.where(nt > 0, st / nt, 0)
+        out["per_time"] = (nt, st, np.where(ok, (rows - mt[:, None]) ** 2, 0).sum(axis=1))
+    return out
+
+def _merge(a, b):
+    n = a["n"] + b["n"]
+    if n:
+        d  = b["sum"] / b["n"] - a["sum"] / a["n"] if a["n"] and b["n"] else 0.0
+        m2 = a["m2"] + b["m2"] + d * d * a["n"] * b["n"] / n
+    else:
+        m2 = 0.0
+    return {"n": n, "nan": a["nan"] + b["nan"], "sum": a["sum"] + b["sum"], "m2": m2,
+            "min": min(a["min"], b["min"]), "max": max(a["max"], b["max"]),
+            "hist": a["hist"] + b["hist"]}
+
+def _merge_rows(a, b):
+    """Element-wise Chan merge of (count, sum, M2) vectors."""
+    (na, sa, qa), (nb, sb, qb) = a, b
+    n = na + nb
+    with np.errstate(invalid="ignore", divide="ignore"):
+        d = np.where((na > 0) & (nb > 0), sb / nb - sa / na, 0)
+        q = qa + qb + np.where(n > 0, d * d * na * nb / n, 0)
+    return n, sa + sb, q
+
+def _plan(da, edges):
+    """Delayed partial per chunk + where its NaN map / time rows land."""
+    data  = da.data if dask.is_dask_collection(da.data) else \
+            dask.array.from_array(da.values, chunks=da.shape)
+    taxis = da.get_axis_num("time") if "time" in da.dims else None
+    offs  = [np.concatenate([[0], np.cumsum(c)[:-1]]) for c in data.chunks]
+    blocks = data.to_delayed()
+    parts, where = [], []
+    for idx in itertools.product(*map(range, blocks.shape)):
+        first = taxis is not None and idx[taxis] == 0
+        parts.append(dask.delayed(_partial)(blocks[idx], taxis, edges, first))
+        sl = [slice(offs[k][i], offs[k][i] + data.chunks[k][i])
+              for k, i in enumerate(idx)]
+        where.append((tuple(x for k, x in enumerate(sl) if k != taxis),
+                      sl[taxis] if taxis is not None else None))
+    return parts, where, taxis
+
+# ── engine ---------------------------------------------------------------------
+def qc_stats(path, variables=None, workers=8, chunks=None, maps=True,
+             refresh=False, edges=HIST_EDGES):
+    """
+    → (stats {var: {...}}, maps Dataset | None) – one read, or zero if cached.
+    chunks : Dask chunking for the read (default: {"time": TIME_CHUNK}, so a
+             contiguous NetCDF still splits into many bounded partials)
+    """
+    path = Path(path)
+    js, zs = sidecars(path)
+    key = {"schema": 3, "fingerprint": fingerprint(path), "variables": variables,
+           "maps": bool(maps), "edges": len(edges)}
+    if not refresh and js.exists():
+        cached = json.loads(js.read_text())
+        if cached.get("key") == key:
+            return cached["stats"], (xr.open_zarr(zs) if maps and zs.exists() else None)
+
+    ds    = open_any(path, chunks=chunks if chunks is not None else {"time": TIME_CHUNK})
+    names = variables or [v for v in ds.data_vars
+                          if np.issubdtype(ds[v].dtype, np.number)]
+    plans = {v: _plan(ds[v], edges) for v in names}
+    with dask.config.set(scheduler="threads", num_workers=workers):
+        computed = dask.compute({v: p[0] for v, p in plans.items()})[0]
+
+    stats, nanmaps = {}, {}
+    for v, parts in computed.items():
+        _, where, taxis = plans[v]
+        tot = parts[0]
+        for p in parts[1:]:
+            tot = _merge(tot, p)
+        n = tot["n"]
+        stats[v] = {"good": int(n), "nan": int(tot["nan"]),
+                    "min": tot["min"] if n else None, "max": tot["max"] if n else None,
+                    "mean": tot["sum"] / n if n else None,
+                    "std": float(np.sqrt(tot["m2"] / n)) if n else None,
+                    "m2": tot["m2"],
+                    "hist": tot["hist"].tolist()}
+        if taxis is not None:
+            T    = ds[v].sizes["time"]
+            rows = (np.zeros(T, "int64"), np.zeros(T), np.zeros(T))
+            for p, (_, ts) in zip(parts, where):
+                merged = _merge_rows(tuple(r[ts] for r in rows), p["per_time"])
+                for r, m in zip(rows, merged):
+                    r[ts] = m
+            stats[v]["per_time"] = {"count": rows[0].tolist(), "sum": rows[1].tolist(),
+                                    "m2": rows[2].tolist()}
+        if maps and taxis is not None:
+            da   = ds[v]
+            dims = [d for d in da.dims if d != "time"]
+            acc  = np.zeros([da.sizes[d] for d in dims], dtype="int64")
+            for p, (w, _) in zip(parts, where):
+                acc[w] += p["nanmap"]
+            nanmaps[v] = (dims, (acc / da.sizes["time"]).astype("float32"))
+            t0 = np.zeros(acc.shape, dtype="uint8")
+            for p, (w, _) in zip(parts, where):
+                if "valid_t0" in p:
+                    t0[w] = p["valid_t0"]
+            nanmaps[f"{v}_valid_t0"] = (dims, t0)
+
+    maps_ds = None
+    if maps and nanmaps:
+        coords  = {d: ds[d].values for dims, _ in nanmaps.values() for d in dims if d in ds.coords}
+        maps_ds = xr.Dataset(nanmaps, coords=coords)
+        shutil.rmtree(zs, ignore_errors=True)
+        maps_ds.to_zarr(zs, mode="w")
+    tmp = js.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"key": key, "edges": list(map(float, edges)),
+                               "stats": stats}, indent=1))
+    os.replace(tmp, js)
+    return stats, maps_ds
+
+def print_table(stats):
+    hdr = f"{'var':12s} {'good':>11s} {'NaN':>11s} {'min':>11s} {'max':>11s} {'mean':>11s} {'std':>11s}"
+    print(hdr)
+    print("-"*len(hdr))
+    f = lambda x: f"{x:11.3g}" if x is not None else f"{'–':>11s}"
+    for v, s in stats.items():
+        print(f"{v:12s} {s['good']:11d} {s['nan']:11d} "
+              f"{f(s['min'])} {f(s['max'])} {f(s['mean'])} {f(s['std'])}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="single-pass QC stats for a cube")
+    ap.add_argument("store", type=Path)
+    ap.add_argument("--vars", nargs="*", default=None)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--time_chunk", type=int, default=TIME_CHUNK,
+                    help="time steps per partial")
+    ap.add_argument("--no_maps", action="store_true")
+    ap.add_argument("--refresh", action="store_true", help="ignore the cached sidecar")
+    args = ap.parse_args()
+
+    stats, _ = qc_stats(args.store, args.vars, args.workers,
+                        chunks={"time": args.time_chunk},
+                        maps=not args.no_maps, refresh=args.refresh)
+    print_table(stats)
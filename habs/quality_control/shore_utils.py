@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+shore_utils.py  –  signed distance-to-shoreline field + lazy strip masks
+-----------------------------------------------------------------------
+shore_distance.zarr  (lat, lon), computed once by make_coastal_strip.py:
+
+    dist_cells  float32   + ocean pixel → nearest land   (grid cells, ≥ 1)
+                          − land  pixel → nearest ocean  (grid cells, ≤ −1)
+    dist_km     float32   same sign, great-circle km to that nearest pixel
+
+A coastal strip of any radius is then just a comparison:
+
+    shore = open_shore_distance()
+    strip = strip_mask(shore, "5")       # ≤ 5 cells (corrected strip)
+    strip = strip_mask(shore, "8km")     # ≤ 8 km
+    band  = band_mask(shore, "2km", "8km")
+
+The old make_coastal_strip.py ran the EDT on the inverted mask, so every
+pixel fell inside its strip (an all-ones coastal_strip.zarr). strip_mask
+is the corrected ≤ r strip, not that store: regenerate existing
+coastal_strip.zarr stores (make_coastal_strip.py) and everything built from
+them (coastal_labels.zarr).
+"""
+from pathlib import Path
+import numpy as np, xarray as xr
+
+ROOT    = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
+SHORE_Z = ROOT / "shore_distance.zarr"
+STRIP_Z = ROOT / "coastal_strip.zarr"
+
+# ── compute -------------------------------------------------------------------
+def compute_shore_distance(ocean, lat, lon):
+    """ocean (lat, lon) bool + 1-D coords → Dataset(dist_cells, dist_km)."""
+    from scipy.ndimage import distance_transform_edt as dist
+    from habs.scripts.raster_utils import haversine_km
+
+    ocean = np.asarray(ocean, dtype=bool)
+    # EDT measures non-zero pixels → nearest zero pixel
+    d_land,  i_land  = dist(ocean,  return_indices=True)   # ocean → nearest land
+    d_ocean, i_ocean = dist(~ocean, return_indices=True)   # land  → nearest ocean
+
+    cells = np.where(ocean, d_land, -d_ocean).astype("float32")
+    iy    = np.where(ocean, i_land[0], i_ocean[0])
+    ix    = np.where(ocean, i_land[1], i_ocean[1])
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing="ij")
+    km    = haversine_km(lat2d, lon2d, lat2d[iy, ix], lon2d[iy, ix])
+    km    = (np.sign(cells) * km).astype("float32")
+
+    coords = {"lat": lat, "lon": lon}
+    return xr.Dataset(
+        {"dist_cells": (("lat", "lon"), cells,
+                        {"units": "grid cells", "description":
+                         "+ ocean→nearest land, − land→nearest ocean"}),
+         "dist_km":    (("lat", "lon"), km,
+                        {"units": "km", "description":
+                         "great-circle km to the pixel behind dist_cells"})},
+        coords=coords)
+
+def open_shore_distance(path=SHORE_Z):
+    return xr.open_zarr(path)
+
+# ── radius helpers ------------------------------------------------------------
+def parse_radius(r):
+    """"5" / 5 → (5.0, "cells");  "8km" → (8.0, "km")."""
+    s = str(r).strip().lower()
+    if s.endswith("km"):
+        return float(s[:-2]), "km"
+    return float(s), "cells"
+
+def _abs_dist(shore, unit):
+    return abs(shore["dist_km" if unit == "km" else "dist_cells"])
+
+def strip_mask(shore, radius):
+    """uint8 (lat, lon): pixels within `radius` of the shoreline, both sides."""
+    r, unit = parse_radius(radius)
+    m = (_abs_dist(shore, unit) <= r).astype("uint8")
+    m.name = "coastal_strip"
+    m.attrs["description"] = f"all pixels ≤{radius} from shoreline"
+    return m
+
+def band_mask(shore, r_in, r_out):
+    """uint8 (lat, lon): r_in < distance ≤ r_out (same unit for both)."""
+    (a, ua), (b, ub) = parse_radius(r_in), parse_radius(r_out)
+    if ua != ub:
+        raise ValueError("band limits need the same unit")
+    d = _abs_dist(shore, ua)
+    return ((d > a) & (d <= b)).astype("uint8").rename("coastal_band")
+
+def load_strip(radius=None, shore_path=SHORE_Z, strip_path=STRIP_Z):
+    """Strip for `radius` from the distance field, or the stored coastal_strip.zarr."""
+    if radius is None:
+        return xr.open_dataarray(strip_path)
+    return strip_mask(open_shore_distance(shore_path), radius)
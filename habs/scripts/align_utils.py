@@ -1,7 +1,11 @@
 """
 Common helpers:   to_datetime, resample_8day, regrid_to_target
 """
-import numpy as np, xarray as xr, pandas as pd, pathlib, warnings
+import numpy as np, xarray as xr, pandas as pd, pathlib
+
+from habs.preprocess.composite_utils import (block_moments_8day, block_reduce_8day,
+                                             moment_mean, moment_vars)
+from habs.scripts.regrid_utils import cached_regridder
 
 # -------------------------------------------------------------------
 GRID_FILE = pathlib.Path(__file__).with_name("modis_4km_grid.npz")
@@ -17,17 +21,33 @@ def to_datetime(ds, time_dim):
     ds[time_dim] = pd.to_datetime(ds[time_dim].values, unit="s")
     return ds
 
-def resample_8day(da):
-    return (da
-            .resample(time="8D", label="left", closed="left")
-            .mean())
+def resample_8day(da, moments=False):
+    """
+    Calendar-year 8-day block mean (Jan 1, Jan 9, …) – same bins as
+    preprocess/build_8day_composites.make_8day.
+    moments=True returns a Dataset: mean + <name>_count / _sum / _m2.
+    """
+    da     = da.sortby("time")
+    axis   = da.get_axis_num("time")
+    coords = {k: c for k, c in da.coords.items() if "time" not in c.dims}
+    if not moments:
+        mean, _, starts = block_reduce_8day(da.data, da.time.values, axis)
+        return xr.DataArray(mean, dims=da.dims,
+                            coords={**coords, "time": starts},
+                            name=da.name, attrs=da.attrs)
+    n, s, q, starts = block_moments_8day(da.data, da.time.values, axis)
+    out = {da.name: (da.dims, moment_mean(s, n), da.attrs)}
+    moment_vars(out, da.name, n, s, q, da.dims)
+    return xr.Dataset(out, coords={**coords, "time": starts})
 
 # -------------------------------------------------------------------
-def regrid_to_target(da, method="bilinear"):
+def regrid_to_target(da, method="bilinear", engine="auto"):
     """
     Regrid (time,lat,lon) DataArray onto the 279×502 target grid (y,x).
-    • Uses xesmf/esmpy if available.
-    • Falls back to xarray.interp if not.
+    • engine="xesmf"  : xesmf/esmpy
+    • engine="sparse" : SciPy CSR bilinear / nearest weights (no ESMF needed)
+    • engine="auto"   : xesmf if available, else sparse
+    Weights are cached on disk either way, see regrid_utils.
     """
     # normalise coordinate names
     if "latitude" in da.dims:
@@ -35,13 +55,8 @@ def regrid_to_target(da, method="bilinear"):
     if "longitude" in da.dims:
         da = da.rename({"longitude": "lon"})
 
-    try:
-        import xesmf as xe
-        rg = xe.Regridder(da, TGT, method=method)
-        da_i = rg(da)
-    except (ImportError, ModuleNotFoundError):
-        warnings.warn("xesmf / esmpy not available – using xarray.interp")
-        da_i = da.interp(lat=TGT.lat, lon=TGT.lon, method="linear")
+    rg   = cached_regridder(da, TGT, method=method, engine=engine)
+    da_i = rg(da)
 
     # If the result still has lat/lon dims, convert them to y/x
     if {"lat", "lon"}.issubset(da_i.dims):
@@ -11,39 +11,14 @@ source "$OCSSWROOT/OCSSW_bash.env"
 DATAROOT=/Users/yashnilmohanty/Desktop/HABs_Research/Data
 OUTBASE=/Users/yashnilmohanty/Desktop/HABs_Research/Processed/modis_l3m
 
-# product   code   sub-directory name under $DATAROOT
-declare -a CONFIGS=(
-  "chlor_a CHL chlorophyll"
-  "Kd_490  KD  kd490"
-  "nflh    FLH nFLH"
-  "sst     NSST seaSurfaceTemperature"
-)
-
 mkdir -p "$OUTBASE"
 
-for cfg in "${CONFIGS[@]}"; do
-  read -r PRODUCT CODE SUBDIR <<<"$cfg"
-  INDIR="$DATAROOT/$SUBDIR"
-  OUTDIR="$OUTBASE/$SUBDIR"
-  mkdir -p "$OUTDIR"
-
-  echo "▶︎ processing $PRODUCT  from  $INDIR"
-  shopt -s nullglob                 # avoid literal pattern if no match
-  for f in "$INDIR"/AQUA_MODIS.*.L3b.8D."$CODE".x.nc; do
-      base=$(basename "$f" .L3b.8D."$CODE".x.nc)
-      year=${base:11:4}             # YYYY of first composite day
-      [[ $year -lt 2016 ]] && continue
-
-      of="$OUTDIR/${base}_4km_L3m.nc"
-      [[ -f "$of" ]] && { echo "✔︎ exists $of"; continue; }
-
-      echo "→ mapping $base  →  $(basename "$of")"
-      l3mapgen \
-          ifile="$f" ofile="$of" \
-          product="$PRODUCT" projection=platecarree \
-          west=-125 east=-115 south=32 north=50 \
-          resolution=4km oformat=netcdf4
-  done
-done
+# job matrix (product x 8-day L3b file), concurrency, atomic writes, retries
+# and the resume manifest ($OUTBASE/l3map_manifest.json) live in l3map_batch.py
+echo "▶︎ mapping chlor_a, Kd_490, nflh, sst  from  $DATAROOT"
+python3 "$(dirname "$0")/l3map_batch.py" \
+    --preset l3m \
+    --workers "${WORKERS:-8}" \
+    --manifest "$OUTBASE/l3map_manifest.json"
 
 echo "✅ all MODIS products mapped (2016-present)"
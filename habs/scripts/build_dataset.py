@@ -2,12 +2,18 @@
 """
 Merge MODIS, ERA-5, CMEMS (all 8-day × 4 km) and rasterise HAB CSV.
 Only keep dates common to *all* sources; no NaN padding.
+Virtual stacks (*_8day_4km*.refs.json, see virtual_utils.py) are read in
+place of a NetCDF copy – each product is loaded from one source only.
 """
 
-import xarray as xr, numpy as np, pandas as pd, geopandas as gpd
-from shapely.geometry import Point
+import xarray as xr, numpy as np, pandas as pd
 import pathlib, sys, warnings
 
+from habs.preprocess.composite_utils import block_starts
+from habs.scripts.raster_utils import rasterize_points
+from habs.scripts.report_utils import load_reports
+from habs.scripts.virtual_utils import open_any
+
 PROC = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/processed")
 OUT  = PROC / "HAB_dataset_8day_4km_common.nc"
 
@@ -19,7 +25,7 @@ if OUT.exists():
 def load_and_normalise(p):
     """Open NetCDF, ensure time is datetime64[ns], snap to 8-day left edge,
     drop duplicate times."""
-    ds = xr.open_dataset(p, decode_times=False)    # raw load
+    ds = open_any(p, decode_times=False)           # raw / virtual load
     if "time" not in ds:
         warnings.warn(f"{p.name} has no time coord – skipped")
         return None
@@ -27,10 +33,8 @@ def load_and_normalise(p):
     # decode CF units → datetime64
     ds = xr.decode_cf(ds)
 
-    # snap to 8-day boundaries (left)
-    ts = pd.to_datetime(ds.time.values)
-    snapped = (ts - pd.Timestamp("1970-01-01")) // pd.Timedelta("8D") * pd.Timedelta("8D") + pd.Timestamp("1970-01-01")
-    ds = ds.assign_coords(time=snapped)
+    # snap to calendar-year 8-day boundaries (left) – same bins as resample_8day
+    ds = ds.assign_coords(time=block_starts(ds.time.values))
 
     # drop duplicates, keep first
     _, index = np.unique(ds.time.values, return_index=True)
@@ -38,8 +42,15 @@ def load_and_normalise(p):
 
     return ds
 
+def product_sources(proc):
+    """One path per product: <stem>.refs.json if present, else <stem>.nc."""
+    src = {p.name[:-len(".nc")]: p for p in proc.glob("*_8day_4km*.nc")}
+    src.update({p.name[:-len(".refs.json")]: p
+                for p in proc.glob("*_8day_4km*.refs.json")})
+    return [src[k] for k in sorted(src)]
+
 print("⏳ loading and normalising NetCDFs …")
-paths = sorted(PROC.glob("*_8day_4km*.nc"))
+paths = product_sources(PROC)
 datasets = [d for p in paths if (d := load_and_normalise(p))]
 
 # ------------------------------------------------------------------
@@ -60,29 +71,20 @@ merged = xr.merge([ds.sel(time=common_time) for ds in datasets],
 
 # ------------------------------------------------------------------
 # Rasterise HAB CSV  →  hab_occurrence bool
-csv = "/Users/yashnilmohanty/Desktop/HABs_Research/Data/bloomReportsCA.csv"
-df  = pd.read_csv(csv, low_memory=False)
-df["date"] = pd.to_datetime(df["Observation_Date"], errors="coerce").dt.floor("8D")
-df = df.dropna(subset=["Bloom_Latitude", "Bloom Longitude", "date"])
-df = df[(df["date"].isin(common_time)) &
-        df["Bloom_Latitude"].between(32, 50) &
-        df["Bloom Longitude"].between(-125, -115)]
-
-gdf = gpd.GeoDataFrame(df,
-        geometry=[Point(xy) for xy in zip(df["Bloom Longitude"], df["Bloom_Latitude"])],
-        crs="EPSG:4326")
-
-lon2d, lat2d = np.meshgrid(merged.lon, merged.lat)
-mask = xr.zeros_like(merged.chlor_a, dtype=bool)
-
-for dt, grp in gdf.groupby("date"):
-    lats = grp.geometry.y.values        # 1-D array of latitudes
-    lons = grp.geometry.x.values        # 1-D array of longitudes
-    if lats.size == 0:
-        continue
-    dist2 = (lats[:, None, None] - lat2d) ** 2 + (lons[:, None, None] - lon2d) ** 2
-    hit   = dist2.min(axis=0) <= (0.02 ** 2)   # within half-cell (~2 km)
-    mask.loc[dict(time=dt)] = hit | mask.sel(time=dt)
+# typed Parquet cache (report_utils): bbox + date range pushed down
+df = load_reports(start=t0, end=pd.Timestamp(t1) + pd.Timedelta(days=7),
+                  bbox=(-125, -115, 32, 50))
+df["date"] = block_starts(df["date"].values)
+df = df[df["date"].isin(common_time)]
+
+# all dates in one pass: stencil rasteriser, same 0.02° (~2 km) radius
+t_idx = np.searchsorted(np.asarray(common_time), df["date"].values)
+mask_np = rasterize_points(t_idx, df["Bloom_Latitude"].values,
+                           df["Bloom_Longitude"].values,
+                           merged.lat.values, merged.lon.values, len(common_time),
+                           radius_deg=0.02, dtype=bool)
+mask = xr.DataArray(mask_np, dims=("time", "lat", "lon"),
+                    coords={"time": merged.time, "lat": merged.lat, "lon": merged.lon})
 
 merged["hab_occurrence"] = mask
 
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Persistent catalog of MODIS L3m / L3b granules  (SQLite, stdlib only)
+
+One row per (granule, geophysical variable):
+    path, product, level, variable, start, end, size, mtime, checksum
+
+Granules with none of GEO_VARS get a single placeholder row (variable = '')
+so they are not re-opened on every scan; queries never return it.
+
+• scan() is incremental – files whose (size, mtime) are unchanged are not
+  touched, new / changed files are inspected on a thread pool, vanished
+  files are dropped. Unreadable / truncated files are logged and skipped
+  (retried on the next scan).
+• query() / complete_dates() answer "which granules for these variables in
+  this date range" without opening a single NetCDF.
+• checksum = sha1 of size + first and last MiB (cheap change detector,
+  not a full-content hash).
+
+Run:
+    python -m habs.scripts.granule_catalog --scan …/Data …/Processed/modis_l3m
+    python -m habs.scripts.granule_catalog --query chlor_a,sst --start 2016-01-01
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse, hashlib, re, sqlite3
+import pandas as pd
+
+DEFAULT_DB = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed/granule_catalog.sqlite")
+
+GEO_VARS = ("chlor_a", "Kd_490", "nflh", "sst")          # what we care about
+DATE_RE  = re.compile(r"\.(\d{8})_(\d{8})")              # AQUA_MODIS.YYYYMMDD_YYYYMMDD
+CODE_RE  = re.compile(r"\.L3b\.\w+\.(\w+)\.")            # ….L3b.8D.CHL.x.nc → CHL
+PATTERNS = ("*_4km_L3m.nc", "*.L3m.*.nc", "*.L3b.*.nc")
+NO_VAR   = ""                                            # placeholder row
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS granules (
+    path     TEXT NOT NULL,
+    product  TEXT,
+    level    TEXT,
+    variable TEXT NOT NULL,
+    start    TEXT,
+    end      TEXT,
+    size     INTEGER,
+    mtime    INTEGER,
+    checksum TEXT,
+    PRIMARY KEY (path, variable)
+);
+CREATE INDEX IF NOT EXISTS granules_var_start ON granules (variable, start);
+"""
+
+# ------------------------------------------------------------------ helpers ---
+def quick_checksum(path, size, nbytes=2**20):
+    h = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(nbytes))
+        if size > nbytes:
+            f.seek(max(nbytes, size - nbytes))
+            h.update(f.read(nbytes))
+    return h.hexdigest()
+
+def _level(name):
+    return "L3b" if ".L3b." in name else "L3m"
+
+def _iso(s):
+    return pd.Timestamp(s).strftime("%Y-%m-%dT%H:%M:%S") if s else None
+
+def inspect(path):
+    """
+    Metadata of one granule (reads the header only):
+    list of row dicts, one per geophysical variable found
+    (one NO_VAR placeholder if there is none).
+    """
+    import h5py                                    # thread-safe (global lock),
+                                                   # unlike netCDF4
+    p    = Path(path)
+    st   = p.stat()
+    code = CODE_RE.search(p.name)
+    with h5py.File(p, "r") as f:
+        attr  = lambda k: (v.decode() if isinstance(v := f.attrs.get(k), bytes) else v)
+        start = attr("time_coverage_start")
+        end   = attr("time_coverage_end")
+        names = set(f.keys())
+        if "level-3_binned_data" in f:
+            names |= set(f["level-3_binned_data"].keys())
+    if not start:                                  # fall back to the file name
+        m = DATE_RE.search(p.name)
+        if m:
+            start, end = m.group(1), m.group(2) + "T23:59:59"
+    base = {
+        "path":     str(p),
+        "product":  code.group(1) if code else p.parent.name,
+        "level":    _level(p.name),
+        "start":    _iso(start),
+        "end":      _iso(end),
+        "size":     st.st_size,
+        "mtime":    st.st_mtime_ns,
+        "checksum": quick_checksum(p, st.st_size),
+    }
+    return [dict(base, variable=v) for v in GEO_VARS if v in names] \
+        or [dict(base, variable=NO_VAR)]
+
+def _try_inspect(path):
+    """inspect(), but a broken file → ([], error) instead of an exception."""
+    try:
+        return inspect(path), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+# ------------------------------------------------------------------ catalog ---
+class GranuleCatalog:
+    def __init__(self, db=DEFAULT_DB):
+        self.db  = Path(db)
+        self.db.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.db)
+        self.con.row_factory = sqlite3.Row
+        self.con.executescript(SCHEMA)
+
+    def close(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------ scanning ---------------------------------------------------
+    def scan(self, roots, patterns=PATTERNS, workers=16):
+        """
+        Incrementally index every granule under `roots`.
+        Returns (n_new_or_changed, n_removed, n_unchanged).
+        """
+        seen = {}
+        for root in map(Path, roots):
+            for pat in patterns:
+                for p in root.rglob(pat):
+                    st = p.stat()
+                    seen[str(p)] = (st.st_size, st.st_mtime_ns)
+
+        known = {r["path"]: (r["size"], r["mtime"]) for r in
+                 self.con.execute("SELECT DISTINCT path, size, mtime FROM granules")}
+        in_roots = lambda path: any(Path(path).is_relative_to(r) for r in map(Path, roots))
+        todo     = [p for p, sig in seen.items() if known.get(p) != sig]
+        gone     = [p for p in known if p not in seen and in_roots(p)]
+
+        rows = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for p, (rs, err) in zip(todo, pool.map(_try_inspect, todo)):
+                if err:
+                    print(f"⚠️  skipped unreadable granule {p}: {err}")
+                rows += rs
+
+        with self.con:
+            self.con.executemany("DELETE FROM granules WHERE path = ?",
+                                 [(p,) for p in todo + gone])
+            self.con.executemany(
+                "INSERT INTO granules VALUES (:path, :product, :level, :variable,"
+                " :start, :end, :size, :mtime, :checksum)", rows)
+        return len(todo), len(gone), len(seen) - len(todo)
+
+    # ------------ queries ----------------------------------------------------
+    def query(self, variables=None, start=None, end=None, level=None, product=None):
+        """Rows whose coverage *starts* inside [start, end], ordered by start."""
+        sql, args = "SELECT * FROM granules WHERE variable != ?", [NO_VAR]
+        if variables:
+            variables = [variables] if isinstance(variables, str) else list(variables)
+            sql += f" AND variable IN ({','.join('?' * len(variables))})"
+            args += variables
+        if start:
+            sql += " AND start >= ?";  args.append(_iso(start))
+        if end:
+            sql += " AND start <= ?";  args.append(_iso(pd.Timestamp(end) + pd.Timedelta("1D") - pd.Timedelta("1s")))
+        if level:
+            sql += " AND level = ?";   args.append(level)
+        if product:
+            sql += " AND product = ?"; args.append(product)
+        return [dict(r) for r in self.con.execute(sql + " ORDER BY start, variable", args)]
+
+    def complete_dates(self, variables, start=None, end=None, level="L3m"):
+        """{YYYYMMDD: {var: path}} for composite dates where *all* variables exist."""
+        by_date = {}
+        for r in self.query(variables, start, end, level=level):
+            d = pd.Timestamp(r["start"]).strftime("%Y%m%d")
+            by_date.setdefault(d, {})[r["variable"]] = r["path"]
+        return {d: vp for d, vp in sorted(by_date.items())
+                if set(vp) >= set(variables)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="MODIS granule catalog")
+    ap.add_argument("--db", type=Path, default=DEFAULT_DB)
+    ap.add_argument("--scan", nargs="*", default=[], help="root dirs to (re)index")
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--query", help="comma-separated variables")
+    ap.add_argument("--start")
+    ap.add_argument("--end")
+    args = ap.parse_args()
+
+    with GranuleCatalog(args.db) as cat:
+        if args.scan:
+            new, gone, same = cat.scan(args.scan, workers=args.workers)
+            print(f"✅ indexed: {new} new/changed, {gone} removed, {same} unchanged")
+        if args.query:
+            rows = cat.query(args.query.split(","), args.start, args.end)
+            for r in rows:
+                print(f"{r['start'][:10]}  {r['variable']:8s} {r['level']}  {r['path']}")
+            print(f"{len(rows)} granules")
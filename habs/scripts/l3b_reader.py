@@ -0,0 +1,98 @@
+"""
+Native reader for MODIS L3b (integerized sinusoidal bins) → target grid.
+
+Replaces  L3b ─l3mapgen→ L3m ─regrid→ target  with one vectorized lookup:
+
+    cells = L3bGridder(lat2d, lon2d)             # bin number of every cell (once)
+    grid  = cells.map_file(path, ["chlor_a"])    # {var: (y, x) float32}
+
+Bin layout (OBPG L3 binning scheme, NUMROWS rows from the BinIndex table):
+    latbin[r] = (r + 0.5)·180/NUMROWS − 90
+    numbin[r] = int(2·NUMROWS·cos(latbin[r]) + 0.5)
+    basebin[r] = 1 + Σ numbin[:r]
+    bin(lat, lon) = basebin[row(lat)] + int((lon + 180)·numbin[row]/360)
+Bin values are sum / weights, looked up in the sorted BinList by searchsorted;
+cells whose bin is not filled are NaN.
+"""
+import numpy as np, xarray as xr
+
+GROUP = "level-3_binned_data"
+
+# -------------------------------------------------------------------
+def bin_layout(numrows):
+    """numbin, basebin per row of the integerized sinusoidal grid."""
+    latbin  = (np.arange(numrows) + 0.5) * (180.0 / numrows) - 90.0
+    numbin  = (2 * numrows * np.cos(np.deg2rad(latbin)) + 0.5).astype(np.int64)
+    basebin = np.concatenate([[1], 1 + np.cumsum(numbin)[:-1]])
+    return numbin, basebin
+
+def bin_numbers(lat, lon, numrows=4320):
+    """Bin number (1-based) containing every (lat, lon) – any shape, vectorized."""
+    numbin, basebin = bin_layout(numrows)
+    lat = np.asarray(lat, dtype="float64")
+    lon = (np.asarray(lon, dtype="float64") + 180.0) % 360.0 - 180.0
+    row = np.clip(((lat + 90.0) * numrows / 180.0).astype(np.int64), 0, numrows - 1)
+    col = np.minimum(((lon + 180.0) * numbin[row] / 360.0).astype(np.int64),
+                     numbin[row] - 1)
+    return basebin[row] + col
+
+def read_l3b(path, products):
+    """
+    Raw bins of one L3b file:
+    (bin_num int64 sorted, {product: mean float32}, numrows).
+    """
+    import h5py
+
+    with h5py.File(path, "r") as f:
+        g       = f[GROUP]
+        numrows = g["BinIndex"].shape[0]
+        blist   = g["BinList"][:]
+        bins    = blist["bin_num"].astype(np.int64)
+        w       = blist["weights"].astype("float64")
+        means   = {}
+        for p in products:
+            s = g[p]["sum"].astype("float64")
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[p] = (s / w).astype("float32")
+    if bins.size and np.any(np.diff(bins) < 0):             # spec says sorted,
+        order = np.argsort(bins, kind="stable")             # don't rely on it
+        bins  = bins[order]
+        means = {p: m[order] for p, m in means.items()}
+    return bins, means, numrows
+
+# -------------------------------------------------------------------
+class L3bGridder:
+    """Precomputed target-cell → bin index; maps L3b bin lists onto (y, x)."""
+
+    def __init__(self, lat2d, lon2d, numrows=4320):
+        self.shape    = np.shape(lat2d)
+        self.lat2d    = np.asarray(lat2d)
+        self.lon2d    = np.asarray(lon2d)
+        self._index   = {}                       # numrows → flat cell bins
+        self.cell_bins(numrows)
+
+    def cell_bins(self, numrows):
+        if numrows not in self._index:
+            self._index[numrows] = bin_numbers(self.lat2d, self.lon2d, numrows).ravel()
+        return self._index[numrows]
+
+    def to_grid(self, bins, values, numrows):
+        """Scatter sorted `bins` / `values` onto the target cells (NaN = empty)."""
+        want = self.cell_bins(numrows)
+        out  = np.full(want.size, np.nan, dtype="float32")
+        if bins.size:
+            idx = np.minimum(np.searchsorted(bins, want), bins.size - 1)
+            hit = bins[idx] == want
+            out[hit] = values[idx[hit]]
+        return out.reshape(self.shape)
+
+    def map_file(self, path, products):
+        bins, means, numrows = read_l3b(path, products)
+        return {p: self.to_grid(bins, means[p], numrows) for p in products}
+
+    def __call__(self, path, product):
+        """DataArray (y, x) of one product – drop-in for an xESMF regridder call."""
+        return xr.DataArray(self.map_file(path, [product])[product], dims=("y", "x"),
+                            coords={"lat": (("y", "x"), self.lat2d),
+                                    "lon": (("y", "x"), self.lon2d)},
+                            name=product)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Parallel, resumable l3mapgen batch driver.
+
+A job = one (product, 8-day window) pair:
+    {"id": "chlor_a/20160101", "ifile": …L3b…, "ofile": …, "params": {k: v}}
+
+• --workers l3mapgen processes run at once (a thread per running job just
+  launches + waits on its subprocess, the real work happens in l3mapgen).
+• outputs are written to a hidden temp name and os.replace()d into place on
+  success, so an existing output is always a complete one.
+• a JSON manifest (<outdir>/l3map_manifest.json) records status, attempts,
+  wall time and the last error of every job; finished jobs are skipped on
+  the next run, failed ones are retried up to --retries times per run.
+• --cmd swaps the binary (e.g. a stand-in script for tests).
+
+Run:
+    python -m habs.scripts.l3map_batch --preset l3m --workers 8
+    python -m habs.scripts.l3map_batch --preset chl_map --cmd "python fake_l3mapgen.py"
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import argparse, datetime, json, os, shlex, subprocess, time
+
+OCSSWROOT = "/Users/yashnilmohanty/SeaDAS/ocssw"
+DATAROOT  = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data")
+L3M_OUT   = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed/modis_l3m")
+
+BOUNDS = dict(west=-125, east=-115, south=32, north=50, resolution="4km")
+
+# product   code   sub-directory name under DATAROOT
+PRODUCTS = {
+    "chlor_a": ("CHL",  "chlorophyll"),
+    "Kd_490":  ("KD",   "kd490"),
+    "nflh":    ("FLH",  "nFLH"),
+    "sst":     ("NSST", "seaSurfaceTemperature"),
+}
+
+# ── job matrix ────────────────────────────────────────────────────────────────
+def windows(first_year, last_year, last_start=None):
+    """8-day windows restarting on 1 Jan each year → [(YYYYMMDD, YYYYMMDD)]."""
+    step, out = datetime.timedelta(days=8), []
+    for year in range(first_year, last_year + 1):
+        cur = datetime.date(year, 1, 1)
+        while cur.year == year and (last_start is None or cur <= last_start):
+            end = cur + step - datetime.timedelta(days=1)
+            out.append((cur.strftime("%Y%m%d"), end.strftime("%Y%m%d")))
+            cur += step
+    return out
+
+def l3m_jobs(dataroot=DATAROOT, outbase=L3M_OUT, first_year=2016):
+    """Every L3b 8-day file (≥ first_year) → 4-km Plate-Carrée NetCDF."""
+    jobs = []
+    for product, (code, subdir) in PRODUCTS.items():
+        suffix = f".L3b.8D.{code}.x.nc"
+        for f in sorted((dataroot/subdir).glob(f"AQUA_MODIS.*{suffix}")):
+            base = f.name[:-len(suffix)]
+            if int(base[11:15]) < first_year:       # YYYY of first composite day
+                continue
+            jobs.append({"id": f"{product}/{base[11:19]}", "ifile": str(f),
+                         "ofile": str(outbase/subdir/f"{base}_4km_L3m.nc"),
+                         "params": {"product": product, "projection": "platecarree",
+                                    **BOUNDS, "oformat": "netcdf4"}})
+    return jobs
+
+def chl_map_jobs(chl_dir=DATAROOT/"chlorophyll"):
+    """map_chl.sh: every CHL L3b file → <name>.L3m.….map.nc next to it."""
+    return [{"id": f"chlor_a/{f.name[11:19]}", "ifile": str(f),
+             "ofile": str(f).replace(".L3b.", ".L3m.")[:-3] + ".map.nc",
+             "params": {"product": "chlor_a", **BOUNDS,
+                        "projection": "platecarree"}}
+            for f in sorted(Path(chl_dir).glob("*.L3b.8D.CHL.x.nc"))]
+
+PRESETS = {"l3m": l3m_jobs, "chl_map": chl_map_jobs}
+
+# ── manifest ──────────────────────────────────────────────────────────────────
+def load_manifest(path):
+    path = Path(path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+def write_manifest(path, state):
+    path = Path(path)
+    tmp  = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=1, sort_keys=True))
+    os.replace(tmp, path)
+
+# ── running ───────────────────────────────────────────────────────────────────
+def ocssw_env(root=OCSSWROOT):
+    env = dict(os.environ, OCSSWROOT=root, OCDATAROOT=f"{root}/share")
+    env["PATH"] = f"{root}/bin:" + env["PATH"]
+    return env
+
+def temp_path(ofile):
+    """Hidden sibling with the same suffix (l3mapgen looks at the extension)."""
+    ofile = Path(ofile)
+    return ofile.with_name(f".{ofile.stem}.part{ofile.suffix}")
+
+def run_job(job, command=("l3mapgen",), env=None, timeout=None):
+    """One l3mapgen call into a temp file, renamed into place on success."""
+    ofile = Path(job["ofile"])
+    tmp   = temp_path(ofile)
+    ofile.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [*command, f"ifile={job['ifile']}", f"ofile={tmp}",
+           *(f"{k}={v}" for k, v in job["params"].items())]
+    t0 = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True,
+                              timeout=timeout)
+        if proc.returncode != 0:
+            raise RuntimeError(f"exit {proc.returncode}: "
+                               f"{(proc.stderr or proc.stdout).strip()[-500:]}")
+        if not tmp.exists():
+            raise RuntimeError("command succeeded but wrote no output")
+        os.replace(tmp, ofile)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return time.perf_counter() - t0
+
+PNG_SIG, PNG_END = b"\x89PNG\r\n\x1a\n", b"IEND\xaeB`\x82"
+
+def output_ok(path):
+    """Cheap completeness check for an output without a ledger record."""
+    path = Path(path)
+    try:
+        if path.stat().st_size == 0:
+            return False
+        if path.suffix == ".png":
+            with open(path, "rb") as f:
+                head = f.read(8)
+                f.seek(-8, os.SEEK_END)
+                return head == PNG_SIG and f.read(8) == PNG_END
+        if path.suffix == ".nc":
+            import h5py
+            with h5py.File(path, "r") as f:           # truncated files fail here
+                return len(f.keys()) > 0
+    except (OSError, ValueError):
+        return False
+    return True
+
+def run_jobs(jobs, manifest, workers=4, retries=2, command=("l3mapgen",),
+             env=None, timeout=None, adopt_existing=False):
+    """
+    Run all not-yet-done jobs, `workers` at a time, updating `manifest` after
+    every finished job. Returns {status: count}.
+    adopt_existing: outputs with no ledger record count as done, but only
+    if they pass output_ok() (half-written files from a crash are rerun).
+    """
+    state = load_manifest(manifest)
+    todo  = []
+    for job in jobs:
+        rec = state.setdefault(job["id"], {"attempts": 0})
+        rec["ofile"] = job["ofile"]
+        done = rec.get("status") == "done" or (
+            adopt_existing and "status" not in rec and output_ok(job["ofile"]))
+        if done and Path(job["ofile"]).exists():
+            rec["status"] = "done"
+            continue
+        if not Path(job["ifile"]).is_file():
+            rec.update(status="missing", error=f"no input {job['ifile']}")
+            continue
+        rec["status"] = "pending"
+        todo.append(job)
+    write_manifest(manifest, state)
+    print(f"→ {len(todo)} jobs to run, {len(jobs) - len(todo)} done / skipped")
+
+    attempt = 0
+    while todo and attempt <= retries:
+        failed = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futs = {pool.submit(run_job, j, command, env, timeout): j for j in todo}
+            for fut in as_completed(futs):
+                job, rec = futs[fut], state[futs[fut]["id"]]
+                rec["attempts"] += 1
+                try:
+                    rec.update(status="done", seconds=round(fut.result(), 2), error=None)
+                    print(f"✔︎ {job['id']}  {rec['seconds']:.1f}s")
+                except Exception as e:
+                    rec.update(status="failed", error=str(e))
+                    failed.append(job)
+                    print(f"❌ {job['id']} (attempt {rec['attempts']}): {e}")
+                write_manifest(manifest, state)
+        todo, attempt = failed, attempt + 1
+
+    summary = {}
+    for job in jobs:
+        s = state[job["id"]]["status"]
+        summary[s] = summary.get(s, 0) + 1
+    return summary
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="parallel, resumable l3mapgen batches")
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="l3m")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--retries", type=int, default=2)
+    ap.add_argument("--timeout", type=float, default=None,
+                    help="seconds before a single l3mapgen call is killed")
+    ap.add_argument("--cmd", default="l3mapgen",
+                    help="command to run instead of l3mapgen (tests / wrappers)")
+    ap.add_argument("--ocsswroot", default=os.environ.get("OCSSWROOT", OCSSWROOT))
+    ap.add_argument("--manifest", type=Path, default=None)
+    ap.add_argument("--adopt_existing", action="store_true",
+                    help="count valid-looking outputs from earlier (non-atomic) runs as done")
+    args = ap.parse_args()
+
+    jobs     = PRESETS[args.preset]()
+    manifest = args.manifest or (L3M_OUT if args.preset == "l3m"
+                                 else DATAROOT/"chlorophyll")/"l3map_manifest.json"
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    summary  = run_jobs(jobs, manifest, args.workers, args.retries,
+                        shlex.split(args.cmd), ocssw_env(args.ocsswroot), args.timeout,
+                        args.adopt_existing)
+    print("✅ " + "  ".join(f"{k}={v}" for k, v in sorted(summary.items())))
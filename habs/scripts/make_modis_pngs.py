@@ -8,17 +8,20 @@ chlor_a, Kd_490, nflh and sst, saving each variable in its own folder:
     ~/Desktop/plots/nflh/
     ~/Desktop/plots/sst/
 
-Run with:  python3 make_modis_pngs.py
+Jobs run in parallel through l3map_batch.py (atomic outputs, resumable via
+~/Desktop/plots/l3map_manifest.json).
+
+Run with:  python3 make_modis_pngs.py [--workers 8]
 """
 
-import subprocess, os, datetime, pathlib
+import argparse, os, datetime, pathlib
+from l3map_batch import ocssw_env, run_jobs, windows
 
 # ----------------------------------------------------------------------
 # 0.  Point Python at your OCSSW install
 # ----------------------------------------------------------------------
 OCSSWROOT = "/Users/yashnilmohanty/SeaDAS/ocssw"
-os.environ["OCSSWROOT"] = OCSSWROOT
-os.environ["PATH"] = f"{OCSSWROOT}/bin:" + os.environ["PATH"]   # puts l3mapgen on PATH
+ENV       = ocssw_env(OCSSWROOT)                                 # puts l3mapgen on PATH
 
 # ----------------------------------------------------------------------
 # 1.  Define file templates and plotting parameters
@@ -54,51 +57,46 @@ FEATURES = {
 BOUNDS = dict(west=-125, east=-115, south=32, north=50, resolution="4km")
 
 # ----------------------------------------------------------------------
-# 2.  Walk through every 8‑day composite, restarting 1 Jan each year
+# 2.  Every 8‑day composite (restarting 1 Jan each year) × every variable
 # ----------------------------------------------------------------------
-STEP = datetime.timedelta(days=8)
 FIRST_YEAR, LAST_YEAR = 2016, 2025
 GLOBAL_END = datetime.date(2025, 1, 1)        # last start date
+PLOTS      = pathlib.Path("/Users/yashnilmohanty/Desktop/plots")
 
-for year in range(FIRST_YEAR, LAST_YEAR + 1):
-    current = datetime.date(year, 1, 1)
-    while current <= GLOBAL_END and current.year == year:
-        period_end = current + STEP - datetime.timedelta(days=1)
-        s = current.strftime("%Y%m%d")
-        e = period_end.strftime("%Y%m%d")
-
+def png_jobs():
+    jobs = []
+    for s, e in windows(FIRST_YEAR, LAST_YEAR, GLOBAL_END):
         for name, cfg in FEATURES.items():
+            jobs.append({
+                "id": f"{name}/{s}",
+                "ifile": cfg["template"].format(start=s, end=e),
+                "ofile": str(PLOTS / name / f"{name}_{s}_{e}.png"),
+                "params": {
+                    "product": cfg["product"],
+                    "projection": "platecarree",
+                    **BOUNDS,
+                    "oformat": "png",
+                    "apply_pal": "yes",
+                    "scale_type": cfg["scale"],
+                    "datamin": cfg["datamin"],
+                    "datamax": cfg["datamax"],
+                },
+            })
+    return jobs
 
-            # create ~/Desktop/plots/<variable>/ if it doesn’t exist
-            outdir = pathlib.Path(f"/Users/yashnilmohanty/Desktop/plots/{name}")
-            outdir.mkdir(parents=True, exist_ok=True)
-
-            infile  = cfg["template"].format(start=s, end=e)
-            outfile = outdir / f"{name}_{s}_{e}.png"
-            if outfile.exists():
-                continue                    # already done
-            if not os.path.isfile(infile):
-                print(f"⚠️  Missing file, skipping: {infile}")
-                continue
-
-            cmd = [
-                "l3mapgen",
-                f"ifile={infile}",
-                f"ofile={outfile}",
-                f"product={cfg['product']}",
-                "projection=platecarree",
-                *(f"{k}={v}" for k, v in BOUNDS.items()),
-                "oformat=png",
-                "apply_pal=yes",
-                f"scale_type={cfg['scale']}",
-                f"datamin={cfg['datamin']}",
-                f"datamax={cfg['datamax']}",
-            ]
-            print("→", outfile.relative_to(outdir.parent))
-            try:
-                subprocess.run(cmd, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"❌  {name} failed for {s}: {e}. Continuing…")
+# ----------------------------------------------------------------------
+# 3.  Run them, --workers at a time
+# ----------------------------------------------------------------------
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="MODIS 8-day PNG maps")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--retries", type=int, default=1)
+    ap.add_argument("--adopt_existing", action="store_true",
+                    help="count valid PNGs from earlier runs as done")
+    args = ap.parse_args()
 
-        # next 8‑day block
-        current += STEP
+    PLOTS.mkdir(parents=True, exist_ok=True)
+    summary = run_jobs(png_jobs(), PLOTS / "l3map_manifest.json",
+                       workers=args.workers, retries=args.retries, env=ENV,
+                       adopt_existing=args.adopt_existing)
+    print("✅ " + "  ".join(f"{k}={v}" for k, v in sorted(summary.items())))
@@ -6,7 +6,7 @@ re-grid to the MODIS 4-km grid (2016-01-01 → 2021-06-30).
 Outputs  →  processed/cmems_<var>_8day_4km.nc
 """
 
-from align_utils import to_datetime, resample_8day, regrid_to_modis
+from align_utils import to_datetime, resample_8day, regrid_to_target
 import xarray as xr, os, pathlib
 
 # ----------------------------------------------------------------------
@@ -47,7 +47,7 @@ for var, fname in FILES.items():
 
     # ---- 8-day mean and regrid ----
     da8  = resample_8day(ds[var])
-    da4k = regrid_to_modis(da8)
+    da4k = regrid_to_target(da8)
 
     da4k.to_netcdf(out)
     print(f"✅ wrote {out.name}")
@@ -3,12 +3,19 @@
 Resample 6-hourly ERA-5 fields to 8-day means and re-grid to
 the MODIS 4 km Plate-Carrée grid, for the 2016-2024 window.
 
+Every source file is opened and reduced once for all of its variables
+(u10/v10 and t2m/d2m share a file) with the fused 6-hourly → 8-day reducer.
+  --weighting sample : every 6-hourly step weighs the same (default)
+  --weighting daily  : daily means first, then the block mean
+                       (= build_8day_composites.py two-stage definition)
+
 Output → one NetCDF per variable in
   .../processed/era5_<var>_8day_4km.nc
 """
 
-from align_utils import to_datetime, resample_8day, regrid_to_modis
-import xarray as xr, os, pathlib
+from align_utils import to_datetime, regrid_to_target
+from habs.preprocess.composite_utils import fused_8day
+import xarray as xr, argparse, pathlib
 
 ERA_DIR   = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data/era5")
 OUT_DIR   = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/processed")
@@ -23,25 +30,39 @@ ERA_VARS = {
     "d2m"        : "data_stream-oper_stepType-instant.nc",
 }
 
+ap = argparse.ArgumentParser()
+ap.add_argument("--weighting", choices=["sample", "daily"], default="sample",
+                help="6-hourly samples or daily means weigh equally")
+args = ap.parse_args()
+
+# group variables by source file → one open / one pass per file
+BY_FILE = {}
 for v, fname in ERA_VARS.items():
-    out = OUT_DIR / f"era5_{v}_8day_4km.nc"
-    if out.exists():
-        print(f"✔︎ {out.name} exists — skip")
+    BY_FILE.setdefault(fname, []).append(v)
+
+for fname, vars_ in BY_FILE.items():
+    todo = [v for v in vars_
+            if not (OUT_DIR / f"era5_{v}_8day_4km.nc").exists()]
+    for v in set(vars_) - set(todo):
+        print(f"✔︎ era5_{v}_8day_4km.nc exists — skip")
+    if not todo:
         continue
 
     src = ERA_DIR / fname
     if not src.is_file():
         raise FileNotFoundError(src)
 
-    print(f"⏳ processing {v} from {fname}")
+    print(f"⏳ processing {', '.join(todo)} from {fname}")
     ds = (xr.open_dataset(src, engine="netcdf4", decode_times=False)
             .rename({"valid_time": "time"}))
 
     ds = to_datetime(ds, "time").sel(time=slice("2016-01-01", "2024-12-31"))
 
-    da8 = resample_8day(ds[v])          # 8-day mean
-    da8 = da8.rename({"latitude": "lat", "longitude": "lon"})
-    da4 = regrid_to_modis(da8)          # 4 km grid
+    ds8 = fused_8day(ds[todo], weighting=args.weighting).load()   # 8-day means
+    ds8 = ds8.rename({"latitude": "lat", "longitude": "lon"})
 
-    da4.to_netcdf(out)
-    print(f"✅ wrote {out.name}")
+    for v in todo:
+        out = OUT_DIR / f"era5_{v}_8day_4km.nc"
+        da4 = regrid_to_target(ds8[v])      # 4 km grid
+        da4.to_netcdf(out)
+        print(f"✅ wrote {out.name}")
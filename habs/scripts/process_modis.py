@@ -1,9 +1,19 @@
 #!/usr/bin/env python3
 """
 Concatenate mapped MODIS-Aqua 8-day L3m files (2016-2024) on a 4-km grid.
+
+Granules + composite start dates come from the granule catalog
+(granule_catalog.py, rescanned incrementally here), so only the files in the
+window are ever opened.
+
+--virtual writes modis_8day_4km_2016_2024.refs.json instead: a chunk
+reference index over the granules themselves (virtual_utils.py), opened as
+one lazy (time, lat, lon) Dataset without copying any data.
 """
 
-import xarray as xr, pathlib, numpy as np, pandas as pd, sys, glob, datetime as dt
+import xarray as xr, pathlib, numpy as np, pandas as pd, sys, glob, datetime as dt, argparse
+from granule_catalog import GranuleCatalog
+from virtual_utils import build_refs, write_refs
 
 BASE = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed/modis_l3m")
 OUT  = pathlib.Path("/Users/yashnilmohanty/Desktop/HABs_Research/processed/modis_8day_4km_2016_2024.nc")
@@ -18,39 +28,45 @@ PRODUCTS = {
 
 T0, T1 = np.datetime64("2016-01-01"), np.datetime64("2024-12-31")
 
+ap = argparse.ArgumentParser(description="stack MODIS 8-day L3m granules")
+ap.add_argument("--virtual", action="store_true",
+                help="write a zero-copy reference index instead of a NetCDF")
+args = ap.parse_args()
+if args.virtual:
+    OUT = OUT.with_suffix(".refs.json")
+
 if OUT.exists():
     print("✔︎", OUT, "already exists — skipping")
     sys.exit()
 
+with GranuleCatalog() as cat:
+    new, gone, _ = cat.scan([BASE])
+    print(f"🗂  catalog: {new} new/changed, {gone} removed")
+    rows = {var: cat.query(varname, T0, T1, level="L3m", product=subdir)
+            for var, (subdir, varname) in PRODUCTS.items()}
+
+if args.virtual:
+    files_by_var = {varname: {pd.Timestamp(r["start"]).strftime("%Y%m%d"): r["path"]
+                              for r in rows[var]}
+                    for var, (subdir, varname) in PRODUCTS.items()}
+    write_refs(build_refs(files_by_var), OUT)
+    print("✅ wrote", OUT, "(open with virtual_utils.open_virtual)")
+    sys.exit()
+
 all_ds = []
 for var, (subdir, varname) in PRODUCTS.items():
-    files = sorted((BASE / subdir).glob("*_4km_L3m.nc"))
-    if not files:
-        raise FileNotFoundError(f"No files in {BASE/subdir}")
+    if not rows[var]:
+        raise FileNotFoundError(f"No {varname} granules in {BASE/subdir} for 2016-2024")
 
     rasters = []
-    for fp in files:
-        ds = xr.open_dataset(fp, engine="netcdf4")
-        # ---- extract composite start date from global attribute ----
-        t_start_str = ds.attrs.get("time_coverage_start")
-        if not t_start_str:
-            print(f"  ⚠︎ no time_coverage_start in {fp.name}")
-            continue
-        t0 = np.datetime64(pd.to_datetime(t_start_str))
-        if not (T0 <= t0 <= T1):
-            continue
-
-        if varname not in ds:
-            print(f"  ⚠︎ variable {varname} not in {fp.name}")
-            continue
-
+    for r in rows[var]:
+        # ---- composite start date straight from the catalog ----
+        t0 = np.datetime64(pd.to_datetime(r["start"]))
+        ds = xr.open_dataset(r["path"], engine="netcdf4")
         da = ds[varname].expand_dims(time=[t0]).astype("float32")
         rasters.append(da)
 
     print(f"⏳ {var}: kept {len(rasters)} composites in 2016-2024 window")
-    if not rasters:
-        raise RuntimeError(f"{var}: zero rasters after filtering")
-
     merged = xr.concat(rasters, dim="time").sortby("time")
     all_ds.append(merged.to_dataset(name=var))
 
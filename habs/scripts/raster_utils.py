@@ -0,0 +1,87 @@
+"""
+Point → (time, lat, lon) rasterizer for bloom reports.
+
+Instead of a dense (n_points, H, W) distance array per date, every report is
+bucketed into its nearest grid cell and only the cells of a small stencil
+around it are tested against the radius – O(n_points · stencil) for all dates
+in one vectorized pass:
+
+    mask = rasterize_points(t_idx, lat, lon, lat1d, lon1d, n_time, radius_km=2)
+
+• radius_km  : great-circle (haversine) radius
+• radius_deg : legacy planar radius in degrees, √(Δlat² + Δlon²) ≤ r
+lat1d / lon1d may be ascending or descending (any monotonic spacing).
+"""
+import numpy as np
+
+EARTH_KM = 6371.0088
+
+# -------------------------------------------------------------------
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = np.deg2rad(lat1), np.deg2rad(lat2)
+    a = (np.sin((p2 - p1) / 2) ** 2 +
+         np.cos(p1) * np.cos(p2) * np.sin(np.deg2rad(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def nearest_index(coord1d, x):
+    """Index of the nearest coordinate for every x (monotonic coord1d)."""
+    c     = np.asarray(coord1d)
+    desc  = c[0] > c[-1]
+    cs    = c[::-1] if desc else c
+    j     = np.clip(np.searchsorted(cs, x), 1, cs.size - 1)
+    j    -= (x - cs[j - 1]) < (cs[j] - x)
+    return cs.size - 1 - j if desc else j
+
+def _half_width(coord1d, radius_deg):
+    step = np.abs(np.diff(coord1d)).min() if len(coord1d) > 1 else np.inf
+    return int(np.ceil(radius_deg / step)) + 1
+
+# -------------------------------------------------------------------
+def rasterize_points(t_idx, lat, lon, lat1d, lon1d, n_time,
+                     radius_km=None, radius_deg=None, out=None, dtype="int8"):
+    """
+    Mark every (t, cell) whose centre lies within the radius of a report.
+    Returns `out` (allocated as zeros (n_time, nlat, nlon) if not given).
+    """
+    if (radius_km is None) == (radius_deg is None):
+        raise ValueError("give exactly one of radius_km / radius_deg")
+    lat1d, lon1d = np.asarray(lat1d, "float64"), np.asarray(lon1d, "float64")
+    if out is None:
+        out = np.zeros((n_time, lat1d.size, lon1d.size), dtype=dtype)
+
+    t_idx = np.asarray(t_idx, dtype=np.int64)
+    lat   = np.asarray(lat, dtype="float64")
+    lon   = np.asarray(lon, dtype="float64")
+    ok    = (t_idx >= 0) & (t_idx < n_time) & np.isfinite(lat) & np.isfinite(lon)
+    if not ok.any():
+        return out
+
+    # bucket: duplicate reports collapse, each point → its nearest cell
+    pts       = np.unique(np.stack([t_idx[ok], lat[ok], lon[ok]], axis=1), axis=0)
+    t, la, lo = pts[:, 0].astype(np.int64), pts[:, 1], pts[:, 2]
+    i0, j0    = nearest_index(lat1d, la), nearest_index(lon1d, lo)
+
+    # stencil big enough for the widest (most poleward) point
+    if radius_km is not None:
+        r_lat = radius_km / (np.pi * EARTH_KM / 180)
+        r_lon = r_lat / max(np.cos(np.deg2rad(np.abs(la).max() + r_lat)), 1e-6)
+    else:
+        r_lat = r_lon = radius_deg
+    hi, hj = _half_width(lat1d, r_lat), _half_width(lon1d, r_lon)
+    di, dj = np.meshgrid(np.arange(-hi, hi + 1), np.arange(-hj, hj + 1), indexing="ij")
+
+    ii = i0[:, None] + di.ravel()                       # (n_points, stencil)
+    jj = j0[:, None] + dj.ravel()
+    inside = (ii >= 0) & (ii < lat1d.size) & (jj >= 0) & (jj < lon1d.size)
+    ii, jj = np.clip(ii, 0, lat1d.size - 1), np.clip(jj, 0, lon1d.size - 1)
+
+    if radius_km is not None:
+        hit = haversine_km(la[:, None], lo[:, None], lat1d[ii], lon1d[jj]) <= radius_km
+    else:
+        hit = ((la[:, None] - lat1d[ii]) ** 2 +
+               (lo[:, None] - lon1d[jj]) ** 2) <= radius_deg ** 2
+    hit &= inside
+
+    tt = np.broadcast_to(t[:, None], ii.shape)
+    out[tt[hit], ii[hit], jj[hit]] = 1
+    return out
@@ -0,0 +1,284 @@
+"""
+Regridding helpers:   grid_fingerprint, cached_regridder, SparseRegridder
+
+Two engines behind one call:
+• "xesmf"  – ESMF weights (needs esmpy)
+• "sparse" – pure NumPy/SciPy: bilinear / nearest weights as a CSR matrix,
+             applied to the whole (time, lat*lon) stack in one sparse matmul,
+             NaN-normalised, Dask-aware. The production path on nodes
+             without ESMF; "auto" picks it when xesmf can't be imported.
+
+Weights are expensive (minutes for 0.083° → 4 km), so every regridder
+is keyed by a hash of the source / target coordinates, the method and the
+periodicity and its weights are kept on disk:
+
+    $HABS_REGRID_CACHE   (default ~/.cache/habs/regrid)
+    $HABS_REGRID_CACHE_MB  size cap, least-recently-used files evicted first
+"""
+import hashlib, importlib.util, os, pathlib, warnings
+import numpy as np
+import xarray as xr
+import scipy.sparse as sp
+
+CACHE_DIR    = pathlib.Path(os.environ.get("HABS_REGRID_CACHE",
+                                           "~/.cache/habs/regrid")).expanduser()
+CACHE_MAX_MB = float(os.environ.get("HABS_REGRID_CACHE_MB", 2048))
+
+_LIVE = {}                       # in-process: key → regridder object
+
+# -------------------------------------------------------------------
+def _grid_arrays(obj):
+    """lat / lon (and cell bounds, if any) of a Dataset / DataArray."""
+    names = [("lat", "latitude"), ("lon", "longitude"),
+             ("lat_b",), ("lon_b",)]
+    out = []
+    for alts in names:
+        for n in alts:
+            if n in obj.coords or n in getattr(obj, "data_vars", {}):
+                out.append(np.asarray(obj[n].values))
+                break
+    return out
+
+def grid_fingerprint(src, tgt, method, periodic=False):
+    """sha1 over source + target coordinates, method and periodicity."""
+    h = hashlib.sha1(f"{method}|{bool(periodic)}".encode())
+    for obj in (src, tgt):
+        for a in _grid_arrays(obj):
+            a = np.ascontiguousarray(a, dtype="float64")
+            h.update(str(a.shape).encode())
+            h.update(a.tobytes())
+        h.update(b"||")
+    return h.hexdigest()
+
+def prune_cache(cache_dir=CACHE_DIR, max_mb=CACHE_MAX_MB, keep=()):
+    """Delete least-recently-used weight files until the cache fits `max_mb`."""
+    files = sorted([*pathlib.Path(cache_dir).glob("*.nc"),
+                    *pathlib.Path(cache_dir).glob("*.npz")],
+                   key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in files)
+    keep  = {pathlib.Path(k) for k in keep}
+    for p in files:
+        if total <= max_mb * 2**20:
+            break
+        if p in keep:
+            continue
+        total -= p.stat().st_size
+        p.unlink(missing_ok=True)
+
+def cache_file(src, tgt, method="bilinear", periodic=False, cache_dir=CACHE_DIR,
+               engine="xesmf"):
+    key = grid_fingerprint(src, tgt, method, periodic)
+    if engine == "sparse":
+        return f"sparse-{key}", pathlib.Path(cache_dir) / f"sparse-{method}_{key[:20]}.npz"
+    return key, pathlib.Path(cache_dir) / f"{method}_{key[:20]}.nc"
+
+# -------------------------------------------------------------------
+def _axis_bilinear(src, pts):
+    """Left/right neighbour + right weight of `pts` on a 1-D (any order) axis."""
+    order = np.argsort(src)
+    s     = src[order]
+    i     = np.clip(np.searchsorted(s, pts, side="right") - 1, 0, s.size - 2)
+    w     = (pts - s[i]) / (s[i + 1] - s[i])
+    ok    = (pts >= s[0]) & (pts <= s[-1])
+    return order[i], order[i + 1], np.clip(w, 0, 1), ok
+
+def _axis_nearest(src, pts):
+    """Nearest neighbour of `pts` on a 1-D axis (half a cell beyond the ends)."""
+    order = np.argsort(src)
+    s     = src[order]
+    i     = np.clip(np.searchsorted(s, pts), 1, s.size - 1)
+    i    -= (pts - s[i - 1]) < (s[i] - pts)
+    half  = 0.5 * np.abs(np.diff(s)[[0, -1]])
+    ok    = (pts >= s[0] - half[0]) & (pts <= s[-1] + half[1])
+    return order[i], ok
+
+class SparseRegridder:
+    """
+    Rectilinear (1-D lat / lon) source → any lat/lon target, as a CSR matrix
+    W (n_target × n_source). Calling it on a DataArray / Dataset regrids
+    every variable carrying both source dims:
+
+        out = (W @ x̃) / (W @ valid)      x̃ = x with NaN → 0
+
+    i.e. weights are re-normalised over the valid neighbours and cells with
+    no valid neighbour stay NaN. Dask inputs stay lazy (one task per chunk,
+    horizontal dims must be a single chunk).
+    """
+    METHODS = ("bilinear", "nearest_s2d")
+
+    def __init__(self, weights, src_dims, src_shape, tgt_dims, tgt_coords):
+        self.weights    = weights.tocsr()
+        self.src_dims   = tuple(src_dims)
+        self.src_shape  = tuple(src_shape)
+        self.tgt_dims   = tuple(tgt_dims)
+        self.tgt_coords = tgt_coords            # {name: (dims, values)}
+
+    # ------------ construction ---------------------------------------
+    @classmethod
+    def from_grids(cls, src, tgt, method="bilinear"):
+        method = "nearest_s2d" if method == "nearest" else method
+        if method not in cls.METHODS:
+            raise ValueError(f"sparse engine supports {cls.METHODS}, not {method!r}")
+        slat, slon = _grid_arrays(src)[:2]
+        if slat.ndim != 1 or slon.ndim != 1:
+            raise ValueError("sparse engine needs a rectilinear (1-D lat/lon) source")
+        src_dims = (_coord(src, "lat").dims[0], _coord(src, "lon").dims[0])
+
+        tlat, tlon = _coord(tgt, "lat"), _coord(tgt, "lon")
+        if tlat.ndim == 1:
+            tgt_dims   = (tlat.dims[0], tlon.dims[0])
+            glon, glat = np.meshgrid(tlon.values, tlat.values)
+            tgt_coords = {"lat": (tgt_dims[:1], tlat.values),
+                          "lon": (tgt_dims[1:], tlon.values)}
+        else:
+            tgt_dims   = tlat.dims
+            glat, glon = tlat.values, tlon.values
+            tgt_coords = {"lat": (tgt_dims, glat), "lon": (tgt_dims, glon)}
+        glat, glon = glat.ravel(), glon.ravel()
+        nlon, rows = slon.size, np.arange(glat.size)
+
+        if method == "bilinear":
+            y0, y1, wy, oky = _axis_bilinear(slat, glat)
+            x0, x1, wx, okx = _axis_bilinear(slon, glon)
+            ok   = oky & okx
+            cols = [y0 * nlon + x0, y0 * nlon + x1, y1 * nlon + x0, y1 * nlon + x1]
+            vals = [(1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx]
+            r = np.concatenate([rows[ok]] * 4)
+            c = np.concatenate([a[ok] for a in cols])
+            v = np.concatenate([a[ok] for a in vals])
+        else:
+            yi, oky = _axis_nearest(slat, glat)
+            xi, okx = _axis_nearest(slon, glon)
+            ok = oky & okx
+            r, c, v = rows[ok], (yi * nlon + xi)[ok], np.ones(ok.sum())
+
+        W = sp.csr_matrix((v, (r, c)), shape=(glat.size, slat.size * nlon))
+        W.eliminate_zeros()
+        return cls(W, src_dims, (slat.size, nlon), tgt_dims, tgt_coords)
+
+    def to_npz(self, path):
+        W = self.weights
+        np.savez(path, data=W.data, indices=W.indices, indptr=W.indptr,
+                 shape=np.array(W.shape), src_dims=np.array(self.src_dims),
+                 src_shape=np.array(self.src_shape),
+                 tgt_dims=np.array(self.tgt_dims),
+                 tgt_lat_dims=np.array(self.tgt_coords["lat"][0]),
+                 tgt_lon_dims=np.array(self.tgt_coords["lon"][0]),
+                 tgt_lat=self.tgt_coords["lat"][1],
+                 tgt_lon=self.tgt_coords["lon"][1])
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path) as z:
+            W = sp.csr_matrix((z["data"], z["indices"], z["indptr"]),
+                              shape=tuple(z["shape"]))
+            coords = {"lat": (tuple(z["tgt_lat_dims"]), z["tgt_lat"]),
+                      "lon": (tuple(z["tgt_lon_dims"]), z["tgt_lon"])}
+            return cls(W, tuple(z["src_dims"]), tuple(z["src_shape"]),
+                       tuple(z["tgt_dims"]), coords)
+
+    # ------------ application ----------------------------------------
+    @property
+    def tgt_shape(self):
+        sizes = {}
+        for dims, vals in self.tgt_coords.values():
+            sizes.update(zip(dims, np.shape(vals)))
+        return tuple(sizes[d] for d in self.tgt_dims)
+
+    def apply(self, a):
+        """NumPy (..., nlat, nlon) → (..., *target shape), NaN-normalised."""
+        lead  = a.shape[:-2]
+        x     = a.reshape(-1, a.shape[-2] * a.shape[-1]).T       # (n_src, N)
+        valid = np.isfinite(x)
+        num   = self.weights @ np.where(valid, x, 0).astype("float64")
+        den   = self.weights @ valid.astype("float64")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = np.where(den > 1e-12, num / den, np.nan)
+        dtype = np.result_type(a.dtype, np.float32)
+        return out.T.reshape(*lead, *self.tgt_shape).astype(dtype)
+
+    def _regrid_da(self, da):
+        out = xr.apply_ufunc(
+            self.apply, da,
+            input_core_dims=[list(self.src_dims)],
+            output_core_dims=[list(self.tgt_dims)],
+            exclude_dims=set(self.src_dims),
+            dask="parallelized",
+            output_dtypes=[np.result_type(da.dtype, np.float32)],
+            dask_gufunc_kwargs={"output_sizes": dict(zip(self.tgt_dims,
+                                                         self.tgt_shape))},
+            keep_attrs=True,
+        )
+        return out.assign_coords({k: v for k, v in self.tgt_coords.items()})
+
+    def __call__(self, obj):
+        if isinstance(obj, xr.DataArray):
+            return self._regrid_da(obj)
+        out = {v: self._regrid_da(da) for v, da in obj.data_vars.items()
+               if set(self.src_dims) <= set(da.dims)}
+        return xr.Dataset(out, attrs=obj.attrs)
+
+def _coord(obj, name):
+    for n in {"lat": ("lat", "latitude"), "lon": ("lon", "longitude")}[name]:
+        if n in obj.coords or n in getattr(obj, "data_vars", {}):
+            return obj[n]
+    raise KeyError(f"no {name} coordinate")
+
+def has_xesmf():
+    return importlib.util.find_spec("xesmf") is not None
+
+# -------------------------------------------------------------------
+def cached_regridder(src, tgt, method="bilinear", periodic=False,
+                     cache_dir=CACHE_DIR, max_mb=CACHE_MAX_MB, engine="auto"):
+    """
+    Regridder (xesmf.Regridder or SparseRegridder) whose weights are reused
+    whenever the same grids, method and periodicity come back – within this
+    process or a later one. Stale weights can't be picked up: changing a
+    grid changes the key. engine="auto" → xesmf if importable, else sparse.
+    """
+    if engine == "auto":
+        engine = "xesmf" if has_xesmf() else "sparse"
+    if engine == "sparse" and periodic:
+        raise ValueError("sparse engine is regional only (periodic=False)")
+
+    key, fn = cache_file(src, tgt, method, periodic, cache_dir, engine)
+    if key in _LIVE:
+        return _LIVE[key]
+
+    fn.parent.mkdir(parents=True, exist_ok=True)
+    if engine == "sparse":
+        rg = None
+        if fn.is_file():
+            try:
+                rg = SparseRegridder.from_npz(fn)
+            except Exception as e:                 # truncated / foreign file
+                warnings.warn(f"unreadable regrid weights {fn.name} ({e}) – rebuilding")
+                fn.unlink(missing_ok=True)
+        if rg is None:
+            rg  = SparseRegridder.from_grids(src, tgt, method)
+            tmp = fn.with_suffix(f".{os.getpid()}.tmp.npz")
+            rg.to_npz(tmp)
+            os.replace(tmp, fn)
+        os.utime(fn)
+        prune_cache(cache_dir, max_mb, keep=[fn])
+        _LIVE[key] = rg
+        return rg
+
+    import xesmf as xe
+    if fn.is_file():
+        try:
+            rg = xe.Regridder(src, tgt, method=method, periodic=periodic,
+                              weights=str(fn))
+        except Exception as e:                     # truncated / foreign file
+            warnings.warn(f"unreadable regrid weights {fn.name} ({e}) – rebuilding")
+            fn.unlink(missing_ok=True)
+    if not fn.is_file():
+        rg  = xe.Regridder(src, tgt, method=method, periodic=periodic)
+        tmp = fn.with_suffix(f".{os.getpid()}.tmp")
+        rg.to_netcdf(str(tmp))
+        os.replace(tmp, fn)                        # atomic publish
+    os.utime(fn)                                   # LRU: mark as recently used
+    prune_cache(cache_dir, max_mb, keep=[fn])
+
+    _LIVE[key] = rg
+    return rg
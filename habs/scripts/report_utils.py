@@ -0,0 +1,125 @@
+"""
+Typed, cached ingest of the bloom-report CSV.
+
+The raw CSV is parsed once into a Parquet dataset next to it
+(bloomReportsCA.csv → bloomReportsCA.parquet/year=YYYY/…) with a normalized
+schema:
+
+    column names   stripped, spaces → "_"   ("Bloom Longitude" → "Bloom_Longitude")
+    date           datetime64  (Observation_Date, unparseable rows dropped)
+    Bloom_Latitude / Bloom_Longitude   float64 (rows without a position dropped)
+    row_hash       uint64 content hash of the raw CSV row
+    year           partition key
+
+The cache is rebuilt when the CSV's size / mtime change *and* its sha1 differs
+(_meta.json). load_reports() pushes bbox + date predicates down to Parquet, so
+callers only ever materialize the rows they need:
+
+    df = load_reports(start="2016-01-01", end="2021-06-30",
+                      bbox=(-125, -115, 32, 50))
+"""
+from pathlib import Path
+import hashlib, json, os, shutil
+import pandas as pd
+
+CSV     = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Data/bloomReportsCA.csv")
+SCHEMA_VERSION = 1
+
+# -------------------------------------------------------------------
+def cache_dir(csv=CSV):
+    return Path(csv).with_suffix(".parquet")
+
+def file_sha1(path, block=2**20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(block):
+            h.update(chunk)
+    return h.hexdigest()
+
+def normalize(raw):
+    """Raw CSV frame → typed frame (see module doc) + row counts per filter."""
+    raw = raw.rename(columns=lambda c: str(c).strip().replace(" ", "_"))
+    df  = raw.assign(row_hash=pd.util.hash_pandas_object(raw, index=False).values)
+    counts = {"rows_raw": len(df)}
+
+    for c in ("Bloom_Latitude", "Bloom_Longitude"):
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    df = df.dropna(subset=["Bloom_Latitude", "Bloom_Longitude"])
+    counts["rows_latlon"] = len(df)
+
+    df = df.assign(date=pd.to_datetime(df["Observation_Date"], errors="coerce"))
+    df = df.dropna(subset=["date"])
+    counts["rows_date"] = len(df)
+
+    # free-text columns → string so every partition has one Arrow type
+    other = [c for c in df.columns if df[c].dtype == object]
+    df = df.astype({c: "string" for c in other})
+    df["year"] = df["date"].dt.year.astype("int16")
+    return df.reset_index(drop=True), counts
+
+# -------------------------------------------------------------------
+def _meta_path(cache):
+    return Path(cache) / "_meta.json"
+
+def is_fresh(csv=CSV, cache=None):
+    """True if the cache matches the CSV (size+mtime, else sha1)."""
+    cache = Path(cache or cache_dir(csv))
+    if not _meta_path(cache).exists():
+        return False
+    meta = json.loads(_meta_path(cache).read_text())
+    if meta.get("schema") != SCHEMA_VERSION:
+        return False
+    st = os.stat(csv)
+    if (meta["size"], meta["mtime"]) == (st.st_size, st.st_mtime_ns):
+        return True
+    if meta["size"] == st.st_size and meta["sha1"] == file_sha1(csv):
+        meta["mtime"] = st.st_mtime_ns                    # touched, not changed
+        _meta_path(cache).write_text(json.dumps(meta, indent=1))
+        return True
+    return False
+
+def ingest(csv=CSV, cache=None, force=False):
+    """(Re)build the Parquet cache if stale; returns its directory."""
+    csv, cache = Path(csv), Path(cache or cache_dir(csv))
+    if not force and is_fresh(csv, cache):
+        return cache
+
+    st = os.stat(csv)
+    df, counts = normalize(pd.read_csv(csv, low_memory=False))
+    tmp = cache.with_name(cache.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    df.to_parquet(tmp, partition_cols=["year"], index=False)
+    _meta_path(tmp).write_text(json.dumps(
+        {"source": str(csv), "size": st.st_size, "mtime": st.st_mtime_ns,
+         "sha1": file_sha1(csv), "schema": SCHEMA_VERSION, **counts}, indent=1))
+    shutil.rmtree(cache, ignore_errors=True)
+    os.replace(tmp, cache)
+    print(f"🗂  cached {counts['rows_date']:,} typed reports → {cache}")
+    return cache
+
+def report_counts(csv=CSV):
+    """Row counts of the ingest filters (raw / with lat-lon / with date)."""
+    meta = json.loads(_meta_path(ingest(csv)).read_text())
+    return {k: meta[k] for k in ("rows_raw", "rows_latlon", "rows_date")}
+
+def load_reports(csv=CSV, start=None, end=None, bbox=None, columns=None):
+    """
+    Typed reports with date in [start, end] and inside
+    bbox = (west, east, south, north) – filters pushed down to Parquet.
+    """
+    cache   = ingest(csv)
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        filters += [("year", ">=", start.year), ("date", ">=", start)]
+    if end is not None:
+        end = pd.Timestamp(end)
+        filters += [("year", "<=", end.year), ("date", "<=", end)]
+    if bbox is not None:
+        w, e, s, n = bbox
+        filters += [("Bloom_Longitude", ">=", w), ("Bloom_Longitude", "<=", e),
+                    ("Bloom_Latitude",  ">=", s), ("Bloom_Latitude",  "<=", n)]
+    df = pd.read_parquet(cache, columns=columns, filters=filters or None)
+    if "year" in df:
+        df["year"] = df["year"].astype("int16")
+    return df
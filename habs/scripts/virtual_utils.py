@@ -0,0 +1,179 @@
+"""
+Virtual (zero-copy) time stacks over per-date NetCDF4 / HDF5 granules.
+
+scan → one JSON reference index (kerchunk / fsspec "reference://" layout,
+Zarr v2 metadata + [path, offset, length] for every HDF5 chunk); open → one
+lazy xarray Dataset whose chunks are read straight out of the granules.
+
+    refs = build_refs({"chlor_a": {"20160101": fp, …}, "sst": {…}})
+    write_refs(refs, OUT.with_suffix(".refs.json"))
+    ds   = open_virtual(OUT.with_suffix(".refs.json"))      # (time, lat, lon)
+
+• stacked variables get a leading time axis, one chunk row per date; a date
+  missing for one variable simply has no chunk keys → fill value (NaN).
+• dimension coordinates (lat, lon, …) are referenced from the first granule.
+• only the HDF5 filters Zarr can replay are supported: shuffle + deflate.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import base64, json, os
+import numpy as np, pandas as pd, xarray as xr
+
+HDF5_ATTRS = {"DIMENSION_LIST", "REFERENCE_LIST", "CLASS", "NAME",
+              "_Netcdf4Dimid", "_Netcdf4Coordinates", "_nc3_strict"}
+
+# -------------------------------------------------------------------
+def _json_attr(v):
+    if isinstance(v, bytes):
+        return v.decode(errors="replace")
+    if isinstance(v, np.ndarray):
+        v = v.tolist()
+        return v[0] if len(v) == 1 else v
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+def _attrs(obj):
+    out = {}
+    for k, v in obj.attrs.items():
+        if k in HDF5_ATTRS:
+            continue
+        try:
+            out[k] = _json_attr(v)
+        except (TypeError, ValueError):
+            continue                                   # references etc.
+    return out
+
+def _dims(ds):
+    own = ds.name.rsplit("/", 1)[-1]
+    if ds.ndim == 1 and _json_attr(ds.attrs.get("CLASS", b"")) == "DIMENSION_SCALE":
+        return [own]                                   # coordinate variable
+    return [d[0].name.rsplit("/", 1)[-1] if len(d) else f"dim_{i}"
+            for i, d in enumerate(ds.dims)]
+
+def _codecs(ds):
+    filters = []
+    if ds.shuffle:
+        filters.append({"id": "shuffle", "elementsize": ds.dtype.itemsize})
+    if ds.fletcher32 or (ds.compression not in (None, "gzip")):
+        raise ValueError(f"{ds.name}: filter {ds.compression!r} "
+                         "cannot be read through a reference index")
+    compressor = ({"id": "zlib", "level": int(ds.compression_opts or 4)}
+                  if ds.compression == "gzip" else None)
+    return filters or None, compressor
+
+def _fill(ds):
+    fv = ds.fillvalue
+    if np.issubdtype(ds.dtype, np.floating) and np.isnan(fv):
+        return "NaN"
+    return _json_attr(np.asarray(fv, dtype=ds.dtype)[()])
+
+def scan_variable(path, name):
+    """
+    Chunk layout of one HDF5 dataset:
+    {"meta": {.zarray fields}, "attrs": {…}, "chunks": {(i, j, …): [path, off, len]}}
+    """
+    import h5py
+
+    with h5py.File(path, "r") as f:
+        ds = f[name]
+        filters, compressor = _codecs(ds)
+        chunks = ds.chunks or ds.shape
+        meta = {"shape": list(ds.shape), "chunks": list(chunks),
+                "dtype": ds.dtype.str, "fill_value": _fill(ds),
+                "filters": filters, "compressor": compressor,
+                "order": "C", "zarr_format": 2}
+        attrs = {**_attrs(ds), "_ARRAY_DIMENSIONS": _dims(ds)}
+        refs  = {}
+        if ds.chunks is None:
+            off = ds.id.get_offset()
+            if off is not None:
+                refs[(0,) * ds.ndim] = [str(path), off, ds.id.get_storage_size()]
+        else:
+            for k in range(ds.id.get_num_chunks()):
+                info = ds.id.get_chunk_info(k)
+                idx  = tuple(o // c for o, c in zip(info.chunk_offset, chunks))
+                refs[idx] = [str(path), info.byte_offset, info.size]
+    return {"meta": meta, "attrs": attrs, "chunks": refs}
+
+def _key(name, idx):
+    return f"{name}/" + (".".join(map(str, idx)) if idx else "0")
+
+def _put_array(refs, name, meta, attrs):
+    refs[f"{name}/.zarray"] = json.dumps(meta)
+    refs[f"{name}/.zattrs"] = json.dumps(attrs)
+
+# -------------------------------------------------------------------
+def build_refs(files_by_var, dates=None, workers=16):
+    """
+    files_by_var : {var: {YYYYMMDD: path}}   (e.g. modis_to_target dates_per_var)
+    dates        : time axis (default: union of all dates, sorted)
+    Returns the reference dict (version 1 layout).
+    """
+    import h5py
+
+    dates = sorted(dates or {d for per in files_by_var.values() for d in per})
+    jobs  = [(v, t, per[d]) for v, per in files_by_var.items()
+             for t, d in enumerate(dates) if d in per]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        scans = list(pool.map(lambda j: scan_variable(j[2], j[0]), jobs))
+
+    refs = {".zgroup": json.dumps({"zarr_format": 2}),
+            ".zattrs": json.dumps({})}
+    first = {}
+    for (v, t, path), sc in zip(jobs, scans):
+        if v not in first:
+            first[v] = (path, sc)
+            meta = dict(sc["meta"], shape=[len(dates)] + sc["meta"]["shape"],
+                        chunks=[1] + sc["meta"]["chunks"])
+            _put_array(refs, v, meta, {**sc["attrs"], "_ARRAY_DIMENSIONS":
+                                       ["time"] + sc["attrs"]["_ARRAY_DIMENSIONS"]})
+        elif sc["meta"]["shape"] != first[v][1]["meta"]["shape"] or \
+             sc["meta"]["chunks"] != first[v][1]["meta"]["chunks"]:
+            raise ValueError(f"{path}: {v} layout differs from {first[v][0]}")
+        for idx, ref in sc["chunks"].items():
+            refs[_key(v, (t,) + idx)] = ref
+
+    # dimension coordinates, referenced once from the first granule
+    for v, (path, sc) in first.items():
+        with h5py.File(path, "r") as f:
+            for dim in sc["attrs"]["_ARRAY_DIMENSIONS"]:
+                if f"{dim}/.zarray" in refs or dim not in f or \
+                   _json_attr(f[dim].attrs.get("NAME", b"")).startswith("This is a netCDF dimension"):
+                    continue
+                c = scan_variable(path, dim)
+                _put_array(refs, dim, c["meta"], c["attrs"])
+                for idx, ref in c["chunks"].items():
+                    refs[_key(dim, idx)] = ref
+
+    # the new time axis, inlined
+    days = ((pd.to_datetime(dates, format="%Y%m%d") - pd.Timestamp("1970-01-01"))
+            .days.values.astype("<i8"))
+    _put_array(refs, "time",
+               {"shape": [len(days)], "chunks": [max(len(days), 1)], "dtype": "<i8",
+                "fill_value": None, "filters": None, "compressor": None,
+                "order": "C", "zarr_format": 2},
+               {"_ARRAY_DIMENSIONS": ["time"], "units": "days since 1970-01-01",
+                "calendar": "proleptic_gregorian"})
+    refs["time/0"] = "base64:" + base64.b64encode(days.tobytes()).decode()
+    return {"version": 1, "refs": refs}
+
+def write_refs(refs, path):
+    path = Path(path)
+    tmp  = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(refs))
+    os.replace(tmp, path)
+    return path
+
+def open_virtual(path, chunks={}, **kw):
+    """Lazy Dataset over a reference index (needs fsspec + zarr<3)."""
+    return xr.open_dataset("reference://", engine="zarr", chunks=chunks,
+                           backend_kwargs={"consolidated": False,
+                                           "storage_options": {"fo": str(path)}},
+                           **kw)
+
+def open_any(path, **kw):
+    """*.refs.json → open_virtual, anything else → xr.open_dataset."""
+    if str(path).endswith(".refs.json"):
+        return open_virtual(path, **kw)
+    return xr.open_dataset(path, **kw)
@@ -7,20 +7,13 @@ export PATH="$OCSSWROOT/bin:$PATH"
 
 CHL_DIR="/Users/yashnilmohanty/Desktop/HABs_Research/Data/chlorophyll"
 
-for infile in "$CHL_DIR"/*.L3b.8D.CHL.x.nc
-do
-  outfile="${infile/.L3b./.L3m.}"
-  outfile="${outfile%.nc}.map.nc"
+# every $CHL_DIR/*.L3b.8D.CHL.x.nc -> *.L3m.8D.CHL.x.map.nc, in parallel,
+# atomic outputs, resumable via $CHL_DIR/l3map_manifest.json
+echo "Mapping '$CHL_DIR'/*.L3b.8D.CHL.x.nc"
 
-  echo "Mapping '$infile' -> '$outfile'"
-
-  l3mapgen \
-    ifile="$infile" \
-    ofile="$outfile" \
-    product=chlor_a \
-    resolution=4km \
-    west=-125 east=-115 south=32 north=50 \
-    projection=platecarree
-done
+python3 "$(dirname "$0")/habs/scripts/l3map_batch.py" \
+  --preset chl_map \
+  --workers "${WORKERS:-8}" \
+  --manifest "$CHL_DIR/l3map_manifest.json"
 
 echo "Done mapping all files."
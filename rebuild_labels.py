@@ -3,13 +3,17 @@
 from pathlib import Path
 import xarray as xr
 
+from habs.feature_engineering.layout_utils import ocean_mask
+from habs.label_build.incremental_labels import MASK_Z, register_labels
+from habs.label_build.sparse_labels import sparse_path, write_sparse
+
 ROOT = Path("/Users/yashnilmohanty/Desktop/HABs_Research/Processed")
 
 feat  = xr.open_zarr(ROOT / "features.zarr")
 mask  = xr.open_zarr(ROOT / "hab_mask.zarr")["hab_occurrence"].astype("uint8")
 
 # ocean-only
-ocean  = feat["features"].sel(channel="mask").isel(time=0)
+ocean  = ocean_mask(feat)
 label  = mask.reindex_like(ocean, fill_value=0).where(ocean == 1, 0)
 
 # tidy coords / attrs
@@ -22,7 +26,7 @@ for c in ("time", "lat", "lon"):
     label[c].attrs.clear()
 
 label.name = "labels"                      # important!
-label = label.chunk({"time": -1, "lat": -1, "lon": -1})
+label = label.chunk({"time": 1, "lat": -1, "lon": -1})   # slice-wise updates
 
 # absolutely **no** encoding hints
 label.encoding.clear()
@@ -32,3 +36,9 @@ for c in label.coords:
 # write – plain uint8 chunks, no codecs
 label.to_zarr(ROOT / "labels.zarr", mode="w", consolidated=False)
 print("✅  labels.zarr written – shape", label.shape)
+
+# sparse / bit-packed copy for the dataloader + QC counts
+write_sparse(label, sparse_path(ROOT / "labels.zarr"), source=ROOT / "labels.zarr")
+print("✅  labels.sparse.zarr written")
+
+register_labels(MASK_Z, ROOT / "labels.zarr", ocean_only=True)   # incremental_labels.py